@@ -75,6 +75,12 @@ endfunction
 command! -nargs=* Vimania call Vimania(<f-args>)
 "nnoremap Q :Vimania /Users/Q187392/dev/vim/vimania/tests/data/test.md<CR>
 
+function! VimaniaOpenUrls() range
+  call TwDebug(printf("VimaniaOpenUrls lines: %s-%s", a:firstline, a:lastline))
+  python3 xMgr.open_urls(vim.eval('a:firstline'), vim.eval('a:lastline'))
+endfunction
+command! -range VimaniaOpenUrls <line1>,<line2>call VimaniaOpenUrls()
+
 function! VimaniaEdit(args)
   call TwDebug(printf("Vimania args: %s", a:args))
   python3 xMgr.edit_vimania(vim.eval('a:args'))
@@ -117,6 +123,24 @@ function! VimaniaHandleTodos(args)
 endfunction
 command! -nargs=1 VimaniaHandleTodos call VimaniaHandleTodos(<f-args)
 
+function! VimaniaSyncStats()
+  python3 xMgr.sync_stats()
+endfunction
+command! -nargs=0 VimaniaSyncStats call VimaniaSyncStats()
+
+function! VimaniaSyncPoll(timer)
+  python3 xMgr.sync_poll(vim.eval('a:timer'))
+endfunction
+
+function! VimaniaSyncFlush()
+  python3 xMgr.sync_flush()
+endfunction
+command! -nargs=0 VimaniaSyncFlush call VimaniaSyncFlush()
+
+function! VimaniaMaintainIdle()
+  python3 xMgr.maintain_idle()
+endfunction
+
 function! VimaniaDeleteTodo(args, path)
   call TwDebug(printf("Vimania args: %s, path: %s", a:args, a:path))
   python3 xMgr.delete_todo(vim.eval('a:args'), vim.eval('a:path'))
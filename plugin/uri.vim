@@ -28,6 +28,9 @@ command! TextobjURIOpen :call <sid>TextobjURIOpen(0)
 nnoremap <Plug>TextobjURIOpenSave :<C-u>call <sid>TextobjURIOpen(1)<CR>
 command! TextobjURIOpenSave :call <sid>TextobjURIOpen(1)
 
+" opens all URLs of the selected lines in parallel
+xnoremap <Plug>TextobjURIOpenAll :call VimaniaOpenUrls()<CR>
+
 if ! hasmapto('<Plug>TextobjURIOpen', 'n')
     nmap go <Plug>TextobjURIOpen
 endif
@@ -36,4 +39,8 @@ if ! hasmapto('<Plug>TextobjURIOpenSave', 'n')
     nmap goo <Plug>TextobjURIOpenSave
 endif
 
+if ! hasmapto('<Plug>TextobjURIOpenAll', 'x')
+    xmap go <Plug>TextobjURIOpenAll
+endif
+
 let g:loaded_uri = 1
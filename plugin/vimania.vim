@@ -9,6 +9,8 @@ augroup Vimania
  autocmd!
  autocmd BufRead *.md call VimaniaHandleTodos("read")
  autocmd BufWritePre *.md call VimaniaHandleTodos("write")
+ autocmd VimLeavePre * call VimaniaSyncFlush()
+ autocmd CursorHold *.md call VimaniaMaintainIdle()
  "autocmd TextYankPost *.md echom v:event
 
  " line must have todo-id: %99%
@@ -1,5 +1,13 @@
-from vimania.cli import app
 from vimania.vimania_manager import VimaniaManager
 
 __version__ = "0.5.0"
 __all__ = ["VimaniaManager", "app"]
+
+
+def __getattr__(name: str):
+    # the CLI (typer, DB) is only loaded when used, not at vim startup
+    if name == "app":
+        from vimania.cli import app
+
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
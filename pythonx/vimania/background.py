@@ -0,0 +1,52 @@
+"""Daemon threads which run only while there is work
+
+Vim keeps the python interpreter alive for the whole session, an idle thread per
+component would wait there forever. A `Worker` starts its thread on demand and lets
+it end as soon as there is nothing left to do, the next `start` launches a new one.
+"""
+import threading
+from typing import Callable, Optional, Union
+
+Task = Callable[[], None]
+
+
+class Worker:
+    """Runs the tasks returned by next_task in a daemon thread started on demand
+
+    next_task is called with lock held and returns the next task, or None when idle:
+    the thread stops. A task runs without the lock. Callers hold lock when queuing
+    work and calling `start`, so new work never finds a thread about to stop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        next_task: Callable[[], Optional[Task]],
+        lock: Union[threading.Lock, threading.Condition, None] = None,
+    ):
+        self.name = name
+        self.next_task = next_task
+        self.lock = lock if lock is not None else threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """starts the thread unless it is running, call with lock held"""
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self._run, name=self.name, daemon=True
+            )
+            self.thread.start()
+
+    def join(self, timeout: float = None):
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                task = self.next_task()
+                if task is None:
+                    self.thread = None
+                    return
+            task()
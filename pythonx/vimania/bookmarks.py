@@ -0,0 +1,196 @@
+"""Deferred page fetching for bookmarks added with `goo`
+
+add_twbm stores the bookmark without fetching the page, the URL goes into a fetch
+queue table in the twbm DB. Title, description and tags are filled in later by a
+background thread in vim or by `twtodo bm fetch`.
+
+The queue survives vim: URLs which could not be fetched (no response, HTTP error
+status) are retried with exponential backoff and dropped after MAX_ATTEMPTS. A URL
+is queued only once.
+"""
+import logging
+import sqlite3
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Deque, NamedTuple, Optional
+
+import aiosql
+
+from vimania.background import Worker
+
+_log = logging.getLogger("vimania-plugin.bookmarks")
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 60  # s before the first retry, doubled per attempt
+
+# twbm DB, not the todo DB: not loaded by the DAL
+queries = aiosql.from_path(
+    Path(__file__).parent.absolute() / "db" / "sql" / "bookmarks.sql", "sqlite3"
+)
+
+
+class Page(NamedTuple):
+    """result of buku.network_handler"""
+
+    title: Optional[str]
+    desc: Optional[str]
+    tags: Optional[str]
+    mime: int  # HEAD request only, no page data
+    bad: int  # malformed URL
+
+
+@dataclass(slots=True)
+class FetchStats:
+    """result of drain"""
+
+    fetched: int = 0
+    retried: int = 0
+    dropped: int = 0  # bad URL, deleted bookmark or too many attempts
+
+    def __str__(self):
+        return (
+            f"fetched: {self.fetched}, retried: {self.retried}, dropped: {self.dropped}"
+        )
+
+
+def connect(dbfile: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(dbfile, timeout=10, check_same_thread=False)
+    queries.create_fetch_queue(conn)
+    return conn
+
+
+def enqueue(dbfile: str, url: str):
+    conn = connect(dbfile)
+    try:
+        queries.enqueue(conn, url=url)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def count_queued(dbfile: str) -> int:
+    conn = connect(dbfile)
+    try:
+        return queries.count_queued(conn)
+    finally:
+        conn.close()
+
+
+def _network_handler(url: str) -> Page:
+    from vimania.buku import network_handler  # large, see BukuDb
+
+    return Page(*network_handler(url))
+
+
+def _merge_tags(tags: str, page_tags: Optional[str]) -> str:
+    from vimania.buku import parse_tags
+
+    if not page_tags:
+        return tags
+    return parse_tags([f"{tags},{page_tags}"])
+
+
+def drain(
+    dbfile: str,
+    limit: int = 100,
+    fetch: Callable[[str], Page] = _network_handler,
+) -> FetchStats:
+    """fetches the pages of the due URLs and completes their bookmarks"""
+    stats = FetchStats()
+    conn = connect(dbfile)
+    try:
+        for url, attempts in queries.get_due(conn, limit=limit):
+            bookmark = queries.get_bookmark(conn, url=url)
+            if bookmark is None:
+                _log.debug(f"Bookmark deleted, not fetched: {url}")
+                queries.dequeue(conn, url=url)
+                stats.dropped += 1
+            else:
+                _fetch(conn, url, attempts, bookmark, fetch, stats)
+            conn.commit()  # per URL: fetching takes long, keep the DB unlocked
+    finally:
+        conn.close()
+    return stats
+
+
+def _fetch(conn, url: str, attempts: int, bookmark, fetch, stats: FetchStats):
+    id_, tags = bookmark
+    try:
+        page = fetch(url)
+        if page.title is None:
+            error = "no response"
+        elif page.title == "" and not page.mime:
+            error = "no title"  # HTTP error status, only HEAD requests have none
+        else:
+            error = None
+    except Exception as e:
+        page, error = None, str(e)
+
+    if page is not None and page.bad:
+        _log.warning(f"Malformed URL, not fetched: {url}")
+        queries.dequeue(conn, url=url)
+        stats.dropped += 1
+    elif error is None:
+        queries.update_bookmark(
+            conn,
+            id=id_,
+            title=page.title,
+            desc=page.desc or "",
+            tags=_merge_tags(tags, page.tags),
+        )
+        queries.dequeue(conn, url=url)
+        stats.fetched += 1
+    elif attempts + 1 >= MAX_ATTEMPTS:
+        _log.warning(f"Giving up fetching {url}: {error}")
+        queries.dequeue(conn, url=url)
+        stats.dropped += 1
+    else:
+        _log.debug(f"Fetching {url} failed, retrying later: {error}")
+        queries.postpone(conn, url=url, delay=RETRY_DELAY * 2**attempts, error=error)
+        stats.retried += 1
+
+
+class FetchWorker:
+    """Drains the fetch queue in a background thread, one thread at a time"""
+
+    def __init__(self, dbfile: str, fetch: Callable[[str], Page] = _network_handler):
+        self.dbfile = dbfile
+        self.fetch = fetch
+        self.history: Deque[FetchStats] = deque(maxlen=50)
+        self._worker = Worker("vimania-fetch", self._next_drain)
+        self._pending = False  # URLs queued while the thread is draining
+
+    def notify(self):
+        """new URLs are queued: drains them in the background"""
+        with self._worker.lock:
+            self._pending = True
+            self._worker.start()
+
+    def join(self, timeout: float = None):
+        self._worker.join(timeout)
+
+    def _next_drain(self):  # with the worker's lock held
+        if not self._pending:
+            return None
+        self._pending = False
+        return self._drain
+
+    def _drain(self):
+        try:
+            stats = drain(self.dbfile, fetch=self.fetch)
+            _log.debug(f"Fetched bookmarks: {stats}")
+            self.history.append(stats)
+        except Exception:
+            _log.exception(f"Fetching bookmarks failed: {self.dbfile}")
+
+
+_worker: Optional[FetchWorker] = None
+
+
+def get_fetch_worker(dbfile: str) -> FetchWorker:
+    """the fetch worker of the vim process"""
+    global _worker
+    if _worker is None or _worker.dbfile != dbfile:
+        _worker = FetchWorker(dbfile)
+    return _worker
@@ -2,7 +2,7 @@ import logging
 import subprocess
 import sys
 from os import isatty
-from typing import Sequence
+from typing import Dict, Sequence, Tuple
 
 import typer
 
@@ -28,6 +28,10 @@ awesome todo manager for the command line
 """
 
 app = typer.Typer(help=HELP_DESC)
+db_app = typer.Typer(help="database administration")
+app.add_typer(db_app, name="db")
+bm_app = typer.Typer(help="bookmarks of twbm")
+app.add_typer(bm_app, name="bm")
 
 
 def _update_tags(
@@ -56,8 +60,21 @@ def _update_tags(
             dal.update_bookmark(todo)
 
 
-def show_todos(todos: Sequence[Todo], err: bool = True):
+# FTS matches in reverse video, keeps the color of the surrounding text
+HIGHLIGHT_START = "\x1b[7m"
+HIGHLIGHT_END = "\x1b[27m"
+
+
+def show_todos(
+    todos: Sequence[Todo],
+    err: bool = True,
+    highlights: Dict[int, Tuple[str, str]] = None,
+):
+    """highlights: FTS matches of todo and desc by id, see DAL.get_highlights"""
+    if highlights is None:
+        highlights = dict()
     for i, todo in enumerate(todos):
+        text, desc = highlights.get(todo.id, (todo.todo, todo.desc))
         offset = len(str(i)) + 2
 
         if todo.flags == TodoStatus.OPEN:
@@ -66,18 +83,22 @@ def show_todos(todos: Sequence[Todo], err: bool = True):
             status = "in progress"
         elif todo.flags == TodoStatus.DONE:
             status = "done"
+        elif todo.flags == TodoStatus.TODELETE:
+            status = "orphaned"
+        else:
+            status = "unknown"
 
         id_formatted = typer.style(
             f"{todo.id}", fg=typer.colors.BRIGHT_BLACK, bold=False
         )
         metadata_formatted = typer.style(
-            f"{i}. {todo.todo}", fg=typer.colors.GREEN, bold=True
+            f"{i}. {text}", fg=typer.colors.GREEN, bold=True
         )
         typer.echo(f"{metadata_formatted} [{id_formatted}]", err=err)
 
         typer.secho(f"{' ':>{offset}}Status: {status}", fg=typer.colors.YELLOW, err=err)
-        if todo.desc != "":
-            typer.secho(f"{' ':>{offset}}{todo.desc}", fg=None, err=err)
+        if desc:
+            typer.secho(f"{' ':>{offset}}{desc}", fg=None, err=err)
         typer.secho(
             f"{' ':>{offset}}{', '.join((tag for tag in todo.split_tags if tag != ''))}",
             fg=typer.colors.BLUE,
@@ -162,7 +183,8 @@ def search(
     Searches bookmark database with full text search capabilities (FTS)
     (see: https://www.sqlite.org/fts5.html)
 
-    Title, URL and description are FTS indexed. Tags are not part of FTS.
+    Todo, metadata, tags, description and path are FTS indexed, matches in the
+    todo rank highest. Prefix queries (sec*) use prefix indexes.
 
     Tags must be specified as comma separated list without blanks.
     Correct FTS search syntax: https://www.sqlite.org/fts5.html chapter 3.
@@ -191,9 +213,9 @@ def search(
     if verbose:
         typer.echo(f"Using DB: {config.tw_vimania_db_url}", err=True)
 
-    todos = Todos(fts_query=fts_query).filter(
-        tags_all, tags_all_not, tags_any, tags_any_not, tags_exact
-    )
+    todos = Todos.search(
+        fts_query, tags_all, tags_all_not, tags_any, tags_any_not, tags_exact
+    ).todos
 
     # ordering of results
     if order_desc:
@@ -203,7 +225,13 @@ def search(
     else:
         todos = sorted(todos, key=lambda todo: todo.metadata.lower())
 
-    show_todos(todos)
+    highlights = None
+    if fts_query != "" and sys.stderr.isatty():  # no escape codes in pipes
+        with DAL(env_config=config) as dal:
+            highlights = dal.get_highlights(
+                fts_query, (todo.id for todo in todos), HIGHLIGHT_START, HIGHLIGHT_END
+            )
+    show_todos(todos, highlights=highlights)
     typer.echo(f"Found: {len(todos)}", err=True)
 
     if not non_interactive:
@@ -337,6 +365,67 @@ def tags(
         typer.echo(f"{output}", err=True)
 
 
+@db_app.command()
+def maintain(
+    optimize: bool = typer.Option(
+        False, "-o", "--optimize", help="merge the FTS index into one segment"
+    ),
+    vacuum: bool = typer.Option(
+        False, "--vacuum", help="rewrite the DB file, enables incremental auto vacuum"
+    ),
+    verbose: bool = typer.Option(False, "-v", "--verbose"),
+):
+    """
+    Maintains the full-text index and the DB file.
+
+    Deletes todos orphaned longer than TW_VIMANIA_ORPHAN_DAYS, merges FTS index
+    segments, checks the index against the todos and rebuilds it if inconsistent,
+    updates the query planner statistics (ANALYZE) and releases free pages. Prints
+    segment counts and timings.
+    """
+    if verbose:
+        typer.echo(f"Using DB: {config.tw_vimania_db_url}", err=True)
+
+    with DAL(env_config=config) as dal:
+        report = dal.maintain(optimize=optimize)
+        if vacuum:
+            report.timings["vacuum"] = dal.vacuum()
+
+    typer.echo(f"FTS segments: {report.segments_before} -> {report.segments_after}")
+    if not report.is_consistent:
+        typer.secho("FTS index was inconsistent: rebuilt.", fg=typer.colors.YELLOW)
+    if report.purged > 0:
+        typer.echo(f"Purged orphaned todos: {report.purged}")
+    if report.freed_pages > 0:
+        typer.echo(f"Freed pages: {report.freed_pages}")
+    for step, ms in report.timings.items():
+        typer.echo(f"{step:<20} {ms:>10.1f} ms")
+
+
+@bm_app.command()
+def fetch(
+    limit: int = typer.Option(100, "-l", "--limit", help="maximum number of URLs"),
+    verbose: bool = typer.Option(False, "-v", "--verbose"),
+):
+    """
+    Fetches the pages of bookmarks added in vim.
+
+    Fills in title, description and tags of the bookmarks waiting in the fetch
+    queue. URLs which cannot be fetched stay queued and are retried later.
+    """
+    from vimania.bookmarks import count_queued, drain
+
+    if not config.is_installed_twbm:
+        typer.secho("twbm is not configured: TWBM_DB_URL", fg=typer.colors.RED)
+        raise typer.Exit(1)
+    if verbose:
+        typer.echo(f"Using DB: {config.twbm_db_url}", err=True)
+
+    stats = drain(config.dbfile_twbm, limit=limit)
+    typer.echo(stats)
+    typer.echo(f"queued: {count_queued(config.dbfile_twbm)}")
+
+
 if __name__ == "__main__":
     _log.debug(config)
     app()
@@ -2,18 +2,19 @@
 import logging
 import os
 import re
-import subprocess
 import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Sequence, Tuple
+from typing import TYPE_CHECKING, List, Sequence, Tuple
 
-from vimania.buku import BukuDb
 from vimania.db.dal import DAL, TodoStatus, Todo
 from vimania.environment import config
 from vimania.exception import VimaniaException
 from vimania.handle_buffer import VimTodo
-from vimania.rifle.rifle import Rifle
+from vimania.opener import OS_OPEN, get_opener
+
+if TYPE_CHECKING:
+    from vimania.rifle.rifle import Rifle
 
 """ Implementation independent of vim """
 
@@ -25,27 +26,31 @@ pattern = re.compile(
     r""".*(https?:\/\/[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9]{1,6}\b[-a-zA-Z0-9@:%_\+.~#?&\/=]*)"""
 )
 
-if sys.platform.startswith("win32"):
-    OS_OPEN = "explorer.exe"
-elif sys.platform.startswith("linux"):
-    OS_OPEN = "xdg-open"
-# Linux-specific code here...
-elif sys.platform.startswith("darwin"):
-    OS_OPEN = "open"
-else:
-    OS_OPEN = None
+url_pattern = re.compile(
+    r"""https?://[-a-zA-Z0-9@:%._+~#=]{1,256}\.[a-zA-Z0-9]{1,6}\b[-a-zA-Z0-9@:%_+.~#?&/=]*"""
+)
+
+
+_rifle = None  # shared engine, see get_rifle
+
+
+def get_rifle() -> "Rifle":
+    """shared rifle engine, rifle.conf is only parsed again when it changed"""
+    global _rifle
+    if _rifle is None:
+        from vimania.rifle.rifle import Rifle
+
+        _rifle = Rifle(f"{ROOT_DIR}/rifle/rifle.conf")
+    _rifle.reload_if_changed()
+    return _rifle
 
 
 def get_mime_type(uri: str) -> str:
     # mimetypes.init()
     # return mimetypes.guess_type(p)
 
-    # rifle has more hits
-    rifle = Rifle(
-        f"{ROOT_DIR}/rifle/rifle.conf"
-    )  # GOTCHA: must be initialized for every call, otherwise same result
-    rifle.reload_config()
-    return rifle.get_mimetype(uri)
+    # rifle has more hits, mimetypes are cached per (path, mtime, size)
+    return get_rifle().get_mimetype(uri)
 
 
 def is_text(uri: str) -> bool:
@@ -78,10 +83,26 @@ def do_vimania(args: str, save_twbm: bool = False) -> str:
             _log.debug(f"twbm added: {id_}")
 
     _log.info(f"Opening: {p}")
-    subprocess.run([OS_OPEN, p])
+    get_opener().open(p)  # returns immediately, the handler runs detached
     return return_message
 
 
+def find_urls(text: str) -> List[str]:
+    """http(s) URLs in text, without duplicates"""
+    return list(dict.fromkeys(url_pattern.findall(text)))
+
+
+def open_urls(text: str) -> str:
+    """opens all URLs in text in parallel, returns the message to display in vim"""
+    if OS_OPEN is None:
+        _log.error(f"Unknown OS architecture: {sys.platform}")
+        return ""
+    urls = find_urls(text)
+    _log.info(f"Opening: {urls}")
+    get_opener().open_all(urls)
+    return f"Opening {len(urls)} URLs" if len(urls) > 0 else "No URL found"
+
+
 def get_fqp(args: str) -> Tuple[str, str]:
     p = Path.home()  # default setting
     if args.startswith("http"):
@@ -124,20 +145,14 @@ def create_todo_(args: str, path: str) -> int:
     todo.path = path
 
     with DAL(env_config=config) as dal:
-        todos = dal.get_todos(fts_query=todo.todo)
-        _ = None
-        if len(todos) >= 1:
-            active_todos = [todo for todo in todos if todo.flags < TodoStatus.DONE]
-            if len(active_todos) > 1:
-                raise ValueError(
-                    f"Same active todo already exists: {[td.id for td in active_todos]}. Clear DB inconsistency"
-                )
-            elif len(active_todos) == 1 and active_todos[0].id is not None:
-                _log.debug(f"Updating todo: {todo.todo}")
-                id_ = dal.update_todo(todo)
-            else:
-                _log.debug(f"Creating todo: {todo.todo}")
-                id_ = dal.insert_todo(todo)
+        active_todo = dal.get_active_todo(todo.todo)
+        if active_todo is not None:
+            _log.debug(f"Updating todo: {todo.todo}")
+            todo.id = active_todo.id
+            id_ = dal.update_todo(todo)
+        else:
+            _log.debug(f"Creating todo: {todo.todo}")
+            id_ = dal.insert_todo(todo)
         return id_
 
 
@@ -176,6 +191,10 @@ def load_todos_() -> Sequence[str]:
 
 
 def add_twbm(url: str) -> int:
+    """adds the bookmark at once, the page is fetched in the background"""
+    from vimania.buku import BukuDb  # large, only loaded for bookmarks
+    from vimania.bookmarks import enqueue, get_fetch_worker
+
     id_ = BukuDb(dbfile=config.dbfile_twbm).add_rec(
         url=url,
         # title_in=title,
@@ -183,7 +202,7 @@ def add_twbm(url: str) -> int:
         # desc=desc,
         # immutable=0,
         delay_commit=False,
-        # fetch=(not nofetch),
+        fetch=False,  # no HTTP request in vim, see vimania.bookmarks
     )
     if id_ == -1:
         # raise SystemError(f"Error adding {url=} to DB {config.dbfile_twbm}")
@@ -192,6 +211,8 @@ def add_twbm(url: str) -> int:
         )  # TODO: buku.py error handling
     else:
         _log.debug(f"Added twbm: {id_=} - {url} to DB {config.dbfile_twbm}")
+        enqueue(config.dbfile_twbm, url)
+        get_fetch_worker(config.dbfile_twbm).notify()
     return id_
 
 
@@ -202,6 +223,8 @@ def delete_twbm(line: str) -> Tuple[int, str]:
         _log.warning(f"Cannot extract url from: {line}")
         raise VimaniaException(f"Cannot extract url from: {line}")
 
+    from vimania.buku import BukuDb
+
     url = match.group(1)
     id_ = BukuDb(dbfile=config.dbfile_twbm).get_rec_id(url=url)  # exact match
     if id_ == -1:
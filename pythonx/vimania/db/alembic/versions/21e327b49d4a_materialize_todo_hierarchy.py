@@ -0,0 +1,168 @@
+"""materialize todo hierarchy
+
+depth, root_id and tree_path are maintained by triggers, so hierarchy lookups
+are point reads (depth, parent at depth) or range scans (subtree) instead of
+recursive CTEs.
+
+tree_path: sortable materialized path, one zero padded id per level, e.g.
+'0000000003/0000000006/'. The subtree of a todo is the range
+[tree_path, tree_path || ':'), because ':' sorts directly after '9' and '/'.
+
+Revision ID: 21e327b49d4a
+Revises: ad8492b766f6
+Create Date: 2026-10-18 10:45:12.301472
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "21e327b49d4a"
+down_revision = "ad8492b766f6"
+branch_labels = None
+depends_on = None
+
+# noinspection SqlResolve
+backfill = """
+WITH RECURSIVE hierarchy(id, depth, root_id, tree_path) AS (
+    SELECT id, 0, id, printf('%010d/', id)
+    FROM vimania_todos
+    WHERE parent_id IS NULL
+       OR parent_id NOT IN (SELECT id FROM vimania_todos)
+    UNION ALL
+    SELECT vimania_todos.id,
+           hierarchy.depth + 1,
+           hierarchy.root_id,
+           hierarchy.tree_path || printf('%010d/', vimania_todos.id)
+    FROM vimania_todos
+             JOIN hierarchy ON vimania_todos.parent_id = hierarchy.id
+)
+UPDATE vimania_todos
+SET depth     = (SELECT depth FROM hierarchy WHERE hierarchy.id = vimania_todos.id),
+    root_id   = (SELECT root_id FROM hierarchy WHERE hierarchy.id = vimania_todos.id),
+    tree_path = (SELECT tree_path FROM hierarchy WHERE hierarchy.id = vimania_todos.id);
+"""
+
+# noinspection SqlResolve
+after_insert = """
+CREATE TRIGGER vimania_todos_hierarchy_ai AFTER INSERT ON vimania_todos
+    BEGIN
+        UPDATE vimania_todos
+        SET depth     = coalesce((SELECT depth + 1 FROM vimania_todos WHERE id = new.parent_id), 0),
+            root_id   = coalesce((SELECT root_id FROM vimania_todos WHERE id = new.parent_id), new.id),
+            tree_path = coalesce((SELECT tree_path FROM vimania_todos WHERE id = new.parent_id), '')
+                            || printf('%010d/', new.id)
+        WHERE id = new.id;
+    END;
+"""
+
+# moves the whole subtree: old.tree_path/depth are still the values before reparenting
+# noinspection SqlResolve
+after_reparent = """
+CREATE TRIGGER vimania_todos_hierarchy_au AFTER UPDATE OF parent_id ON vimania_todos
+    WHEN old.parent_id IS NOT new.parent_id
+    BEGIN
+        UPDATE vimania_todos
+        SET depth     = depth - old.depth
+                            + coalesce((SELECT depth + 1 FROM vimania_todos WHERE id = new.parent_id), 0),
+            root_id   = coalesce((SELECT root_id FROM vimania_todos WHERE id = new.parent_id), new.id),
+            tree_path = coalesce((SELECT tree_path FROM vimania_todos WHERE id = new.parent_id), '')
+                            || printf('%010d/', new.id)
+                            || substr(tree_path, length(old.tree_path) + 1)
+        WHERE tree_path >= old.tree_path
+          AND tree_path < old.tree_path || ':';
+    END;
+"""
+
+# children of a deleted todo become roots of their own subtrees
+# noinspection SqlResolve
+after_delete = """
+CREATE TRIGGER vimania_todos_hierarchy_ad AFTER DELETE ON vimania_todos
+    BEGIN
+        UPDATE vimania_todos
+        SET depth     = depth - old.depth - 1,
+            root_id   = cast(substr(tree_path, length(old.tree_path) + 1, 10) as integer),
+            tree_path = substr(tree_path, length(old.tree_path) + 1)
+        WHERE tree_path > old.tree_path
+          AND tree_path < old.tree_path || ':';
+    END;
+"""
+
+# FTS and timestamp triggers must not fire for the hierarchy bookkeeping columns
+content_columns = "parent_id, todo, metadata, tags, desc, path, flags"
+
+# noinspection SqlResolve
+after_update_fts = f"""
+CREATE TRIGGER vimania_todos_au AFTER UPDATE OF {content_columns} ON vimania_todos
+    BEGIN
+        INSERT INTO vimania_todos_fts (vimania_todos_fts, rowid, parent_id, todo, metadata, "desc", path)
+        VALUES ('delete', old.id, old.parent_id, old.todo, old.metadata, old.desc, old.path);
+        INSERT INTO vimania_todos_fts (rowid, parent_id, todo, metadata, "desc", path)
+        VALUES (new.id, new.parent_id, new.todo, new.metadata, new.desc, new.path);
+    END;
+"""
+
+update_time_trigger = f"""
+CREATE TRIGGER [UpdateLastTime] AFTER UPDATE OF {content_columns} ON vimania_todos
+    FOR EACH ROW WHEN NEW.last_update_ts <= OLD.last_update_ts
+    BEGIN
+        update vimania_todos set last_update_ts=CURRENT_TIMESTAMP where id=OLD.id;
+    END;
+"""
+
+# previous revision
+# noinspection SqlResolve
+after_update_fts_old = """
+CREATE TRIGGER vimania_todos_au AFTER UPDATE ON vimania_todos
+    BEGIN
+        INSERT INTO vimania_todos_fts (vimania_todos_fts, rowid, parent_id, todo, metadata, "desc", path)
+        VALUES ('delete', old.id, old.parent_id, old.todo, old.metadata, old.desc, old.path);
+        INSERT INTO vimania_todos_fts (rowid, parent_id, todo, metadata, "desc", path)
+        VALUES (new.id, new.parent_id, new.todo, new.metadata, new.desc, new.path);
+    END;
+"""
+
+update_time_trigger_old = """
+CREATE TRIGGER [UpdateLastTime] AFTER UPDATE ON vimania_todos
+    FOR EACH ROW WHEN NEW.last_update_ts <= OLD.last_update_ts
+    BEGIN
+        update vimania_todos set last_update_ts=CURRENT_TIMESTAMP where id=OLD.id;
+    END;
+"""
+
+
+def upgrade():
+    op.add_column(
+        "vimania_todos",
+        sa.Column("depth", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column("vimania_todos", sa.Column("root_id", sa.Integer()))
+    op.add_column("vimania_todos", sa.Column("tree_path", sa.String()))
+    op.execute(backfill)
+    op.create_index("ix_vimania_todos_tree_path", "vimania_todos", ["tree_path"])
+    op.create_index("ix_vimania_todos_root_id", "vimania_todos", ["root_id"])
+
+    op.execute("DROP TRIGGER vimania_todos_au")
+    op.execute("DROP TRIGGER UpdateLastTime")
+    op.execute(after_update_fts)
+    op.execute(update_time_trigger)
+    op.execute(after_insert)
+    op.execute(after_reparent)
+    op.execute(after_delete)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER vimania_todos_hierarchy_ad")
+    op.execute("DROP TRIGGER vimania_todos_hierarchy_au")
+    op.execute("DROP TRIGGER vimania_todos_hierarchy_ai")
+    op.execute("DROP TRIGGER UpdateLastTime")
+    op.execute("DROP TRIGGER vimania_todos_au")
+    op.execute(after_update_fts_old)
+    op.execute(update_time_trigger_old)
+
+    op.drop_index("ix_vimania_todos_root_id", "vimania_todos")
+    op.drop_index("ix_vimania_todos_tree_path", "vimania_todos")
+    # native DROP COLUMN (SQLite >= 3.35): batch mode would drop the FTS triggers
+    op.execute("ALTER TABLE vimania_todos DROP COLUMN tree_path")
+    op.execute("ALTER TABLE vimania_todos DROP COLUMN root_id")
+    op.execute("ALTER TABLE vimania_todos DROP COLUMN depth")
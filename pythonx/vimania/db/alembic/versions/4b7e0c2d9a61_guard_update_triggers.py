@@ -0,0 +1,82 @@
+"""guard update triggers
+
+Updates which do not change a column must not touch the FTS index, and
+last_update_ts is set by the UPDATE statements of the DAL themselves: the
+timestamp trigger only fires for other writers and real changes, so it no
+longer issues a second UPDATE per row.
+
+Revision ID: 4b7e0c2d9a61
+Revises: 9d41b7c0e5a2
+Create Date: 2026-10-18 16:22:05.913264
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4b7e0c2d9a61"
+down_revision = "9d41b7c0e5a2"
+branch_labels = None
+depends_on = None
+
+fts_columns = ("todo", "metadata", "tags", "desc", "path")
+content_columns = ("parent_id",) + fts_columns + ("flags",)
+
+
+def changed(columns) -> str:
+    return " OR ".join(f'old."{column}" IS NOT new."{column}"' for column in columns)
+
+
+# noinspection SqlResolve
+after_update_fts = f"""
+CREATE TRIGGER vimania_todos_au AFTER UPDATE OF todo, metadata, tags, desc, path ON vimania_todos
+    WHEN {changed(fts_columns)}
+    BEGIN
+        INSERT INTO vimania_todos_fts (vimania_todos_fts, rowid, todo, metadata, tags, "desc", path)
+        VALUES ('delete', old.id, old.todo, old.metadata, old.tags, old.desc, old.path);
+        INSERT INTO vimania_todos_fts (rowid, todo, metadata, tags, "desc", path)
+        VALUES (new.id, new.todo, new.metadata, new.tags, new.desc, new.path);
+    END;
+"""
+
+# only for writers which do not set last_update_ts
+update_time_trigger = f"""
+CREATE TRIGGER [UpdateLastTime] AFTER UPDATE OF parent_id, todo, metadata, tags, desc, path, flags ON vimania_todos
+    FOR EACH ROW WHEN NEW.last_update_ts IS OLD.last_update_ts AND ({changed(content_columns)})
+    BEGIN
+        update vimania_todos set last_update_ts=CURRENT_TIMESTAMP where id=OLD.id;
+    END;
+"""
+
+# previous revision
+# noinspection SqlResolve
+after_update_fts_old = """
+CREATE TRIGGER vimania_todos_au AFTER UPDATE OF todo, metadata, tags, desc, path ON vimania_todos
+    BEGIN
+        INSERT INTO vimania_todos_fts (vimania_todos_fts, rowid, todo, metadata, tags, "desc", path)
+        VALUES ('delete', old.id, old.todo, old.metadata, old.tags, old.desc, old.path);
+        INSERT INTO vimania_todos_fts (rowid, todo, metadata, tags, "desc", path)
+        VALUES (new.id, new.todo, new.metadata, new.tags, new.desc, new.path);
+    END;
+"""
+
+update_time_trigger_old = """
+CREATE TRIGGER [UpdateLastTime] AFTER UPDATE OF parent_id, todo, metadata, tags, desc, path, flags ON vimania_todos
+    FOR EACH ROW WHEN NEW.last_update_ts <= OLD.last_update_ts
+    BEGIN
+        update vimania_todos set last_update_ts=CURRENT_TIMESTAMP where id=OLD.id;
+    END;
+"""
+
+
+def upgrade():
+    op.execute("DROP TRIGGER vimania_todos_au")
+    op.execute("DROP TRIGGER UpdateLastTime")
+    op.execute(after_update_fts)
+    op.execute(update_time_trigger)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER UpdateLastTime")
+    op.execute("DROP TRIGGER vimania_todos_au")
+    op.execute(after_update_fts_old)
+    op.execute(update_time_trigger_old)
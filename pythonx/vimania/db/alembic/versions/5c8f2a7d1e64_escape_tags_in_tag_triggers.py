@@ -0,0 +1,84 @@
+"""escape tags in tag triggers
+
+The tag triggers built a JSON array from the tags string with replace() and
+only escaped backslash and double quote. A tag with a control character, e.g. a
+tab, was malformed JSON: every INSERT and UPDATE of its todo failed. json_quote
+escapes every character JSON requires.
+
+Revision ID: 5c8f2a7d1e64
+Revises: 7a3f9e21c4b8
+Create Date: 2026-10-18 21:14:52.640317
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5c8f2a7d1e64"
+down_revision = "7a3f9e21c4b8"
+branch_labels = None
+depends_on = None
+
+
+def as_json(tags: str) -> str:
+    return f"""'[' || replace(json_quote({tags}), ',', '","') || ']'"""
+
+
+# previous revision
+def as_json_old(tags: str) -> str:
+    escaped = f"""replace(replace({tags}, '\\', '\\\\'), '"', '\\"')"""
+    return f"""'["' || replace({escaped}, ',', '","') || '"]'"""
+
+
+# noinspection SqlResolve
+def tag_triggers(as_json) -> list:
+    """the triggers of c3e9a5d27f10 with tags split by as_json"""
+
+    def split(tags: str) -> str:
+        return f"(SELECT value FROM json_each({as_json(tags)}) WHERE value <> '')"
+
+    link_new = f"""
+        INSERT OR IGNORE INTO vimania_tags (tag) SELECT value FROM {split("new.tags")};
+        INSERT OR IGNORE INTO vimania_todo_tags (todo_id, tag_id)
+        SELECT new.id, id FROM vimania_tags WHERE tag IN {split("new.tags")};"""
+    unlink_old = """
+        DELETE FROM vimania_todo_tags WHERE todo_id = old.id;"""
+    prune_old = f"""
+        DELETE FROM vimania_tags
+        WHERE tag IN {split("old.tags")}
+          AND NOT EXISTS(SELECT 1 FROM vimania_todo_tags WHERE tag_id = vimania_tags.id);"""
+    return [
+        f"""
+CREATE TRIGGER vimania_todos_tags_ai AFTER INSERT ON vimania_todos
+    BEGIN{link_new}
+    END;
+""",
+        f"""
+CREATE TRIGGER vimania_todos_tags_au AFTER UPDATE OF tags ON vimania_todos
+    WHEN old.tags IS NOT new.tags
+    BEGIN{unlink_old}{link_new}{prune_old}
+    END;
+""",
+        f"""
+CREATE TRIGGER vimania_todos_tags_ad AFTER DELETE ON vimania_todos
+    BEGIN{unlink_old}{prune_old}
+    END;
+""",
+    ]
+
+
+def drop_tag_triggers():
+    op.execute("DROP TRIGGER vimania_todos_tags_ad")
+    op.execute("DROP TRIGGER vimania_todos_tags_au")
+    op.execute("DROP TRIGGER vimania_todos_tags_ai")
+
+
+def upgrade():
+    drop_tag_triggers()
+    for trigger in tag_triggers(as_json):
+        op.execute(trigger)
+
+
+def downgrade():
+    drop_tag_triggers()
+    for trigger in tag_triggers(as_json_old):
+        op.execute(trigger)
@@ -0,0 +1,33 @@
+"""index todos without hash
+
+Active duplicates at migration time, rows written without the DAL and updates
+colliding with an active todo keep a NULL hash. The DAL backfills them once and
+looks up the rest by their text: the partial index keeps both proportional to the
+rows without hash.
+
+Revision ID: 7a3f9e21c4b8
+Revises: 4b7e0c2d9a61
+Create Date: 2026-10-18 18:41:37.206518
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7a3f9e21c4b8"
+down_revision = "4b7e0c2d9a61"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_vimania_todos_without_hash",
+        "vimania_todos",
+        ["todo"],  # covering: hash_todos reads id and todo
+        sqlite_where=sa.text("todo_hash IS NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_vimania_todos_without_hash", "vimania_todos")
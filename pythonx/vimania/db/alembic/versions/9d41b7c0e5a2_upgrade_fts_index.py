@@ -0,0 +1,134 @@
+"""upgrade fts index
+
+Tags are indexed, so `tags:aaa` narrows inside FTS. Prefix indexes for 2 and 3
+characters make prefix queries (`sec*`) index lookups. Column weights of the
+rank function put matches in todo above metadata, tags, desc and path.
+
+Unused columns (id, parent_id, flags) are no longer part of the FTS table.
+
+Revision ID: 9d41b7c0e5a2
+Revises: c3e9a5d27f10
+Create Date: 2026-10-18 15:10:44.820371
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9d41b7c0e5a2"
+down_revision = "c3e9a5d27f10"
+branch_labels = None
+depends_on = None
+
+# bm25 weights in column order: todo, metadata, tags, desc, path
+rank = "bm25(10.0, 4.0, 3.0, 2.0, 1.0)"
+
+create_fts = """
+CREATE VIRTUAL TABLE vimania_todos_fts USING fts5(
+    todo,
+    metadata,
+    tags,
+    "desc",
+    "path",
+    content='vimania_todos',
+    content_rowid='id',
+    tokenize="porter unicode61",
+    prefix='2 3'
+);
+"""
+
+# noinspection SqlResolve
+after_insert = """
+CREATE TRIGGER vimania_todos_ai AFTER INSERT ON vimania_todos
+    BEGIN
+        INSERT INTO vimania_todos_fts (rowid, todo, metadata, tags, "desc", path)
+        VALUES (new.id, new.todo, new.metadata, new.tags, new.desc, new.path);
+    END;
+"""
+
+# noinspection SqlResolve
+after_delete = """
+CREATE TRIGGER vimania_todos_ad AFTER DELETE ON vimania_todos
+    BEGIN
+        INSERT INTO vimania_todos_fts (vimania_todos_fts, rowid, todo, metadata, tags, "desc", path)
+        VALUES ('delete', old.id, old.todo, old.metadata, old.tags, old.desc, old.path);
+    END;
+"""
+
+# noinspection SqlResolve
+after_update = """
+CREATE TRIGGER vimania_todos_au AFTER UPDATE OF todo, metadata, tags, desc, path ON vimania_todos
+    BEGIN
+        INSERT INTO vimania_todos_fts (vimania_todos_fts, rowid, todo, metadata, tags, "desc", path)
+        VALUES ('delete', old.id, old.todo, old.metadata, old.tags, old.desc, old.path);
+        INSERT INTO vimania_todos_fts (rowid, todo, metadata, tags, "desc", path)
+        VALUES (new.id, new.todo, new.metadata, new.tags, new.desc, new.path);
+    END;
+"""
+
+# previous revision
+create_fts_old = """
+CREATE VIRTUAL TABLE vimania_todos_fts USING fts5(
+    id,
+    parent_id UNINDEXED,
+    todo,
+    metadata,
+    tags UNINDEXED,
+    "desc",
+    "path",
+    flags UNINDEXED,
+    content='vimania_todos',
+    content_rowid='id',
+    tokenize="porter unicode61",
+);
+"""
+
+# noinspection SqlResolve
+after_insert_old = """
+CREATE TRIGGER vimania_todos_ai AFTER INSERT ON vimania_todos
+    BEGIN
+        INSERT INTO vimania_todos_fts (rowid, parent_id, todo, metadata, "desc", path)
+        VALUES (new.id, new.parent_id, new.todo, new.metadata, new.desc, new.path);
+    END;
+"""
+
+# noinspection SqlResolve
+after_delete_old = """
+CREATE TRIGGER vimania_todos_ad AFTER DELETE ON vimania_todos
+    BEGIN
+        INSERT INTO vimania_todos_fts (vimania_todos_fts, rowid, parent_id, todo, metadata, "desc", path)
+        VALUES ('delete', old.id, old.parent_id, old.todo, old.metadata, old.desc, old.path);
+    END;
+"""
+
+# noinspection SqlResolve
+after_update_old = """
+CREATE TRIGGER vimania_todos_au AFTER UPDATE OF parent_id, todo, metadata, tags, desc, path, flags ON vimania_todos
+    BEGIN
+        INSERT INTO vimania_todos_fts (vimania_todos_fts, rowid, parent_id, todo, metadata, "desc", path)
+        VALUES ('delete', old.id, old.parent_id, old.todo, old.metadata, old.desc, old.path);
+        INSERT INTO vimania_todos_fts (rowid, parent_id, todo, metadata, "desc", path)
+        VALUES (new.id, new.parent_id, new.todo, new.metadata, new.desc, new.path);
+    END;
+"""
+
+
+def _recreate(create: str, triggers: tuple):
+    op.execute("DROP TRIGGER vimania_todos_au")
+    op.execute("DROP TRIGGER vimania_todos_ad")
+    op.execute("DROP TRIGGER vimania_todos_ai")
+    op.execute("DROP TABLE vimania_todos_fts")
+    op.execute(create)
+    op.execute("INSERT INTO vimania_todos_fts (vimania_todos_fts) VALUES ('rebuild')")
+    for trigger in triggers:
+        op.execute(trigger)
+
+
+def upgrade():
+    _recreate(create_fts, (after_insert, after_delete, after_update))
+    op.execute(
+        f"INSERT INTO vimania_todos_fts (vimania_todos_fts, rank) VALUES ('rank', '{rank}')"
+    )
+
+
+def downgrade():
+    _recreate(create_fts_old, (after_insert_old, after_delete_old, after_update_old))
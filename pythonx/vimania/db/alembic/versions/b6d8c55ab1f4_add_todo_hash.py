@@ -0,0 +1,55 @@
+"""add todo hash
+
+Digest of the normalized todo text with a partial unique index over active
+todos (flags < DONE): duplicate detection is one index probe.
+
+Existing active duplicates keep a NULL hash (first todo wins).
+
+Revision ID: b6d8c55ab1f4
+Revises: f2b0c066d943
+Create Date: 2026-10-18 12:02:51.730115
+
+"""
+import hashlib
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b6d8c55ab1f4"
+down_revision = "f2b0c066d943"
+branch_labels = None
+depends_on = None
+
+
+# frozen copy of vimania.db.dal.todo_hash
+def todo_hash(text: str) -> str:
+    normalized = " ".join(text.casefold().split())
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+def upgrade():
+    op.add_column("vimania_todos", sa.Column("todo_hash", sa.String()))
+    op.create_index(
+        "ix_vimania_todos_todo_hash",
+        "vimania_todos",
+        ["todo_hash"],
+        unique=True,
+        sqlite_where=sa.text("flags < 4"),
+    )
+
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("SELECT id, todo FROM vimania_todos ORDER BY id"))
+    params = [dict(id=id_, todo_hash=todo_hash(text)) for id_, text in rows]
+    if len(params) > 0:
+        conn.execute(
+            sa.text(
+                "UPDATE OR IGNORE vimania_todos SET todo_hash = :todo_hash WHERE id = :id"
+            ),
+            params,
+        )
+
+
+def downgrade():
+    op.drop_index("ix_vimania_todos_todo_hash", "vimania_todos")
+    op.execute("ALTER TABLE vimania_todos DROP COLUMN todo_hash")
@@ -0,0 +1,132 @@
+"""normalize tags
+
+Tags are stored in a dictionary (vimania_tags) and a join table
+(vimania_todo_tags), so listing tags, related tags and tag filters are index
+lookups instead of splitting every tags string with a recursive CTE.
+
+vimania_todos.tags (',a,b,') stays the compatibility representation: it is
+what the DAL and the Todo record read and write. The triggers derive the
+normalized tables from it, the dictionary only contains tags in use.
+
+Revision ID: c3e9a5d27f10
+Revises: f1ec8b7dac11
+Create Date: 2026-10-18 14:02:37.508114
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c3e9a5d27f10"
+down_revision = "f1ec8b7dac11"
+branch_labels = None
+depends_on = None
+
+
+def as_json(tags: str) -> str:
+    """tags string as JSON array, CTEs (split) are not allowed in triggers
+
+    json_quote escapes every character JSON requires, it never escapes a comma.
+    """
+    return f"""'[' || replace(json_quote({tags}), ',', '","') || ']'"""
+
+
+def split(tags: str) -> str:
+    return f"(SELECT value FROM json_each({as_json(tags)}) WHERE value <> '')"
+
+
+# noinspection SqlResolve
+link_new = f"""
+        INSERT OR IGNORE INTO vimania_tags (tag) SELECT value FROM {split("new.tags")};
+        INSERT OR IGNORE INTO vimania_todo_tags (todo_id, tag_id)
+        SELECT new.id, id FROM vimania_tags WHERE tag IN {split("new.tags")};"""
+
+# noinspection SqlResolve
+unlink_old = """
+        DELETE FROM vimania_todo_tags WHERE todo_id = old.id;"""
+
+# the dictionary only keeps tags in use
+# noinspection SqlResolve
+prune_old = f"""
+        DELETE FROM vimania_tags
+        WHERE tag IN {split("old.tags")}
+          AND NOT EXISTS(SELECT 1 FROM vimania_todo_tags WHERE tag_id = vimania_tags.id);"""
+
+# noinspection SqlResolve
+after_insert = f"""
+CREATE TRIGGER vimania_todos_tags_ai AFTER INSERT ON vimania_todos
+    BEGIN{link_new}
+    END;
+"""
+
+# noinspection SqlResolve
+after_update = f"""
+CREATE TRIGGER vimania_todos_tags_au AFTER UPDATE OF tags ON vimania_todos
+    WHEN old.tags IS NOT new.tags
+    BEGIN{unlink_old}{link_new}{prune_old}
+    END;
+"""
+
+# noinspection SqlResolve
+after_delete = f"""
+CREATE TRIGGER vimania_todos_tags_ad AFTER DELETE ON vimania_todos
+    BEGIN{unlink_old}{prune_old}
+    END;
+"""
+
+# noinspection SqlResolve
+backfill_tags = f"""
+INSERT OR IGNORE INTO vimania_tags (tag)
+SELECT value
+FROM vimania_todos, json_each({as_json("vimania_todos.tags")})
+WHERE value <> ''
+"""
+
+# noinspection SqlResolve
+backfill_todo_tags = f"""
+INSERT OR IGNORE INTO vimania_todo_tags (todo_id, tag_id)
+SELECT vimania_todos.id, vimania_tags.id
+FROM vimania_todos, json_each({as_json("vimania_todos.tags")})
+         JOIN vimania_tags ON vimania_tags.tag = json_each.value
+"""
+
+
+def upgrade():
+    op.create_table(
+        "vimania_tags",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("tag", sa.String(), nullable=False, unique=True),
+    )
+    op.create_table(
+        "vimania_todo_tags",
+        sa.Column(
+            "todo_id",
+            sa.Integer(),
+            sa.ForeignKey("vimania_todos.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "tag_id",
+            sa.Integer(),
+            sa.ForeignKey("vimania_tags.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sqlite_with_rowid=False,
+    )
+    op.create_index(
+        "ix_vimania_todo_tags_tag_id", "vimania_todo_tags", ["tag_id", "todo_id"]
+    )
+    op.execute(backfill_tags)
+    op.execute(backfill_todo_tags)
+    op.execute(after_insert)
+    op.execute(after_update)
+    op.execute(after_delete)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER vimania_todos_tags_ad")
+    op.execute("DROP TRIGGER vimania_todos_tags_au")
+    op.execute("DROP TRIGGER vimania_todos_tags_ai")
+    op.drop_index("ix_vimania_todo_tags_tag_id", "vimania_todo_tags")
+    op.drop_table("vimania_todo_tags")
+    op.drop_table("vimania_tags")
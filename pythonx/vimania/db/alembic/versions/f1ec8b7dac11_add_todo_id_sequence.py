@@ -0,0 +1,45 @@
+"""add todo id sequence
+
+Ids are handed out from vimania_id_seq, so vim can reserve a block of ids and
+write them into the buffer before the todos are inserted in the background.
+The trigger keeps the sequence ahead of every inserted id, including rows
+inserted without the DAL.
+
+Revision ID: f1ec8b7dac11
+Revises: b6d8c55ab1f4
+Create Date: 2026-10-18 12:41:09.118237
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f1ec8b7dac11"
+down_revision = "b6d8c55ab1f4"
+branch_labels = None
+depends_on = None
+
+# noinspection SqlResolve
+after_insert = """
+CREATE TRIGGER vimania_todos_id_seq_ai AFTER INSERT ON vimania_todos
+    WHEN new.id >= (SELECT next_id FROM vimania_id_seq)
+    BEGIN
+        UPDATE vimania_id_seq SET next_id = new.id + 1;
+    END;
+"""
+
+
+def upgrade():
+    op.create_table(
+        "vimania_id_seq",
+        sa.Column("next_id", sa.Integer(), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO vimania_id_seq (next_id) SELECT coalesce(max(id), 0) + 1 FROM vimania_todos"
+    )
+    op.execute(after_insert)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER vimania_todos_id_seq_ai")
+    op.drop_table("vimania_id_seq")
@@ -0,0 +1,45 @@
+"""add secondary indexes
+
+Covering indexes for the access paths of the DAL: children by parent_id,
+todos of a file by path, active todos by flags, CLI ordering by age and
+subtree status by tree_path.
+
+Revision ID: f2b0c066d943
+Revises: 21e327b49d4a
+Create Date: 2026-10-18 11:20:37.518204
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f2b0c066d943"
+down_revision = "21e327b49d4a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_vimania_todos_parent_id", "vimania_todos", ["parent_id", "flags"]
+    )
+    op.create_index("ix_vimania_todos_path", "vimania_todos", ["path", "flags"])
+    op.create_index(
+        "ix_vimania_todos_flags", "vimania_todos", ["flags", "last_update_ts"]
+    )
+    op.create_index(
+        "ix_vimania_todos_last_update_ts", "vimania_todos", ["last_update_ts"]
+    )
+    # get_overall_status reads flags of the whole subtree from the index only
+    op.drop_index("ix_vimania_todos_tree_path", "vimania_todos")
+    op.create_index(
+        "ix_vimania_todos_tree_path", "vimania_todos", ["tree_path", "flags"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_vimania_todos_tree_path", "vimania_todos")
+    op.create_index("ix_vimania_todos_tree_path", "vimania_todos", ["tree_path"])
+    op.drop_index("ix_vimania_todos_last_update_ts", "vimania_todos")
+    op.drop_index("ix_vimania_todos_flags", "vimania_todos")
+    op.drop_index("ix_vimania_todos_path", "vimania_todos")
+    op.drop_index("ix_vimania_todos_parent_id", "vimania_todos")
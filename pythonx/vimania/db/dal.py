@@ -1,15 +1,22 @@
+import hashlib
+import json
 import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import IntEnum
 from pathlib import Path
-from typing import Sequence, Optional
+from typing import Dict, Iterable, List, Sequence, Optional, Tuple
 
 import aiosql
 import sqlalchemy as sa
-from pydantic import BaseModel
-from sqlalchemy import create_engine, ForeignKey
+from sqlalchemy import ForeignKey
 from sqlalchemy.engine import Engine, Connection
 
+from vimania.db.engine import get_engine
+
 # from twbm.environment import Environment
 
 _log = logging.getLogger("vimania-plugin.dal")
@@ -32,8 +39,61 @@ sim_results_table = sa.Table(
         "last_update_ts", sa.DateTime(), server_default=sa.func.current_timestamp()
     ),
     sa.Column("created_at", sa.DateTime()),
+    # materialized hierarchy, maintained by triggers
+    sa.Column("depth", sa.Integer(), nullable=False, server_default="0"),
+    sa.Column("root_id", sa.Integer(), index=True),
+    sa.Column("tree_path", sa.String()),
+    sa.Column("todo_hash", sa.String()),  # see todo_hash()
+    sa.Index("ix_vimania_todos_tree_path", "tree_path", "flags"),
+    sa.Index("ix_vimania_todos_parent_id", "parent_id", "flags"),
+    sa.Index("ix_vimania_todos_path", "path", "flags"),
+    sa.Index("ix_vimania_todos_flags", "flags", "last_update_ts"),
+    sa.Index("ix_vimania_todos_last_update_ts", "last_update_ts"),
+    sa.Index(
+        "ix_vimania_todos_todo_hash",
+        "todo_hash",
+        unique=True,
+        sqlite_where=sa.text("flags < 4"),
+    ),
+    sa.Index(
+        "ix_vimania_todos_without_hash",
+        "todo",
+        sqlite_where=sa.text("todo_hash IS NULL"),
+    ),
+)
+
+id_seq_table = sa.Table(
+    "vimania_id_seq",
+    metadata,
+    sa.Column("next_id", sa.Integer(), nullable=False),
 )
 
+# normalized tags, maintained by triggers from vimania_todos.tags
+tags_table = sa.Table(
+    "vimania_tags",
+    metadata,
+    sa.Column("id", sa.Integer(), primary_key=True),
+    sa.Column("tag", sa.String(), nullable=False, unique=True),
+)
+
+todo_tags_table = sa.Table(
+    "vimania_todo_tags",
+    metadata,
+    sa.Column(
+        "todo_id",
+        sa.Integer(),
+        ForeignKey("vimania_todos.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    sa.Column(
+        "tag_id",
+        sa.Integer(),
+        ForeignKey("vimania_tags.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    sa.Index("ix_vimania_todo_tags_tag_id", "tag_id", "todo_id"),
+    sqlite_with_rowid=False,
+)
 
 # if not flags are set: value=0, allows boolean operations
 class TodoStatus(IntEnum):
@@ -43,7 +103,19 @@ class TodoStatus(IntEnum):
     TODELETE = 8
 
 
-class Todo(BaseModel):
+def todo_hash(text: str) -> str:
+    """digest of the casefolded, whitespace collapsed todo text
+
+    Active todos (flags < DONE) are unique by this hash.
+    """
+    normalized = " ".join(text.casefold().split())
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+@dataclass(slots=True)
+class Todo:
+    """DB row, built by aiosql for every result row: no validation"""
+
     id: int = None
     parent_id: int = None
     todo: str = ""
@@ -52,14 +124,82 @@ class Todo(BaseModel):
     desc: str = ""
     path: str = ""  # file location
     flags: int = 0  # TodoStatus
-    last_update_ts: datetime = datetime.utcnow()
+    last_update_ts: datetime = None
     created_at: datetime = None
+    # materialized hierarchy, maintained by DB triggers
+    depth: int = 0  # 0: root
+    root_id: int = None
+    tree_path: str = None  # ancestors and self: '0000000003/0000000006/'
+    todo_hash: str = None  # maintained by the DAL, see todo_hash()
+
+    def __post_init__(self):
+        # sqlite returns timestamps as text
+        if isinstance(self.last_update_ts, str):
+            self.last_update_ts = datetime.fromisoformat(self.last_update_ts)
+        if isinstance(self.created_at, str):
+            self.created_at = datetime.fromisoformat(self.created_at)
 
     @property
     def split_tags(self) -> Sequence[str]:
         return [tag for tag in self.tags.split(",") if tag != ""]
 
 
+@dataclass
+class Maintenance:
+    """result of DAL.maintain"""
+
+    segments_before: int = 0  # FTS index segments
+    segments_after: int = 0
+    is_consistent: bool = True  # FTS integrity check
+    rebuilt: bool = False  # FTS index rebuilt from the content table
+    merges: int = 0  # merge steps which did work
+    purged: int = 0  # orphaned todos deleted
+    freed_pages: int = 0  # incremental vacuum
+    timings: Dict[str, float] = field(default_factory=dict)  # ms per step
+
+
+def _varint(data: bytes, i: int) -> Tuple[int, int]:
+    """SQLite varint at i: (value, next position)"""
+    value = 0
+    for n in range(9):
+        byte = data[i + n]
+        if n == 8:
+            return (value << 8) | byte, i + 9
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, i + n + 1
+    raise AssertionError("unreachable")
+
+
+def fts_segment_count(structure: Optional[bytes]) -> int:
+    """number of segments in an FTS5 structure record (see fts5_index.c)"""
+    if structure is None:  # empty index
+        return 0
+    i = 4  # cookie
+    if structure[i : i + 4] == b"\xff\x00\x00\x01":  # structure record V2
+        i += 4
+    _, i = _varint(structure, i)  # levels
+    segments, _ = _varint(structure, i)
+    return segments
+
+
+SQL_PATH = Path(__file__).parent.absolute() / "sql"
+OTHER_DB_SQL = {"bookmarks.sql"}  # twbm DB, see vimania.bookmarks
+
+# all queries of the todo DB in the sql directory, parsed once at import
+QUERIES = aiosql.from_str(
+    "\n\n".join(
+        sql_file.read_text()
+        for sql_file in sorted(SQL_PATH.glob("*.sql"))
+        if sql_file.name not in OTHER_DB_SQL
+    ),
+    "sqlite3",
+    record_classes={"Todo": Todo},
+)
+# sqlite3 keeps the prepared statements of all queries per connection
+STATEMENT_CACHE_SIZE = max(128, 2 * len(QUERIES.available_queries))
+
+
 # noinspection PyPropertyAccess
 class DAL:
     _sql_alchemy_db_engine: Engine
@@ -69,37 +209,71 @@ class DAL:
 
     def __init__(self, env_config: "Environment"):
         self.bm_db_url = env_config.tw_vimania_db_url
+        self.pool_size = env_config.tw_vimania_db_pool_size
+        self.idle_timeout = env_config.tw_vimania_db_idle_timeout
+        self.pragmas = env_config.db_pragmas
+        self.orphan_days = env_config.tw_vimania_orphan_days
+        self._in_transaction = False
+        self._is_hashed = False  # hashes backfilled by this DAL, see hash_todos
+        # hash -> id of the active todos without hash, None: to be read
+        self._unhashed: Optional[Dict[str, int]] = None
         _log.debug(f"Using database: {self.bm_db_url}")
-
-        # aiosql setup
-        self.record_classes = {
-            "Todo": Todo,
-        }
-        sql_files_path = Path(__file__).parent.absolute() / Path("sql")
-        self.queries = aiosql.from_path(
-            f"{sql_files_path}", "sqlite3", record_classes=self.record_classes
-        )
+        self.queries = QUERIES
 
     def __enter__(self):
-        self._sql_alchemy_db_engine: Engine = create_engine(self.bm_db_url)
+        # engine and connections are shared process-wide, see vimania.db.engine
+        self._sql_alchemy_db_engine: Engine = get_engine(
+            self.bm_db_url,
+            pool_size=self.pool_size,
+            idle_timeout=self.idle_timeout,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            pragmas=self.pragmas,
+        )
         self._conn = self._sql_alchemy_db_engine.connect()
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self._conn.close()
-        self._sql_alchemy_db_engine.dispose()
+        self._conn.close()  # returns the connection to the pool
 
     @property
     def conn(self):
         return self._conn
 
+    @contextmanager
+    def transaction(self):
+        """Groups all DAL calls of the block into one transaction
+
+        Commits once at the end of the block, rolls back everything on error.
+        Nested calls join the outer transaction.
+        """
+        if self._in_transaction:
+            yield self
+            return
+
+        self._in_transaction = True
+        try:
+            yield self
+        except Exception:
+            self.conn.connection.rollback()
+            self._unhashed = None
+            raise
+        else:
+            self.conn.connection.commit()
+        finally:
+            self._in_transaction = False
+
+    def _commit(self):
+        # within a transaction the commit is deferred to its end
+        if not self._in_transaction:
+            self.conn.connection.commit()
+
     def get_overall_status(self, id_: int) -> Optional[int]:
         """returns the minimal flag of all children,
         None if no children, or not found
         """
         result = self.queries.get_overall_status(self.conn.connection, id_=id_)
         _log.debug(f"{id_=}, {result=}")
-        self.conn.connection.commit()
+        self._commit()
         try:
             return result[0][0]
         except IndexError:
@@ -109,176 +283,363 @@ class DAL:
     def get_depth(self, id_: int) -> int:
         result = self.queries.get_depth(self.conn.connection, id_=id_)
         _log.debug(f"{id_=}, {result=}")
-        self.conn.connection.commit()
+        self._commit()
         try:
             return result[0][0]
         except IndexError:
             return 0
 
+    def get_depths(self, ids: Iterable[int]) -> Dict[int, int]:
+        """depth of all given todos with one query, missing ids are omitted"""
+        result = self.queries.get_depths(
+            self.conn.connection, ids=json.dumps(list(ids))
+        )
+        self._commit()
+        return {todo_id: depth for todo_id, depth in result}
+
     def get_todo_parent(self, id_: int, depth: int) -> Todo:
         result = self.queries.get_todo_parent(
             self.conn.connection, id_=id_, depth=depth
         )
         assert len(result) == 1, f"Ambigouus parents: {result=}, {id_=}"
-        self.conn.connection.commit()
+        self._commit()
         return result[0]
 
+    def reserve_ids(self, n: int) -> range:
+        """reserves a block of n todo ids, insert_todo only uses them when given explicitly"""
+        first = self.queries.reserve_ids(self.conn.connection, n=n)
+        self._commit()
+        return range(first, first + n)
+
     def delete_todo(self, id: int) -> int:
-        query = """
-            -- name: delete_todo<!
-            delete from vimania_todos where id = :id
-            returning *;
-        """
-        queries = aiosql.from_str(query, "sqlite3")
-        result = queries.delete_todo(self.conn.connection, id=id)
-        self.conn.connection.commit()
+        result = self.queries.delete_todo(self.conn.connection, id=id)
+        self._unhashed = None
+        self._commit()
         return result
 
     def insert_todo(self, todo: Todo) -> int:
-        query = """
-            -- name: insert_todo<!
-            -- record_class: Todo
-            insert into vimania_todos (parent_id, todo, metadata, tags, desc, path, flags, created_at)
-            values (:parent_id, :todo, :metadata, :tags, :desc, :path, :flags, :created_at)
-            returning *;
-        """
-        queries = aiosql.from_str(query, "sqlite3", record_classes=self.record_classes)
-        result = queries.insert_todo(
-            self.conn.connection,
-            parent_id=todo.parent_id,
-            todo=todo.todo,
-            metadata=todo.metadata,
-            tags=todo.tags,
-            desc=todo.desc,
-            path=todo.path,
-            flags=todo.flags,
-            created_at=datetime.utcnow(),
-        )
-        self.conn.connection.commit()
+        # the unique index only sees active todos with hash
+        id_ = self._get_unhashed_todos().get(todo_hash(todo.todo))
+        if id_ is not None:
+            raise ValueError(
+                f"Same active todo already exists: {[id_]}. Clear DB inconsistency"
+            )
+        with self._unique_active_todos():
+            result = self.queries.insert_todo(
+                self.conn.connection,
+                id=todo.id,  # None: next id of the sequence
+                parent_id=todo.parent_id,
+                todo=todo.todo,
+                todo_hash=todo_hash(todo.todo),
+                metadata=todo.metadata,
+                tags=todo.tags,
+                desc=todo.desc,
+                path=todo.path,
+                flags=todo.flags,
+                created_at=datetime.utcnow(),
+            )
+        self._commit()
         return result
 
     def update_todo(self, todo: Todo) -> int:
-        query = """
-            -- name: update_todo<!
-            update vimania_todos
-            set parent_id = :parent_id, todo = :todo, metadata = :metadata, tags = :tags, flags = :flags, desc = :desc, path = :path 
-            where id = :id
-            returning *;
-        """
-        queries = aiosql.from_str(query, "sqlite3")
-        result = queries.update_todo(
-            self.conn.connection,
+        result = self.queries.update_todo(
+            self.conn.connection, **self._update_params(todo)
+        )
+        self._unhashed = None  # may collide with an active todo: no hash
+        self._commit()
+        # return result  # shows the last used id
+        # TODO: handling non existing todo
+        return todo.id
+
+    @staticmethod
+    def _update_params(todo: Todo) -> Dict:
+        return dict(
             id=todo.id,
             parent_id=todo.parent_id,
             todo=todo.todo,
+            todo_hash=todo_hash(todo.todo),
             metadata=todo.metadata,
             tags=todo.tags,
             flags=todo.flags,
             desc=todo.desc,
             path=todo.path,
         )
-        self.conn.connection.commit()
-        # return result  # shows the last used id
-        # TODO: handling non existing todo
-        return todo.id
+
+    @staticmethod
+    @contextmanager
+    def _unique_active_todos():
+        try:
+            yield
+        except sqlite3.IntegrityError as e:
+            raise ValueError(
+                f"Same active todo already exists: {e}. Clear DB inconsistency"
+            ) from e
+
+    def update_todos(self, todos: Iterable[Todo]) -> int:
+        """updates all given todos with one statement, returns number of todos"""
+        params = [self._update_params(todo) for todo in todos]
+        if len(params) > 0:
+            self.queries.update_todos(self.conn.connection, params)
+            self._unhashed = None
+        self._commit()
+        return len(params)
+
+    def delete_todos(self, ids: Iterable[int]) -> int:
+        params = [dict(id=id_) for id_ in ids]
+        if len(params) > 0:
+            self.queries.delete_todos(self.conn.connection, params)
+            self._unhashed = None
+        self._commit()
+        return len(params)
+
+    def orphan_todos(self, ids: Iterable[int], path: str) -> int:
+        """marks the todos of path as TODELETE, they are revived when found in a buffer again"""
+        params = [dict(id=id_, path=path) for id_ in ids]
+        if len(params) > 0:
+            self.queries.orphan_todos(self.conn.connection, params)
+            self._unhashed = None
+        self._commit()
+        return len(params)
 
     def get_todo_by_id(self, id_: int) -> Todo:
-        # Example query
-        # noinspection SqlResolve
-        query = """
-            -- name: get_todo_by_id^
-            -- record_class: Todo
-            select *
-            from vimania_todos
-            where id = :id;
-            """
-        queries = aiosql.from_str(query, "sqlite3", record_classes=self.record_classes)
-        sql_result = queries.get_todo_by_id(self.conn.connection, id=id_)
+        sql_result = self.queries.get_todo_by_id(self.conn.connection, id=id_)
         if not sql_result:
             # noinspection PyRedundantParentheses
             return Todo()
         return sql_result
 
+    def get_todos_by_ids(self, ids: Iterable[int]) -> Dict[int, Todo]:
+        """fetches all given todos with one query, missing ids are omitted"""
+        sql_result = self.queries.get_todos_by_ids(
+            self.conn.connection, ids=json.dumps(list(ids))
+        )
+        return {todo.id: todo for todo in sql_result}
+
+    def get_active_todo(self, text: str) -> Optional[Todo]:
+        """active todo (flags < DONE) with the same normalized text, one index probe
+
+        Todos without hash are invisible to the probe, they are looked up by the hash
+        of their text instead, see _get_unhashed_todos.
+        """
+        self._hash_once()
+        hash_ = todo_hash(text)
+        todo = self.queries.get_active_todo_by_hash(
+            self.conn.connection, todo_hash=hash_
+        )
+        if todo is None:
+            id_ = self._get_unhashed_todos().get(hash_)
+            if id_ is not None:
+                todo = self.get_todo_by_id(id_)
+        return todo
+
+    def _get_unhashed_todos(self) -> Dict[str, int]:
+        """hash -> id of the active todos without hash, read once until the next write
+
+        The missing hashes are backfilled once per DAL, what is left are active
+        duplicates, e.g. of the migration or of an update. Inserts and lookups do not
+        rewrite them again.
+        """
+        if self._unhashed is None:
+            self._hash_once()
+            self._unhashed = dict()
+            rows = self.queries.get_active_todos_without_hash(self.conn.connection)
+            for id_, text in rows:
+                self._unhashed.setdefault(todo_hash(text), id_)  # first todo wins
+        return self._unhashed
+
+    def _hash_once(self):
+        if not self._is_hashed:
+            self.hash_todos()
+            self._is_hashed = True
+
+    def hash_todos(self) -> int:
+        """sets the missing hashes, returns the number of todos without hash before
+
+        Active duplicates at migration time, todos inserted without the DAL and
+        updates colliding with an active todo have none. Todos which would duplicate
+        an active todo keep no hash.
+        """
+        params = [
+            dict(id=id_, todo_hash=todo_hash(text))
+            for id_, text in self.queries.get_todos_without_hash(self.conn.connection)
+        ]
+        if len(params) > 0:
+            self.queries.set_todo_hashes(self.conn.connection, params)
+        self._commit()
+        return len(params)
+
+    def get_todos_by_path(self, path: str) -> Dict[int, Todo]:
+        """all todos of a file which are not marked for deletion"""
+        sql_result = self.queries.get_todos_by_path(self.conn.connection, path=path)
+        return {todo.id: todo for todo in sql_result}
+
     def get_todos(self, fts_query: str) -> Sequence[Todo]:
-        # Example query
-        # noinspection SqlResolve
         if fts_query != "":
-            query = """
-                -- name: get_todos
-                -- record_class: Todo
-                select *
-                from vimania_todos_fts
-                where vimania_todos_fts match :fts_query
-                order by rank;
-            """
-            queries = aiosql.from_str(
-                query, "sqlite3", record_classes=self.record_classes
+            sql_result = self.queries.search_todos(
+                self.conn.connection, fts_query=fts_query
             )
-            sql_result = queries.get_todos(self.conn.connection, fts_query=fts_query)
         else:  # TODO: make normal query
-            query = """
-                -- name: get_todos
-                -- record_class: Todo
-                select *
-                from vimania_todos_fts
-                order by rank;
-            """
-            queries = aiosql.from_str(
-                query, "sqlite3", record_classes=self.record_classes
-            )
-            sql_result = queries.get_todos(self.conn.connection, fts_query=fts_query)
+            sql_result = self.queries.get_all_todos(self.conn.connection)
 
         if not sql_result:
             # noinspection PyRedundantParentheses
             return (Todo(),)
         return sql_result
 
-    def get_related_tags(self, tag: str):
-        tag_query = f"%,{tag},%"
-        # noinspection SqlResolve
-        query = """
-            -- name: get_related_tags
-            with RECURSIVE split(tags, rest) AS (
-                SELECT '', tags || ','
-                FROM vimania_todos
-                WHERE tags LIKE :tag_query
-                -- WHERE tags LIKE '%,ccc,%'
-                UNION ALL
-                SELECT substr(rest, 0, instr(rest, ',')),
-                       substr(rest, instr(rest, ',') + 1)
-                FROM split
-                WHERE rest <> '')
-            SELECT distinct tags
-            FROM split
-            WHERE tags <> ''
-            ORDER BY tags;
+    def search_todos(
+        self,
+        fts_query: str,
+        tags_all: Sequence[str] = None,
+        tags_all_not: Sequence[str] = None,
+        tags_any: Sequence[str] = None,
+        tags_any_not: Sequence[str] = None,
+        tags_exact: Sequence[str] = None,
+    ) -> List[Todo]:
+        """todos matching fts_query (all todos if empty) and the tag filters
+
+        None means no filter, tags_exact overrules the other filters.
         """
-        queries = aiosql.from_str(query, "sqlite3")
-        sql_result = queries.get_related_tags(self.conn.connection, tag_query=tag_query)
 
-        # if not sql_result:
-        #     # noinspection PyRedundantParentheses
-        #     return (Bookmark(),)
-        return [tags[0] for tags in sql_result]
+        def as_json(tags: Optional[Sequence[str]]) -> Optional[str]:
+            return None if tags is None else json.dumps(sorted(set(tags)))
 
-    def get_all_tags(self):
-        # noinspection SqlResolve
-        query = """
-            -- name: get_all_tags
-            with RECURSIVE split(tags, rest) AS (
-                SELECT '', tags || ','
-                FROM vimania_todos
-                UNION ALL
-                SELECT substr(rest, 0, instr(rest, ',')),
-                       substr(rest, instr(rest, ',') + 1)
-                FROM split
-                WHERE rest <> '')
-            SELECT distinct tags
-            FROM split
-            WHERE tags <> ''
-            ORDER BY tags;
+        if tags_exact is not None:
+            tags_all = tags_all_not = tags_any = tags_any_not = None
+        params = dict(
+            tags_all=as_json(tags_all),
+            tags_all_not=as_json(tags_all_not),
+            tags_any=as_json(tags_any),
+            tags_any_not=as_json(tags_any_not),
+            tags_exact=as_json(tags_exact),
+        )
+        # a positive filter limits the todos to those of its tags: index joins
+        if tags_exact:
+            tag_list = tags_exact
+        elif tags_all:
+            tag_list = tags_all
+        else:
+            tag_list = tags_any
+
+        if fts_query != "":
+            sql_result = self.queries.search_todos_by_tags(
+                self.conn.connection, fts_query=fts_query, **params
+            )
+        elif tag_list is not None:
+            sql_result = self.queries.get_todos_by_tags(
+                self.conn.connection, tag_list=as_json(tag_list), **params
+            )
+        else:
+            sql_result = self.queries.get_todos_by_excluded_tags(
+                self.conn.connection, **params
+            )
+        return list(sql_result)
+
+    def get_highlights(
+        self, fts_query: str, ids: Iterable[int], start: str, end: str
+    ) -> Dict[int, Tuple[str, str]]:
+        """id -> (todo with matches between start and end, desc snippet)"""
+        sql_result = self.queries.get_highlights(
+            self.conn.connection,
+            fts_query=fts_query,
+            ids=json.dumps(list(ids)),
+            start=start,
+            end=end,
+        )
+        return {id_: (todo, desc) for id_, todo, desc in sql_result}
+
+    def fts_segments(self) -> int:
+        structure = self.queries.get_fts_structure(self.conn.connection)
+        return fts_segment_count(structure)
+
+    def maintain(
+        self,
+        optimize: bool = False,
+        check: bool = True,
+        analyze: bool = True,
+        merge_pages: int = 64,
+        max_merges: int = 100,
+        automerge: int = 4,
+        crisismerge: int = 16,
+        orphan_days: int = None,
+    ) -> Maintenance:
+        """Keeps the FTS index and the DB file compact
+
+        Todos orphaned (TODELETE) more than orphan_days ago are deleted first, until
+        then they are revived when they show up in a buffer again.
+        Repeated delete/insert pairs of the FTS triggers add segments to the index.
+        optimize merges them into one segment, otherwise at most max_merges steps of
+        merge_pages pages are done, which bounds the time (see VimaniaManager).
+        A failed integrity check rebuilds the index from the content table.
+        Free pages are released if the DB uses incremental auto vacuum.
         """
-        queries = aiosql.from_str(query, "sqlite3")
-        sql_result = queries.get_all_tags(self.conn.connection)
+        report = Maintenance()
+        conn = self.conn.connection
+
+        @contextmanager
+        def timed(step: str):
+            start = time.perf_counter()
+            yield
+            report.timings[step] = (time.perf_counter() - start) * 1000
+
+        if orphan_days is None:
+            orphan_days = self.orphan_days
+        with timed("purge"):
+            report.purged = len(self.queries.purge_orphans(conn, days=orphan_days))
+            conn.commit()
+
+        report.segments_before = self.fts_segments()
+        if check:
+            with timed("integrity_check"):
+                try:
+                    self.queries.fts_integrity_check(conn)
+                except sqlite3.DatabaseError as e:
+                    _log.warning(f"FTS index inconsistent, rebuilding: {e}")
+                    conn.rollback()
+                    report.is_consistent = False
+            if not report.is_consistent:
+                with timed("rebuild"):
+                    self.queries.fts_rebuild(conn)
+                    report.rebuilt = True
+
+        self.queries.fts_set_automerge(conn, segments=automerge)
+        self.queries.fts_set_crisismerge(conn, segments=crisismerge)
+        if optimize:
+            with timed("optimize"):
+                self.queries.fts_optimize(conn)
+        else:
+            with timed("merge"):
+                for _ in range(max_merges):
+                    changes = conn.total_changes
+                    self.queries.fts_merge(conn, pages=merge_pages)
+                    if conn.total_changes - changes < 2:  # nothing left to merge
+                        break
+                    report.merges += 1
+        conn.commit()
+        report.segments_after = self.fts_segments()
 
+        if analyze:
+            with timed("analyze"):
+                self.queries.analyze(conn)
+                conn.commit()
+        if self.queries.get_auto_vacuum(conn) == 2:
+            with timed("incremental_vacuum"):
+                free_pages = self.queries.get_freelist_count(conn)
+                self.queries.incremental_vacuum(conn)
+                conn.commit()
+                report.freed_pages = free_pages - self.queries.get_freelist_count(conn)
+        return report
+
+    def vacuum(self) -> float:
+        """rewrites the DB file, ms"""
+        start = time.perf_counter()
+        self.conn.connection.commit()
+        self.queries.vacuum(self.conn.connection)
+        return (time.perf_counter() - start) * 1000
+
+    def get_related_tags(self, tag: str):
+        sql_result = self.queries.get_related_tags(self.conn.connection, tag=tag)
+        return [tags[0] for tags in sql_result]
+
+    def get_all_tags(self):
+        sql_result = self.queries.get_all_tags(self.conn.connection)
         return [tags[0] for tags in sql_result]
@@ -0,0 +1,142 @@
+"""Process-wide registry of SQLAlchemy engines
+
+Vim keeps the python interpreter alive for the whole session. Engines and their
+pooled SQLite connections are therefore created once per DB url and configuration and
+shared by every DAL in the process (vim plugin, CLI, scripts). Engines which have not
+been used for `idle_timeout` seconds are disposed by a background thread, which closes
+their warm connections while vim is idle. The thread stops when no engine is left.
+
+Every new connection is initialized with the PRAGMA profile given at engine creation,
+see `Environment.db_pragmas`.
+"""
+import logging
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from vimania.background import Worker
+
+_log = logging.getLogger("vimania-plugin.engine")
+
+REAP_INTERVAL = 30.0  # s between checks for idle engines
+
+
+class _Entry(NamedTuple):
+    engine: Engine
+    idle_timeout: float  # s
+    last_use: float  # time.monotonic()
+
+
+# (url, pool_size, cached_statements, pragmas) -> engine
+_engines: Dict[Tuple, _Entry] = dict()
+_lock = threading.Lock()
+
+
+def _is_memory_db(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:")
+
+
+def _set_pragmas(pragmas: Dict[str, object]):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return on_connect
+
+
+def _create_engine(
+    url: str,
+    pool_size: int,
+    cached_statements: int,
+    pragmas: Optional[Dict[str, object]] = None,
+) -> Engine:
+    engine = _create_pooled_engine(url, pool_size, cached_statements)
+    if pragmas:
+        event.listen(engine, "connect", _set_pragmas(pragmas))
+    return engine
+
+
+def _create_pooled_engine(url: str, pool_size: int, cached_statements: int) -> Engine:
+    if _is_memory_db(url):
+        # every connection of a memory db is a new db: keep SQLAlchemy's default pool
+        return create_engine(url, connect_args={"cached_statements": cached_statements})
+    return create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=0,  # bounded: callers wait for a free connection
+        pool_pre_ping=True,
+        connect_args={
+            "check_same_thread": False,
+            "cached_statements": cached_statements,
+        },
+    )
+
+
+def get_engine(
+    url: str,
+    pool_size: int = 5,
+    idle_timeout: float = 300,
+    cached_statements: int = 128,
+    pragmas: Optional[Dict[str, object]] = None,
+) -> Engine:
+    """returns the shared engine for url and configuration, creating it on first use
+
+    cached_statements: size of sqlite3's prepared statement cache per connection
+    pragmas: executed on every new connection, e.g. {"journal_mode": "wal"}
+    """
+    key = (url, pool_size, cached_statements, tuple(sorted((pragmas or {}).items())))
+    with _lock:
+        entry = _engines.get(key)
+        if entry is not None:
+            engine = entry.engine
+        else:
+            _log.debug(f"Creating engine: {url}, {pool_size=}, {pragmas=}")
+            engine = _create_engine(url, pool_size, cached_statements, pragmas)
+        _engines[key] = _Entry(engine, idle_timeout, time.monotonic())
+        _reaper.start()
+        return engine
+
+
+def _evict_idle(now: float, idle_timeout: float = None):
+    """idle_timeout: overrides the timeout of the engines"""
+    for key, entry in list(_engines.items()):
+        timeout = entry.idle_timeout if idle_timeout is None else idle_timeout
+        if now - entry.last_use > timeout and not _is_memory_db(key[0]):
+            _log.debug(f"Evicting idle engine: {key[0]}")
+            entry.engine.dispose()
+            del _engines[key]
+
+
+def evict_idle(idle_timeout: float = None):
+    """disposes all engines not used within idle_timeout (default: their own) seconds"""
+    with _lock:
+        _evict_idle(time.monotonic(), idle_timeout)
+
+
+def _next_reap():  # with _lock held
+    if len(_engines) == 0:
+        return None
+    return _reap
+
+
+def _reap():
+    time.sleep(REAP_INTERVAL)
+    evict_idle()
+
+
+_reaper = Worker("vimania-engines", _next_reap, _lock)
+
+
+def dispose_engines():
+    """closes all pooled connections, e.g. before the DB file is replaced"""
+    with _lock:
+        for entry in _engines.values():
+            entry.engine.dispose()
+        _engines.clear()
@@ -0,0 +1,61 @@
+-- queries of the twbm DB (buku), see vimania.bookmarks: not loaded by the DAL
+
+-- name: create_fetch_queue#
+create table if not exists vimania_fetch_queue
+(
+    url             text primary key,
+    attempts        integer  not null default 0,
+    next_attempt_ts datetime not null default CURRENT_TIMESTAMP,
+    last_error      text
+) without rowid;
+create index if not exists ix_vimania_fetch_queue_next_attempt_ts
+    on vimania_fetch_queue (next_attempt_ts);
+
+
+-- name: enqueue!
+-- a URL already waiting is not queued again, but tried right away
+insert into vimania_fetch_queue (url)
+values (:url)
+on conflict (url) do update set next_attempt_ts = CURRENT_TIMESTAMP;
+
+
+-- name: get_due
+select url, attempts
+from vimania_fetch_queue
+where next_attempt_ts <= CURRENT_TIMESTAMP
+order by next_attempt_ts
+limit :limit;
+
+
+-- name: count_queued$
+select count(*)
+from vimania_fetch_queue;
+
+
+-- name: dequeue!
+delete
+from vimania_fetch_queue
+where url = :url;
+
+
+-- name: postpone!
+update vimania_fetch_queue
+set attempts        = attempts + 1,
+    next_attempt_ts = datetime('now', '+' || :delay || ' seconds'),
+    last_error      = :error
+where url = :url;
+
+
+-- name: get_bookmark^
+select id, tags
+from bookmarks
+where URL = :url;
+
+
+-- name: update_bookmark!
+-- only fills in what is missing, an immutable title (flags & 1) is kept
+update bookmarks
+set metadata = case when metadata = '' and flags & 1 = 0 then :title else metadata end,
+    desc     = case when desc = '' then :desc else desc end,
+    tags     = :tags
+where id = :id;
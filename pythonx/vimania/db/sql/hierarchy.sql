@@ -1,97 +1,40 @@
+-- hierarchy columns (depth, root_id, tree_path) are maintained by triggers,
+-- see alembic revision 21e327b49d4a
+
 -- name: get_overall_status
-with recursive tds_children as (
-    select id,
-           parent_id,
-           todo,
-           metadata,
-           tags,
-           desc,
-           path,
-           flags,
-           last_update_ts,
-           created_at,
-           0 as depth
-    from vimania_todos
-    where id == :id_
-      and flags <= 4
-    union all
-    select vimania_todos.id,
-           vimania_todos.parent_id,
-           vimania_todos.todo,
-           vimania_todos.metadata,
-           vimania_todos.tags,
-           vimania_todos.desc,
-           vimania_todos.path,
-           vimania_todos.flags,
-           vimania_todos.last_update_ts,
-           vimania_todos.created_at,
-           tds_children.depth + 1
-    from vimania_todos
-             join tds_children
-    where vimania_todos.parent_id == tds_children.id
-      and vimania_todos.flags <= 4
-)
-select min(flags) overall_status
-from tds_children
-where id != :id_
---where level < 3  -- only one level down
+select min(child.flags) overall_status
+from vimania_todos todo
+         join vimania_todos child
+              on child.tree_path > todo.tree_path
+                  and child.tree_path < todo.tree_path || ':'
+where todo.id == :id_
+  and todo.flags <= 4
+  and child.flags <= 4
 ;
 
 -- name: get_todo_parent
 -- record_class: Todo
-with recursive tds_parents as (
-    select id,
-           parent_id,
-           todo,
-           metadata,
-           tags,
-           desc,
-           path,
-           flags,
-           last_update_ts,
-           created_at,
-           0 as depth
-    from vimania_todos
-    where id = :id_
-      and flags <= 4
-    union all
-    select vimania_todos.id,
-           vimania_todos.parent_id,
-           vimania_todos.todo,
-           vimania_todos.metadata,
-           vimania_todos.tags,
-           vimania_todos.desc,
-           vimania_todos.path,
-           vimania_todos.flags,
-           vimania_todos.last_update_ts,
-           vimania_todos.created_at,
-           tds_parents.depth - 1
-    from vimania_todos
-             join tds_parents
-    where vimania_todos.id == tds_parents.parent_id
-      and vimania_todos.flags <= 4
-)
-select *
-from tds_parents
-where depth = :depth
+select parent.*
+from vimania_todos todo
+         join vimania_todos parent
+              on parent.id = cast(substr(todo.tree_path, (todo.depth + :depth) * 11 + 1, 10) as integer)
+where todo.id = :id_
+  and todo.flags <= 4
+  and parent.flags <= 4
 ;
 
 
 -- name: get_depth
-with recursive tds_parents as (
-    select id, parent_id, todo, 0 as depth
-    from vimania_todos
-    where id == :id_
-      and flags <= 4
-    union all
-    select vimania_todos.id, vimania_todos.parent_id, vimania_todos.todo, tds_parents.depth - 1
-    from vimania_todos
-             join tds_parents
-    where vimania_todos.id == tds_parents.parent_id
-      and vimania_todos.flags < 4
-)
-select depth
-from tds_parents
-order by depth
-limit 1
+select -depth as depth
+from vimania_todos
+where id == :id_
+  and flags <= 4
+;
+
+
+-- name: get_depths
+select id as todo_id, -depth as depth
+from vimania_todos
+where id in (select value from json_each(:ids))
+  and flags <= 4
 ;
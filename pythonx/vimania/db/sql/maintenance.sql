@@ -0,0 +1,64 @@
+-- name: fts_integrity_check!
+-- compares the index with the content table, raises sqlite3.DatabaseError if corrupt
+insert into vimania_todos_fts (vimania_todos_fts, rank)
+values ('integrity-check', 1);
+
+
+-- name: fts_rebuild!
+insert into vimania_todos_fts (vimania_todos_fts)
+values ('rebuild');
+
+
+-- name: fts_optimize!
+-- merges all segments into one
+insert into vimania_todos_fts (vimania_todos_fts)
+values ('optimize');
+
+
+-- name: fts_merge!
+-- merges segments, at most :pages pages of work
+insert into vimania_todos_fts (vimania_todos_fts, rank)
+values ('merge', :pages);
+
+
+-- name: fts_set_automerge!
+insert into vimania_todos_fts (vimania_todos_fts, rank)
+values ('automerge', :segments);
+
+
+-- name: fts_set_crisismerge!
+insert into vimania_todos_fts (vimania_todos_fts, rank)
+values ('crisismerge', :segments);
+
+
+-- name: get_fts_structure$
+-- structure record of the FTS index: levels and segments
+select block
+from vimania_todos_fts_data
+where id = 10;
+
+
+-- name: analyze!
+analyze;
+
+
+-- name: incremental_vacuum#
+-- frees all pages of the freelist, only with auto_vacuum = incremental
+-- as script: every step of the statement frees one page
+pragma incremental_vacuum;
+
+
+-- name: get_freelist_count$
+select freelist_count
+from pragma_freelist_count();
+
+
+-- name: get_auto_vacuum$
+-- 0: none, 1: full, 2: incremental
+select auto_vacuum
+from pragma_auto_vacuum();
+
+
+-- name: vacuum#
+-- rewrites the DB file, applies a changed auto_vacuum mode (see db_pragmas)
+vacuum;
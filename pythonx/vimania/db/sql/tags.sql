@@ -0,0 +1,16 @@
+-- name: get_related_tags
+-- tags used together with :tag, including :tag
+select distinct related.tag
+from vimania_tags tag
+         join vimania_todo_tags todo_tag on todo_tag.tag_id = tag.id
+         join vimania_todo_tags related_tag on related_tag.todo_id = todo_tag.todo_id
+         join vimania_tags related on related.id = related_tag.tag_id
+where tag.tag = :tag
+order by related.tag;
+
+
+-- name: get_all_tags
+select tag
+from vimania_tags
+order by tag;
+
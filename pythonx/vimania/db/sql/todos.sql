@@ -0,0 +1,307 @@
+-- name: insert_todo<!
+-- record_class: Todo
+-- id: reserved id or the next one of the sequence
+insert into vimania_todos (id, parent_id, todo, todo_hash, metadata, tags, desc, path, flags, created_at)
+values (coalesce(:id, (select next_id from vimania_id_seq)),
+        :parent_id, :todo, :todo_hash, :metadata, :tags, :desc, :path, :flags, :created_at)
+returning *;
+
+
+-- name: reserve_ids$
+-- returns the first id of a block of :n ids
+update vimania_id_seq
+set next_id = next_id + :n
+returning next_id - :n;
+
+
+-- name: update_todo<!
+update vimania_todos
+set parent_id = :parent_id,
+    todo      = :todo,
+    -- an update must not fail on an active duplicate: it keeps no hash instead
+    todo_hash = (select :todo_hash
+                 where not exists(select 1
+                                  from vimania_todos
+                                  where todo_hash = :todo_hash
+                                    and flags < 4
+                                    and id != :id)),
+    metadata  = :metadata,
+    tags      = :tags,
+    flags     = :flags,
+    desc      = :desc,
+    path      = :path,
+    last_update_ts = CURRENT_TIMESTAMP
+where id = :id
+  -- no-op updates would still rewrite the row
+  and (parent_id is not :parent_id
+    or todo is not :todo
+    or metadata is not :metadata
+    or tags is not :tags
+    or flags is not :flags
+    or desc is not :desc
+    or path is not :path)
+returning *;
+
+
+-- name: update_todos*!
+update vimania_todos
+set parent_id = :parent_id,
+    todo      = :todo,
+    -- an update must not fail on an active duplicate: it keeps no hash instead
+    todo_hash = (select :todo_hash
+                 where not exists(select 1
+                                  from vimania_todos
+                                  where todo_hash = :todo_hash
+                                    and flags < 4
+                                    and id != :id)),
+    metadata  = :metadata,
+    tags      = :tags,
+    flags     = :flags,
+    desc      = :desc,
+    path      = :path,
+    last_update_ts = CURRENT_TIMESTAMP
+where id = :id
+  -- no-op updates would still rewrite the row
+  and (parent_id is not :parent_id
+    or todo is not :todo
+    or metadata is not :metadata
+    or tags is not :tags
+    or flags is not :flags
+    or desc is not :desc
+    or path is not :path);
+
+
+-- name: delete_todo<!
+delete
+from vimania_todos
+where id = :id
+returning *;
+
+
+-- name: delete_todos*!
+delete
+from vimania_todos
+where id = :id;
+
+
+-- name: orphan_todos*!
+-- soft delete: the todo may show up again in another file
+update vimania_todos
+set flags          = 8,
+    last_update_ts = CURRENT_TIMESTAMP
+where id = :id
+  and path = :path  -- not moved to another file in the meantime
+  and flags != 8;
+
+
+-- name: purge_orphans
+-- orphans which did not show up in a buffer again within :days days
+delete
+from vimania_todos
+where flags = 8
+  and last_update_ts < datetime('now', '-' || :days || ' days')
+returning id;
+
+
+-- name: get_todo_by_id^
+-- record_class: Todo
+select *
+from vimania_todos
+where id = :id;
+
+
+-- name: get_todos_by_ids
+-- record_class: Todo
+select *
+from vimania_todos
+where id in (select value from json_each(:ids));
+
+
+-- name: get_active_todo_by_hash^
+-- record_class: Todo
+-- probes the partial unique index ix_vimania_todos_todo_hash
+select *
+from vimania_todos
+where todo_hash = :todo_hash
+  and flags < 4;
+
+
+-- name: set_todo_hashes*!
+-- rows which would duplicate an active todo keep NULL
+update or ignore vimania_todos
+set todo_hash = :todo_hash
+where id = :id;
+
+
+-- name: get_todos_without_hash
+-- partial index ix_vimania_todos_without_hash
+select id, todo
+from vimania_todos
+where todo_hash is null;
+
+
+-- name: get_active_todos_without_hash
+-- partial index ix_vimania_todos_without_hash
+select id, todo
+from vimania_todos
+where todo_hash is null
+  and flags < 4
+order by id;
+
+
+-- name: get_todos_by_path
+-- record_class: Todo
+select *
+from vimania_todos
+where path = :path
+  and flags < 8;
+
+
+-- name: search_todos
+-- record_class: Todo
+-- full rows from the content table: FTS only knows the indexed columns
+select vimania_todos.*
+from vimania_todos_fts
+         join vimania_todos on vimania_todos.id = vimania_todos_fts.rowid
+where vimania_todos_fts match :fts_query
+  and vimania_todos.flags < 8
+order by vimania_todos_fts.rank;
+
+
+-- name: search_todos_by_tags
+-- record_class: Todo
+-- FTS and tag filters (see Todos.filter) in one query
+select vimania_todos.*
+from vimania_todos_fts
+         join vimania_todos on vimania_todos.id = vimania_todos_fts.rowid
+where vimania_todos_fts match :fts_query
+  and vimania_todos.flags < 8
+  -- tag filters: JSON arrays of distinct tags, NULL: no filter
+  and (:tags_exact is null
+    or ((select count(*) from vimania_todo_tags where todo_id = vimania_todos.id) = json_array_length(:tags_exact)
+        and (json_array_length(:tags_exact) = 0
+            or vimania_todos.id in (select todo_id
+                                    from json_each(:tags_exact)
+                                             cross join vimania_tags on vimania_tags.tag = json_each.value
+                                             cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id
+                                    group by todo_id
+                                    having count(*) = json_array_length(:tags_exact)))))
+  and (:tags_all is null or json_array_length(:tags_all) = 0
+    or vimania_todos.id in (select todo_id
+                            from json_each(:tags_all)
+                                     cross join vimania_tags on vimania_tags.tag = json_each.value
+                                     cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id
+                            group by todo_id
+                            having count(*) = json_array_length(:tags_all)))
+  and (:tags_any is null
+    or vimania_todos.id in (select todo_id
+                            from json_each(:tags_any)
+                                     cross join vimania_tags on vimania_tags.tag = json_each.value
+                                     cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id))
+  and (:tags_any_not is null
+    or vimania_todos.id not in (select todo_id
+                                from json_each(:tags_any_not)
+                                         cross join vimania_tags on vimania_tags.tag = json_each.value
+                                         cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id))
+  and (:tags_all_not is null
+    or json_array_length(:tags_all_not) > 0
+        and vimania_todos.id not in (select todo_id
+                                     from json_each(:tags_all_not)
+                                              cross join vimania_tags on vimania_tags.tag = json_each.value
+                                              cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id
+                                     group by todo_id
+                                     having count(*) = json_array_length(:tags_all_not)))
+order by vimania_todos_fts.rank;
+
+
+-- name: get_todos_by_tags
+-- record_class: Todo
+-- search_todos_by_tags without FTS query and with a positive filter: the todos are
+-- joined from the todos of :tag_list (tags_exact, tags_all or tags_any)
+with candidates(todo_id) as (select distinct todo_id
+                             from json_each(:tag_list)
+                                      cross join vimania_tags on vimania_tags.tag = json_each.value
+                                      cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id)
+select vimania_todos.*
+from candidates
+         cross join vimania_todos on vimania_todos.id = candidates.todo_id
+where flags < 8
+  -- tag filters: JSON arrays of distinct tags, NULL: no filter
+  and (:tags_exact is null
+    or ((select count(*) from vimania_todo_tags where todo_id = vimania_todos.id) = json_array_length(:tags_exact)
+        and (json_array_length(:tags_exact) = 0
+            or vimania_todos.id in (select todo_id
+                                    from json_each(:tags_exact)
+                                             cross join vimania_tags on vimania_tags.tag = json_each.value
+                                             cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id
+                                    group by todo_id
+                                    having count(*) = json_array_length(:tags_exact)))))
+  and (:tags_all is null or json_array_length(:tags_all) = 0
+    or vimania_todos.id in (select todo_id
+                            from json_each(:tags_all)
+                                     cross join vimania_tags on vimania_tags.tag = json_each.value
+                                     cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id
+                            group by todo_id
+                            having count(*) = json_array_length(:tags_all)))
+  and (:tags_any is null
+    or vimania_todos.id in (select todo_id
+                            from json_each(:tags_any)
+                                     cross join vimania_tags on vimania_tags.tag = json_each.value
+                                     cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id))
+  and (:tags_any_not is null
+    or vimania_todos.id not in (select todo_id
+                                from json_each(:tags_any_not)
+                                         cross join vimania_tags on vimania_tags.tag = json_each.value
+                                         cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id))
+  and (:tags_all_not is null
+    or json_array_length(:tags_all_not) > 0
+        and vimania_todos.id not in (select todo_id
+                                     from json_each(:tags_all_not)
+                                              cross join vimania_tags on vimania_tags.tag = json_each.value
+                                              cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id
+                                     group by todo_id
+                                     having count(*) = json_array_length(:tags_all_not)))
+order by last_update_ts desc;
+
+
+-- name: get_todos_by_excluded_tags
+-- record_class: Todo
+-- search_todos_by_tags without FTS query and without a positive filter: all todos but
+-- the excluded ones, tags_exact is NULL or empty (todos without tags)
+select *
+from vimania_todos
+where flags < 8
+  and (:tags_exact is null
+    or not exists(select 1 from vimania_todo_tags where todo_id = vimania_todos.id))
+  and (:tags_any_not is null
+    or vimania_todos.id not in (select todo_id
+                                from json_each(:tags_any_not)
+                                         cross join vimania_tags on vimania_tags.tag = json_each.value
+                                         cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id))
+  and (:tags_all_not is null
+    or json_array_length(:tags_all_not) > 0
+        and vimania_todos.id not in (select todo_id
+                                     from json_each(:tags_all_not)
+                                              cross join vimania_tags on vimania_tags.tag = json_each.value
+                                              cross join vimania_todo_tags on vimania_todo_tags.tag_id = vimania_tags.id
+                                     group by todo_id
+                                     having count(*) = json_array_length(:tags_all_not)))
+order by last_update_ts desc;
+
+
+-- name: get_highlights
+-- matches in todo marked by :start and :end, best matching fragment of desc
+select rowid                                                       as id,
+       highlight(vimania_todos_fts, 0, :start, :end)               as todo,
+       snippet(vimania_todos_fts, 3, :start, :end, '...', 12)      as "desc"
+from vimania_todos_fts
+where vimania_todos_fts match :fts_query
+  and rowid in (select value from json_each(:ids));
+
+
+-- name: get_all_todos
+-- record_class: Todo
+select *
+from vimania_todos
+where flags < 8
+order by last_update_ts desc;
@@ -6,7 +6,7 @@ Edit service environment to override
 ################################################################################
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import BaseSettings
 
@@ -17,8 +17,39 @@ ROOT_DIR = Path(__file__).parent.absolute()
 class Environment(BaseSettings):
     log_level: str = "INFO"
     tw_vimania_db_url: str = f"sqlite:///{ROOT_DIR}/db/todos.db"
+    tw_vimania_db_pool_size: int = 5  # warm connections kept per DB
+    tw_vimania_db_idle_timeout: int = 300  # seconds until an unused pool is closed
+    # SQLite PRAGMAs of every DB connection, see https://www.sqlite.org/pragma.html
+    tw_vimania_db_auto_vacuum: str = "incremental"  # new DBs only, see DAL.maintain
+    tw_vimania_db_journal_mode: str = "wal"  # concurrent readers while vim writes
+    tw_vimania_db_synchronous: str = "normal"  # WAL: no fsync per commit
+    tw_vimania_db_mmap_size: int = 64 * 1024 * 1024  # bytes
+    tw_vimania_db_cache_size: int = -16000  # negative: KiB
+    tw_vimania_db_busy_timeout: int = 5000  # ms to wait for a lock
+    tw_vimania_db_temp_store: str = "memory"
+    tw_vimania_sync_async: bool = False  # save writes to the DB in the background
+    tw_vimania_sync_queue_size: int = 8  # buffers waiting for the writer
+    tw_vimania_id_block_size: int = 32  # todo ids reserved at once for new todos
+    tw_vimania_maintain_interval: int = (
+        3600  # s between maintenance in idle vim, 0: off
+    )
+    tw_vimania_orphan_days: int = (
+        30  # orphaned todos are purged after, see DAL.maintain
+    )
     twbm_db_url: Optional[str] = None  # = f"sqlite:///{ROOT_DIR}/db/bm.db"
 
+    @property
+    def db_pragmas(self) -> Dict[str, object]:
+        return dict(
+            auto_vacuum=self.tw_vimania_db_auto_vacuum,  # before any table is created
+            journal_mode=self.tw_vimania_db_journal_mode,
+            synchronous=self.tw_vimania_db_synchronous,
+            mmap_size=self.tw_vimania_db_mmap_size,
+            cache_size=self.tw_vimania_db_cache_size,
+            busy_timeout=self.tw_vimania_db_busy_timeout,
+            temp_store=self.tw_vimania_db_temp_store,
+        )
+
     @property
     def dbfile(self):
         return f"{self.tw_vimania_db_url.split('sqlite:///')[-1]}"
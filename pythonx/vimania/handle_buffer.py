@@ -32,12 +32,26 @@
 """
 import logging
 import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Match, List, Optional
+from typing import (
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    Match,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
-from pydantic import BaseModel
 from vimania.db.dal import TodoStatus, Todo, DAL
 from vimania.environment import config
 
@@ -45,7 +59,10 @@ _log = logging.getLogger("xxx-plugin.handle_buffer")
 ROOT_DIR = Path(__file__).parent.absolute()
 
 
-class VimTodo(BaseModel):
+@dataclass(slots=True)
+class VimTodo:
+    """todo of a buffer line, created for every todo line on every read/write"""
+
     raw_code: str = ""
     todo: str = ""
     raw_status: str = " "
@@ -117,8 +134,17 @@ class Line:
         r"""^(\t*)(\s*[-*]\s?)(%\d+%)?(.?)(\[[ \-xXdD]{1}])( )([^{}]+?)({t:.+})?$"""
     )
 
-    def __init__(self, line, path, running_todos: List["Line"] = None):
+    def __init__(
+        self,
+        line,
+        path,
+        running_todos: List["Line"] = None,
+        dal: DAL = None,
+        match: Match = None,
+    ):
+        """match: result of Line.pattern for line, if already known (see tokenize)"""
         self._line: str = line
+        self.dal: Optional[DAL] = dal  # shared DAL of a running BufferSync
         self.is_todo = False
         if running_todos is not None:
             self.running_todos = running_todos
@@ -126,8 +152,9 @@ class Line:
             self.running_todos = list()
         self.depth: int = 0  # number of tabs (positive number)
         self.parent_id: Optional[int] = None
+        self.is_unchanged = False  # existing todo, DB row already up to date
         self.path: str = path
-        self.match: Match = self.pattern.match(line)
+        self.match: Match = match if match is not None else self.pattern.match(line)
         if self.match is not None:
             self.is_todo = True
             self.todo = self.parse_vim_todo()
@@ -163,12 +190,25 @@ class Line:
     def __repr__(self):
         return self.line
 
-    def handle_read(self) -> Optional[str]:
+    @contextmanager
+    def _dal(self) -> Iterator[DAL]:
+        """yields the shared DAL if given, otherwise a private one for this call"""
+        if self.dal is not None:
+            yield self.dal
+        else:
+            with DAL(env_config=config) as dal:
+                yield dal
+
+    def handle_read(
+        self, todos: Dict[int, Todo] = None, depths: Dict[int, int] = None
+    ) -> Optional[str]:
         """handles a vim buffer line in read mode and updates todos from DB
 
         creation in DB should only happen, if a md-file has been re-initialized. Otherwise all todos should exist
         with id and only be updated from DB
 
+        todos/depths: prefetched DB state of the buffer, queried per line if not given
+
         returns updated line or None for deletion in buffer
         """
         if self.todo is not None:
@@ -182,7 +222,7 @@ class Line:
                 code = self.create_todo()
                 self.todo.add_code(code)
             else:
-                todo = self.update_buffer_from_db()  # update from DB
+                todo = self.update_buffer_from_db(todos, depths)  # update from DB
                 if todo is None:
                     return None
         return self.line
@@ -214,7 +254,7 @@ class Line:
     def calc_parent_id(self):
         self.parent_id = None
 
-        with DAL(env_config=config) as dal:
+        with self._dal() as dal:
             if len(self.running_todos) > 0:
                 prev_line = self.running_todos[-1]
                 _log.debug(f"{self=}:{self.depth}, {prev_line=}:{prev_line.depth}")
@@ -238,8 +278,10 @@ class Line:
                     )
                     self.parent_id = parent_todo.parent_id
 
-    def create_todo(self) -> str:
+    def create_todo(self, id_: int = None) -> str:
+        """id_: reserved id, see BufferWriter"""
         todo = Todo(
+            id=id_,
             parent_id=self.parent_id,
             todo=self.todo.todo,
             path=self.path,
@@ -247,63 +289,76 @@ class Line:
             created_at=datetime.utcnow(),
             tags=self.todo.tags_db_formatted,
         )
-        with DAL(env_config=config) as dal:
-            todos = dal.get_todos(fts_query=f'"{todo.todo}"')
-            if len(todos) >= 1:
-                active_todos = [
-                    todo
-                    for todo in todos
-                    if todo.flags < TodoStatus.DONE and todo.id is not None
-                ]
-                if len(active_todos) > 0:
-                    raise ValueError(
-                        f"Same active todo already exists: {[td.id for td in active_todos]}. Clear DB inconsistency"
-                    )
-                else:
-                    _log.debug(f"Creating todo: {todo.todo}")
-                    id_ = dal.insert_todo(todo)
+        with self._dal() as dal:
+            active_todo = dal.get_active_todo(todo.todo)
+            if active_todo is not None:
+                raise ValueError(
+                    f"Same active todo already exists: {[active_todo.id]}. Clear DB inconsistency"
+                )
+            _log.debug(f"Creating todo: {todo.todo}")
+            id_ = dal.insert_todo(todo)
         return str(id_)
 
     def delete_todo(self):
         _log.debug(f"{self=}")
         if self.todo.code is None or self.todo.code == "":
             return  # nothing to do, not in DB yet
-        with DAL(env_config=config) as dal:
+        with self._dal() as dal:
             _log.debug(f"Deleting: {self.todo.code}")
             dal.delete_todo(int(self.todo.code))
 
     def update_todo(self) -> Optional[Todo]:
         """update existing todo_, if not found in DB delete it in vim-buffer"""
-        with DAL(env_config=config) as dal:
+        with self._dal() as dal:
             todo = dal.get_todo_by_id(int(self.todo.code))
             if todo.id is None:
                 _log.info(f"Cannot update non existing todo: {self.todo.code}")
                 _log.info(f"Deleting from vim")
                 return None
-            todo.todo = self.todo.todo
-            todo.flags = self.todo.status
-            todo.path = self.path
-            todo.parent_id = self.parent_id
-            todo.tags = self.todo.tags_db_formatted
+            new = dict(
+                todo=self.todo.todo,
+                flags=self.todo.status,
+                path=self.path,
+                parent_id=None if self.parent_id is None else int(self.parent_id),
+                tags=self.todo.tags_db_formatted,
+            )
+            if all(getattr(todo, k) == v for k, v in new.items()):
+                self.is_unchanged = True  # no write, no trigger and index churn
+                return todo
+            for k, v in new.items():
+                setattr(todo, k, v)
             _log.debug(f"Updating in DB: {self.todo}")
             dal.update_todo(todo)
             return todo
 
-    def update_buffer_from_db(self) -> Optional[Todo]:
+    def update_buffer_from_db(
+        self, todos: Dict[int, Todo] = None, depths: Dict[int, int] = None
+    ) -> Optional[Todo]:
         """update existing todo_, if not found in DB delete it in vim-buffer"""
-        with DAL(env_config=config) as dal:
-            todo = dal.get_todo_by_id(int(self.todo.code))
-            if todo.id is None:
-                _log.info(f"Cannot update non existing todo: {self.todo.code}")
-                _log.info(f"Deleting from vim")
-                return None
-            self.todo.todo = todo.todo
-            self.todo.set_status(
-                todo.flags
-            )  # https://github.com/samuelcolvin/pydantic/issues/1577
-            self.depth = dal.get_depth(todo.id)
-            _log.debug(f"Updating in buffer: {self.todo}, {self.depth=}")
-            return todo
+        id_ = int(self.todo.code)
+        if todos is not None:
+            todo = todos.get(id_, Todo())
+        else:
+            with self._dal() as dal:
+                todo = dal.get_todo_by_id(id_)
+        if todo.id is None:
+            _log.info(f"Cannot update non existing todo: {self.todo.code}")
+            _log.info(f"Deleting from vim")
+            return None
+        if todo.flags == TodoStatus.TODELETE:
+            _log.debug(f"Orphaned todo, revived by the next save: {self.todo}")
+            return todo  # line kept as it is, the DB has no status and depth for it
+        self.todo.todo = todo.todo
+        self.todo.set_status(
+            todo.flags
+        )  # https://github.com/samuelcolvin/pydantic/issues/1577
+        if depths is not None:
+            self.depth = depths.get(todo.id, 0)
+        else:
+            with self._dal() as dal:
+                self.depth = dal.get_depth(todo.id)
+        _log.debug(f"Updating in buffer: {self.todo}, {self.depth=}")
+        return todo
 
     def parse_vim_todo(self) -> VimTodo:
         match = self.match
@@ -321,38 +376,369 @@ class Line:
         return self.todo
 
 
-def handle_it(lines: List[str], path: str, read: bool = False) -> List[str]:
-    new_lines: List[str] = list()
-    running_todos: List[Line] = list()
-    is_in_code_fence = False
-    parent_todo: Optional[Line] = None
-    was_previous_line_todo = False
-
-    for l in lines:
-
-        # do not evaluate text within code fences
-        if l.strip().startswith("```"):
-            is_in_code_fence = True if is_in_code_fence is False else False
-        if is_in_code_fence:
-            new_lines.append(l)
-            continue
+def _fence(line: str) -> Optional[str]:
+    """fence character ('`' or '~') if the line opens or closes a code fence"""
+    stripped = line.lstrip()
+    if stripped.startswith("```"):
+        return "`"
+    if stripped.startswith("~~~"):
+        return "~"
+    return None
+
+
+class TodoToken(NamedTuple):
+    index: int  # line number, 0 based
+    line: str
+    match: Match  # of Line.pattern
+
+
+def tokenize(lines: Iterable[str]) -> Iterator[TodoToken]:
+    """yields the todo lines outside of code fences (``` and ~~~) in one pass
 
-        # line = Line(l.strip("'"), path=path, running_todos=running_todos)  # TODO: BUG single quote
-        line = Line(l, path=path, running_todos=running_todos)
-        if read:
-            new_line = line.handle_read()
+    A todo starts with '-' or '*' after indentation and has a '[' shortly after, all
+    other lines are rejected without running the regex.
+    """
+    pattern = Line.pattern
+    fence = None  # character of the open fence
+    for i, l in enumerate(lines):
+        first = l[:1]
+        if first == "\t" or first == " ":
+            stripped = l.lstrip()
+            first = stripped[:1]
         else:
-            new_line = line.handle()
+            stripped = l
+        if first == "`" or first == "~":
+            marker = _fence(stripped)
+            if marker is not None:
+                fence = (
+                    marker if fence is None else (None if marker == fence else fence)
+                )
+            continue
+        if fence is not None or (first != "-" and first != "*"):
+            continue
+        if stripped.find("[", 1, 32) == -1:  # '-%123456% [': code, blanks, status
+            continue
+        match = pattern.match(l)
+        if match is not None:
+            yield TodoToken(i, l, match)
+
+
+def _todo_key(line: str, depth: int, parents: List[Tuple[int, int]]) -> int:
+    """hash of a todo line and its chain of parent lines
+
+    parents holds (depth, key) of the enclosing todo lines and is updated for the next line.
+    """
+    while len(parents) > 0 and parents[-1][0] >= depth:
+        parents.pop()
+    key = hash((line, parents[-1][1] if len(parents) > 0 else None))
+    parents.append((depth, key))
+    return key
+
+
+class Snapshot(NamedTuple):
+    """todo lines of a buffer as last read from or written to the DB"""
+
+    keys: FrozenSet[int]  # a todo line is unchanged if its key is in the snapshot
+    ids: FrozenSet[int]  # todos of the file
+
+
+def take_snapshot(lines: Iterable[str]) -> Snapshot:
+    keys = set()
+    ids = set()
+    parents: List[Tuple[int, int]] = list()
+    previous = -2
+    for token in tokenize(lines):
+        if token.index != previous + 1:  # other lines in between
+            parents = list()
+        previous = token.index
+        depth = token.match.group(MatchEnum.LEVEL.value).count("\t")
+        keys.add(_todo_key(token.line, depth, parents))
+        code = token.match.group(MatchEnum.CODE.value)
+        if code:
+            ids.add(int(code.strip("%")))
+    return Snapshot(frozenset(keys), frozenset(ids))
+
+
+# per file: snapshot of the buffer after the last synchronization
+snapshots: Dict[str, Snapshot] = dict()
+
+
+@dataclass(slots=True)
+class SyncStats:
+    """Counters and timing of one buffer synchronization"""
+
+    path: str = ""
+    mode: str = "write"
+    lines: int = 0
+    todos: int = 0
+    created: int = 0
+    updated: int = 0
+    moved: int = 0  # from another file
+    deleted: int = 0
+    orphaned: int = 0  # in DB for this file, but no longer in the buffer
+    unchanged: int = 0
+    elapsed_ms: float = 0.0
+
+    def __str__(self):
+        return (
+            f"{self.mode} {self.path}: {self.lines} lines, {self.todos} todos "
+            f"(+{self.created} ~{self.updated} >{self.moved} -{self.deleted} "
+            f"?{self.orphaned} ={self.unchanged}) in {self.elapsed_ms:.1f}ms"
+        )
 
-        if new_line is not None:
-            new_lines.append(new_line)
 
-        if line.is_todo:
+# most recent synchronizations, newest last
+sync_history: Deque[SyncStats] = deque(maxlen=50)
+
+
+class BufferSync:
+    """Synchronizes a vim buffer with the DB
+
+    All lines share one DAL and one transaction, so a save costs one connection and
+    one commit independent of the number of todos in the buffer.
+
+    scoped: in write mode the buffer is diffed against all DB todos of the file, fetched
+    with one query. Parents are derived from the indentation of the buffer. Created todos
+    are inserted, the rest of the diff is applied in bulk:
+        updated:  todo of the file which changed
+        moved:    todo of another file (or orphaned), path is set to this file
+        orphaned: todo of the file which is no longer in the buffer, marked TODELETE
+    Cost scales with the todos of the file, not with the DB.
+
+    incremental: with scoped and a snapshot of the file only todo lines which changed or
+    whose parent changed since the last read/write are fetched and diffed, orphans are
+    the todos of the snapshot missing in the buffer: cost scales with the changes.
+
+    reserved: ids reserved for the buffer (see vimania.writer), a todo line with a reserved
+    id which is not in the DB yet is created with that id.
+
+    edits: (index, new line or None for deletion) of all lines that differ from the input
+    """
+
+    def __init__(
+        self,
+        path: str,
+        read: bool = False,
+        incremental: bool = False,
+        scoped: bool = False,
+        reserved: Iterable[int] = (),
+    ):
+        self.path = path
+        self.read = read
+        self.scoped = scoped and not read
+        self.reserved = frozenset(reserved)
+        self.created_ids: List[int] = list()
+        self.snapshot: Optional[Snapshot] = (
+            snapshots.get(path) if incremental and self.scoped else None
+        )
+        self.stats = SyncStats(path=path, mode="read" if read else "write")
+        self.todos: Dict[int, Todo] = dict()  # prefetched DB state in read mode
+        self.depths: Dict[int, int] = dict()
+        self.edits: List[Tuple[int, Optional[str]]] = list()
+
+    def run(self, lines: List[str]) -> List[str]:
+        start = time.perf_counter()
+        try:
+            with DAL(env_config=config) as dal, dal.transaction():
+                if self.read:
+                    self._prefetch(lines, dal)
+                if self.scoped:
+                    new_lines = self._process_scoped(lines, dal)
+                else:
+                    new_lines = self._process(lines, dal)
+        except Exception:
+            snapshots.pop(self.path, None)  # DB state unknown: next save syncs all
+            raise
+        snapshots[self.path] = take_snapshot(new_lines)
+        self.stats.elapsed_ms = (time.perf_counter() - start) * 1000
+        sync_history.append(self.stats)
+        _log.debug(f"Synchronized: {self.stats}")
+        return new_lines
+
+    def _prefetch(self, lines: List[str], dal: DAL):
+        """loads all todos referenced in the buffer and their depths in two queries"""
+        codes = list()
+        for token in tokenize(lines):
+            code = token.match.group(MatchEnum.CODE.value)
+            if code:
+                codes.append(int(code.strip("%")))
+        self.stats.todos = len(codes)
+        self.todos = dal.get_todos_by_ids(codes)
+        self.depths = dal.get_depths(self.todos.keys())
+
+    def _process(self, lines: List[str], dal: DAL) -> List[str]:
+        """only todo lines are looked at, all other lines are kept as they are"""
+        running_todos: List[Line] = list()
+        self.stats.lines = len(lines)
+        previous = -2
+
+        for token in tokenize(lines):
+            if token.index != previous + 1:  # other lines in between: reset
+                running_todos = list()
+            previous = token.index
+
+            # line = Line(l.strip("'"), path=path, running_todos=running_todos)  # TODO: BUG single quote
+            line = Line(
+                token.line,
+                path=self.path,
+                running_todos=running_todos,
+                dal=dal,
+                match=token.match,
+            )
+            if self.read:
+                new_line = line.handle_read(self.todos, self.depths)
+            else:
+                new_line = line.handle()
+                self._count(line)
+
+            if new_line != token.line:
+                self.edits.append((token.index, new_line))
             running_todos.append(line)
-        else:  # reset
-            running_todos = list()
 
-    return new_lines
+        return self._apply_edits(lines)
+
+    def _process_scoped(self, lines: List[str], dal: DAL) -> List[str]:
+        self.stats.lines = len(lines)
+        # (index, line, unchanged since the snapshot)
+        todo_lines: List[Tuple[int, Line, bool]] = list()
+        keys: List[Tuple[int, int]] = list()
+        previous = -2
+        for token in tokenize(lines):
+            if token.index != previous + 1:
+                keys = list()
+            previous = token.index
+            line = Line(token.line, path=self.path, dal=dal, match=token.match)
+            todo_lines.append((token.index, line, self._is_unchanged(line, keys)))
+
+        codes = {
+            int(line.todo.code)
+            for _, line, _ in todo_lines
+            if line.todo.code not in ("", None)
+        }
+        if self.snapshot is None:
+            rows = dal.get_todos_by_path(self.path)
+            foreign = dal.get_todos_by_ids(codes - rows.keys())
+            known = rows.keys()
+        else:
+            changed = {
+                int(line.todo.code)
+                for _, line, unchanged in todo_lines
+                if not unchanged and line.todo.code not in ("", None)
+            }
+            rows = dict()
+            foreign = dict()
+            for id_, todo in dal.get_todos_by_ids(changed).items():
+                is_own = todo.path == self.path and todo.flags < TodoStatus.TODELETE
+                (rows if is_own else foreign)[id_] = todo
+            known = self.snapshot.ids
+
+        parents: List[Tuple[int, int]] = list()  # (depth, id) of enclosing todos
+        updates: Dict[int, Todo] = dict()
+        deletes: List[int] = list()
+        previous = -2
+
+        for i, line, unchanged in todo_lines:
+            if i != previous + 1:  # other lines in between: new hierarchy
+                parents = list()
+            previous = i
+
+            self.stats.todos += 1
+            while len(parents) > 0 and parents[-1][0] >= line.depth:
+                parents.pop()
+            line.parent_id = parents[-1][1] if len(parents) > 0 else None
+
+            if unchanged:
+                self.stats.unchanged += 1
+                new_line = line._line
+            elif line.todo.status is TodoStatus.TODELETE:
+                if line.todo.code not in ("", None):
+                    deletes.append(int(line.todo.code))
+                self.stats.deleted += 1
+                new_line = None
+            elif line.todo.code == "":
+                line.todo.add_code(line.create_todo())
+                self.created_ids.append(int(line.todo.code))
+                self.stats.created += 1
+                new_line = line.line
+            else:
+                id_ = int(line.todo.code)
+                todo = updates.get(id_) or rows.get(id_) or foreign.get(id_)
+                if todo is None and id_ in self.created_ids:
+                    new_line = line.line  # copy of a line created above
+                elif todo is None and id_ in self.reserved:
+                    line.create_todo(id_)
+                    self.created_ids.append(id_)
+                    self.stats.created += 1
+                    new_line = line.line
+                elif todo is None:
+                    _log.info(f"Deleting non existing todo from vim: {id_}")
+                    new_line = None
+                else:
+                    self._diff(line, todo, updates, is_moved=id_ not in rows)
+                    new_line = line.line
+
+            if new_line is not None:
+                parents.append((line.depth, int(line.todo.code)))
+            if new_line != line._line:
+                self.edits.append((i, new_line))
+
+        orphans = known - codes
+        self.stats.orphaned = dal.orphan_todos(orphans, self.path)
+        dal.update_todos(updates.values())
+        dal.delete_todos(deletes)
+        return self._apply_edits(lines)
+
+    def _apply_edits(self, lines: List[str]) -> List[str]:
+        new_lines = list(lines)
+        for i, new_line in reversed(self.edits):
+            if new_line is None:
+                del new_lines[i]
+            else:
+                new_lines[i] = new_line
+        return new_lines
+
+    def _diff(self, line: Line, todo: Todo, updates: Dict[int, Todo], is_moved: bool):
+        """records the todo for update if the buffer line differs from the DB state"""
+        new = dict(
+            todo=line.todo.todo,
+            flags=line.todo.status,
+            path=self.path,
+            parent_id=line.parent_id,
+            tags=line.todo.tags_db_formatted,
+        )
+        if all(getattr(todo, k) == v for k, v in new.items()):
+            self.stats.unchanged += 1
+            return
+        if todo.id not in updates:
+            if is_moved:
+                self.stats.moved += 1
+            else:
+                self.stats.updated += 1
+        updates[todo.id] = replace(todo, **new)
+
+    def _is_unchanged(self, line: "Line", parents: List[Tuple[int, int]]) -> bool:
+        if self.snapshot is None:
+            return False
+        key = _todo_key(line._line, line.depth, parents)
+        return line.todo.code != "" and key in self.snapshot.keys
+
+    def _count(self, line: "Line"):
+        """counts a handled line, the code of the buffer line tells if it was new"""
+        if not line.is_todo:
+            return
+        self.stats.todos += 1
+        if line.todo.status is TodoStatus.TODELETE:
+            self.stats.deleted += 1
+        elif not line.match.group(MatchEnum.CODE.value):
+            self.stats.created += 1
+        elif line.is_unchanged:
+            self.stats.unchanged += 1
+        else:
+            self.stats.updated += 1
+
+
+def handle_it(lines: List[str], path: str, read: bool = False) -> List[str]:
+    return BufferSync(path, read=read).run(lines)
 
 
 def delete_todo_(text: str, path: str) -> int:
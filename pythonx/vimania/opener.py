@@ -0,0 +1,118 @@
+"""Non-blocking URI opener
+
+Handlers (xdg-open, open, explorer.exe) are launched in their own session with
+stdio detached from vim, vim continues right away. Some handlers take seconds or
+never return: launched processes are kept in a small registry and reaped by a
+background thread, so they neither block vim nor linger as zombies.
+"""
+import logging
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from vimania.background import Worker
+
+_log = logging.getLogger("vimania-plugin.opener")
+
+if sys.platform.startswith("win32"):
+    OS_OPEN = "explorer.exe"
+elif sys.platform.startswith("linux"):
+    OS_OPEN = "xdg-open"
+elif sys.platform.startswith("darwin"):
+    OS_OPEN = "open"
+else:
+    OS_OPEN = None
+
+
+class Launched(NamedTuple):
+    process: subprocess.Popen
+    uri: str
+    started: float  # time.monotonic()
+
+
+class Opener:
+    """Launches detached handler processes and reaps them in the background"""
+
+    def __init__(self, command: str = OS_OPEN, reap_interval: float = 0.5):
+        self.command = command
+        self.reap_interval = reap_interval
+        self.running: Dict[int, Launched] = dict()  # pid -> launched handler
+        self._cond = threading.Condition()
+        self._reaper = Worker("vimania-reaper", self._next_reap, self._cond)
+
+    def open(self, uri: str) -> int:
+        """launches the handler for uri without waiting for it, returns its pid"""
+        kwargs = dict(
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+        )
+        if sys.platform.startswith("win32"):
+            kwargs["creationflags"] = subprocess.DETACHED_PROCESS
+        else:
+            kwargs["start_new_session"] = True  # not killed with vim's process group
+        process = subprocess.Popen([self.command, uri], **kwargs)
+        _log.debug(f"Opening: {uri}, pid={process.pid}")
+        with self._cond:
+            self.running[process.pid] = Launched(process, uri, time.monotonic())
+            self._reaper.start()
+            self._cond.notify_all()
+        return process.pid
+
+    def open_all(self, uris: Sequence[str], max_workers: int = 8) -> List[int]:
+        """launches the handlers of all uris in parallel, returns their pids"""
+        if len(uris) <= 1:
+            return [self.open(uri) for uri in uris]
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(uris)), thread_name_prefix="vimania-open"
+        ) as executor:
+            return list(executor.map(self.open, uris))
+
+    def reap(self) -> int:
+        """removes finished handlers from the registry, returns their number"""
+        with self._cond:
+            finished = [
+                pid
+                for pid, launched in self.running.items()
+                if launched.process.poll() is not None
+            ]
+            for pid in finished:
+                launched = self.running.pop(pid)
+                elapsed = time.monotonic() - launched.started
+                _log.debug(f"Finished after {elapsed:.1f}s: {launched.uri}")
+                if launched.process.returncode != 0:
+                    _log.warning(
+                        f"{self.command} {launched.uri} failed: {launched.process.returncode}"
+                    )
+            if len(finished) > 0:
+                self._cond.notify_all()
+            return len(finished)
+
+    def wait(self, timeout: float = None) -> bool:
+        """waits until all handlers finished, False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self.running) == 0, timeout)
+
+    def _next_reap(self):  # with _cond held
+        if len(self.running) == 0:
+            return None
+        return self._reap_later
+
+    def _reap_later(self):
+        time.sleep(self.reap_interval)
+        self.reap()
+
+
+_opener: Optional[Opener] = None
+
+
+def get_opener() -> Opener:
+    """the opener of the vim process"""
+    global _opener
+    if _opener is None:
+        _opener = Opener()
+    return _opener
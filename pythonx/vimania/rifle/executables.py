@@ -0,0 +1,136 @@
+"""Index of the executables on $PATH for rifle `has` conditions
+
+Scanning every $PATH directory costs tens of milliseconds with a large PATH. The
+index keeps the executables of each directory together with the directory's mtime
+in a cache file, so a new vim session starts without a scan and only directories
+which changed since (programs installed or removed) are listed again.
+
+The directories are checked at most every REFRESH_INTERVAL seconds, in between a
+`has` condition is a set lookup.
+"""
+import json
+import logging
+import os
+import time
+from stat import S_IFREG, S_IXOTH
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+_log = logging.getLogger("vimania-plugin.executables")
+
+REFRESH_INTERVAL = 1.0  # seconds
+CACHE_VERSION = 1
+
+
+def default_cache_file() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "vimania", "executables.json")
+
+
+def path_dirs() -> List[str]:
+    """directories of $PATH, in order, without duplicates"""
+    if "PATH" in os.environ:
+        paths = os.environ["PATH"].split(":")
+    else:
+        paths = ["/usr/bin", "/bin"]
+    return list(dict.fromkeys(path for path in paths if path != ""))
+
+
+def scan(directory: str) -> List[str]:
+    """executable files of directory"""
+    executables = list()
+    try:
+        entries = os.scandir(directory)
+    except OSError:
+        return executables
+    with entries:
+        for entry in entries:
+            try:
+                mode = entry.stat().st_mode  # follows symlinks
+            except OSError:
+                continue
+            if mode & (S_IXOTH | S_IFREG):  # same test as rifle
+                executables.append(entry.name)
+    return executables
+
+
+class ExecutableIndex:
+    """Executables on $PATH, persisted in cache_file and refreshed per directory"""
+
+    def __init__(self, cache_file: Optional[str] = None):
+        self.cache_file = cache_file if cache_file is not None else default_cache_file()
+        # directory -> (mtime_ns, executables), mtime_ns None: directory not readable
+        self.dirs: Dict[str, Tuple[Optional[int], List[str]]] = dict()
+        self._executables: FrozenSet[str] = frozenset()
+        self._key: Tuple = ()  # (directory, mtime_ns) of $PATH behind _executables
+        self._checked = None  # time.monotonic() of the last refresh
+        self._load()
+
+    def executables(self) -> FrozenSet[str]:
+        if self._checked is None or time.monotonic() - self._checked > REFRESH_INTERVAL:
+            self.refresh()
+        return self._executables
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.executables()
+
+    def refresh(self) -> int:
+        """lists the $PATH directories whose mtime changed, returns their number"""
+        self._checked = time.monotonic()
+        key = list()
+        scanned = 0
+        for directory in path_dirs():
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                mtime = None
+            cached = self.dirs.get(directory)
+            if cached is None or cached[0] != mtime:
+                executables = scan(directory) if mtime is not None else []
+                self.dirs[directory] = (mtime, executables)
+                scanned += 1
+            key.append((directory, mtime))
+
+        key = tuple(key)
+        if key != self._key:
+            self._key = key
+            self._executables = frozenset(
+                name for directory, _ in key for name in self.dirs[directory][1]
+            )
+        if scanned > 0:
+            _log.debug(f"Scanned {scanned} PATH directories")
+            self._save()
+        return scanned
+
+    def _load(self):
+        try:
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                return
+            self.dirs = {
+                directory: (mtime, executables)
+                for directory, (mtime, executables) in data["dirs"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            self.dirs = dict()  # rebuilt by the next refresh
+
+    def _save(self):
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp_file, "w") as f:
+                json.dump(dict(version=CACHE_VERSION, dirs=self.dirs), f)
+            os.replace(tmp_file, self.cache_file)  # atomic for concurrent vims
+        except OSError as e:
+            _log.warning(f"Cannot write executable index {self.cache_file}: {e}")
+
+
+_index: Optional[ExecutableIndex] = None
+
+
+def get_executables() -> FrozenSet[str]:
+    """Return all executable files in $PATH, see ExecutableIndex"""
+    global _index
+    if _index is None:
+        _index = ExecutableIndex()
+    return _index.executables()
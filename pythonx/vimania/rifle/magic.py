@@ -0,0 +1,132 @@
+"""Mimetype detection from file content, without spawning `file`
+
+Covers the types rifle.conf dispatches on: PDF, images, audio/video, archives,
+office documents and text. Unknown content and special files (FIFOs, sockets,
+devices) yield None, the caller falls back to `file --mime-type`.
+
+Results are cached per (device, inode, mtime, size): renamed files and links
+hit the cache, modified files do not.
+"""
+import os
+import stat as stat_
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+CACHE_SIZE = 1024
+SAMPLE_SIZE = 4096  # bytes read from the start of a file
+
+# (offset, magic bytes, mimetype), first match wins
+SIGNATURES: Tuple[Tuple[int, bytes, str], ...] = (
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (0, b"\x00\x00\x01\x00", "image/vnd.microsoft.icon"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"\x1a\x45\xdf\xa3", "video/x-matroska"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"BZh", "application/x-bzip2"),
+    (0, b"\xfd7zXZ\x00", "application/x-xz"),
+    (0, b"\x28\xb5\x2f\xfd", "application/zstd"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (0, b"Rar!\x1a\x07", "application/x-rar"),
+    (257, b"ustar", "application/x-tar"),
+)
+RIFF = {b"WEBP": "image/webp", b"WAVE": "audio/x-wav", b"AVI ": "video/x-msvideo"}
+OOXML = (
+    (
+        b"word/",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ),
+    (b"xl/", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    (
+        b"ppt/",
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ),
+)
+
+_cache: "OrderedDict[Tuple[int, int, int, int], Optional[str]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _zip_mimetype(sample: bytes) -> str:
+    # OpenDocument: uncompressed first entry "mimetype" holding the type
+    if sample[30:38] == b"mimetype":
+        end = sample.find(b"PK", 38)
+        mimetype = sample[38 : end if end > 0 else 38 + 80]
+        if mimetype.startswith(b"application/vnd.oasis"):
+            return mimetype.decode("ascii", "replace")
+    # Office Open XML: part names in the local headers
+    if sample[30:49] == b"[Content_Types].xml" or sample[30:36] == b"_rels/":
+        for part, mimetype in OOXML:
+            if part in sample:
+                return mimetype
+    return "application/zip"
+
+
+def _text_mimetype(sample: bytes) -> Optional[str]:
+    if b"\x00" in sample:
+        return None
+    try:
+        text = sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.start < len(sample) - 3:  # not just a character cut by the sample
+            return None
+        text = sample[: e.start].decode("utf-8")
+    head = text.lstrip()[:14].lower()
+    if head.startswith("<!doctype html") or head.startswith("<html"):
+        return "text/html"
+    if head.startswith("<?xml"):
+        return "text/xml"
+    return "text/plain"
+
+
+def sniff(sample: bytes) -> Optional[str]:
+    """mimetype of content starting with sample, None if unknown"""
+    if len(sample) == 0:
+        return "inode/x-empty"
+    for offset, magic, mimetype in SIGNATURES:
+        if sample.startswith(magic, offset):
+            return mimetype
+    if sample.startswith(b"RIFF") and sample[8:12] in RIFF:
+        return RIFF[sample[8:12]]
+    if sample[4:8] == b"ftyp":
+        return "video/quicktime" if sample[8:10] == b"qt" else "video/mp4"
+    if sample.startswith(b"PK\x03\x04"):
+        return _zip_mimetype(sample)
+    return _text_mimetype(sample)
+
+
+def sniff_mimetype(fname: str) -> Optional[str]:
+    """mimetype of the file fname from its content, None if unknown or unreadable"""
+    try:
+        stat = os.stat(fname)
+    except OSError:
+        return None
+    key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    if stat_.S_ISDIR(stat.st_mode):
+        mimetype = "inode/directory"
+    elif not stat_.S_ISREG(stat.st_mode):
+        return None  # FIFO, socket or device: reading could block
+    else:
+        try:
+            with open(fname, "rb") as f:
+                mimetype = sniff(f.read(SAMPLE_SIZE))
+        except OSError:
+            return None
+    with _lock:
+        _cache[key] = mimetype
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return mimetype
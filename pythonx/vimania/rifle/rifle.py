@@ -18,8 +18,12 @@ from __future__ import absolute_import, division, print_function
 
 import os.path
 import re
+from collections import OrderedDict
+from functools import cached_property
+from operator import itemgetter
 from subprocess import Popen, PIPE
 import sys
+import threading
 
 __version__ = "rifle 1.9.3"
 
@@ -28,6 +32,7 @@ DEFAULT_PAGER = "less"
 DEFAULT_EDITOR = "vim"
 ASK_COMMAND = "ask"
 ENCODING = "utf-8"
+MIMETYPE_CACHE_SIZE = 1024  # detected mimetypes per (path, mtime, size)
 
 # Imports from ranger library, plus reimplementations in case ranger is not
 # installed so rifle can be run as a standalone program.
@@ -70,6 +75,22 @@ except ImportError:
         return _CACHED_EXECUTABLES
 
 
+# Within vimania the executables are indexed across sessions.
+try:
+    from vimania.rifle.executables import get_executables  # noqa: F811
+except ImportError:
+    pass
+
+
+try:
+    from vimania.rifle.magic import sniff_mimetype
+except ImportError:
+
+    def sniff_mimetype(fname):  # pylint: disable=unused-argument
+        """Content sniffing is not available standalone, "file" is used."""
+        return None
+
+
 try:
     from ranger.ext.popen_forked import Popen_forked
 except ImportError:
@@ -117,6 +138,103 @@ def squash_flags(flags):
     return "".join(f for f in flags if f not in exclude)
 
 
+_LITERAL = re.compile(r"(\[[A-Za-z0-9_-]+\]|[A-Za-z0-9_-])(\?)?")
+_MIME_PREFIX = re.compile(r"\^[A-Za-z0-9/_-]+$")
+MAX_LITERALS = 256
+
+
+def literal_alternatives(pattern):
+    """Words matched by an ext pattern like 'x?html?|od[dfgpst]'
+
+    None if the pattern is not that simple.
+
+    >>> sorted(literal_alternatives('x?html?|pdf'))
+    ['htm', 'html', 'pdf', 'xhtm', 'xhtml']
+    >>> literal_alternatives('.*') is None
+    True
+    """
+    words = set()
+    for alternative in pattern.split("|"):
+        variants = [""]
+        pos = 0
+        while pos < len(alternative):
+            match = _LITERAL.match(alternative, pos)
+            if match is None:
+                return None
+            token, optional = match.groups()
+            chars = token[1:-1] if token.startswith("[") else token
+            extended = [variant + char for variant in variants for char in chars]
+            variants = extended + variants if optional else extended
+            if len(variants) > MAX_LITERALS:
+                return None
+            pos = match.end()
+        words.update(variants)
+    return words
+
+
+def mime_prefixes(pattern):
+    """Prefixes of a mime pattern like '^video|^audio', None if not that simple
+
+    >>> mime_prefixes('^video|^audio')
+    ('video', 'audio')
+    >>> mime_prefixes('^audio|ogg$') is None
+    True
+    """
+    alternatives = pattern.split("|")
+    if all(_MIME_PREFIX.match(alternative) for alternative in alternatives):
+        return tuple(alternative[1:] for alternative in alternatives)
+    return None
+
+
+class _Facts(object):
+    """Facts about the first file of a lookup, each computed at most once"""
+
+    def __init__(self, rifle, files):
+        self._rifle = rifle
+        self.fname = files[0] if files else None
+
+    @cached_property
+    def isfile(self):
+        return os.path.isfile(self.fname)
+
+    @cached_property
+    def isdir(self):
+        return os.path.isdir(self.fname)
+
+    @cached_property
+    def basename(self):
+        return os.path.basename(self.fname)
+
+    @cached_property
+    def abspath(self):
+        return os.path.abspath(self.fname)
+
+    @cached_property
+    def ext(self):
+        """lower case extension of a file, None for directories and missing files"""
+        if self.fname is None or not self.isfile:
+            return None
+        partitions = self.basename.rpartition(".")
+        if not partitions[0]:
+            return None
+        return partitions[2].lower()
+
+    @property
+    def mime(self):
+        # given to list_commands or detected once, as before
+        if not self._rifle._mimetype:  # pylint: disable=protected-access
+            self._rifle._mimetype = self._rifle.get_mimetype(self.fname)
+        return self._rifle._mimetype  # pylint: disable=protected-access
+
+    @cached_property
+    def executables(self):
+        return get_executables()
+
+    @cached_property
+    def terminal(self):
+        return _is_terminal()
+
+
 class Rifle(object):  # pylint: disable=too-many-instance-attributes
     delimiter1 = "="
     delimiter2 = ","
@@ -151,6 +269,11 @@ class Rifle(object):  # pylint: disable=too-many-instance-attributes
         self._mimetype = None
         self._skip = None
         self.rules = None
+        self._generic = None  # compiled rules without ext bucket
+        self._by_ext = None  # ext -> compiled rules which can match it
+        self._config_mtime = None  # of the loaded config file
+        self._mimetypes = OrderedDict()  # LRU: (path, mtime, size) -> mimetype
+        self._mimetypes_lock = threading.Lock()
 
         # get paths for mimetype files
         self._mimetype_known_files = [os.path.expanduser("~/.mime.types")]
@@ -164,6 +287,7 @@ class Rifle(object):  # pylint: disable=too-many-instance-attributes
         """Replace the current configuration with the one in config_file"""
         if config_file is None:
             config_file = self.config_file
+        self._config_mtime = os.stat(config_file).st_mtime_ns
         with open(config_file, "r") as fobj:
             self.rules = []
             for line in fobj:
@@ -177,6 +301,113 @@ class Rifle(object):  # pylint: disable=too-many-instance-attributes
                 tests = tuple(tuple(f.strip().split(None, 1)) for f in tests)
                 command = command.strip()
                 self.rules.append((command, tests))
+        self._compile()
+
+    def _compile(self):
+        """Compile the rules into a decision table indexed by extension
+
+        A rule with an ext condition is only a candidate for files with one of the
+        extensions it matches, patterns are compiled once.
+        """
+        generic = []
+        by_ext = {}
+        for index, (command, tests) in enumerate(self.rules):
+            conditions = tuple(self._compile_condition(test) for test in tests if test)
+            exts = None
+            if command != ASK_COMMAND:  # counted with skip_ask, see list_commands
+                for negate, function, argument, _ in conditions:
+                    if function == "ext" and not negate:
+                        words = literal_alternatives(argument)
+                        if words is not None:
+                            exts = words if exts is None else exts & words
+            rule = (index, command, conditions)
+            if exts is None:
+                generic.append(rule)
+            else:
+                for ext in exts:
+                    by_ext.setdefault(ext, []).append(rule)
+        self._generic = generic
+        self._by_ext = {
+            ext: sorted(rules + generic, key=itemgetter(0))
+            for ext, rules in by_ext.items()
+        }
+
+    @staticmethod
+    def _compile_condition(test):
+        negate = test[0].startswith("!")
+        function = test[0][1:] if negate else test[0]
+        argument = test[1] if len(test) > 1 else ""
+        check = None
+        if function == "ext":
+            check = re.compile("^(" + argument + ")$")
+        elif function in ("name", "match", "path"):
+            check = re.compile(argument)
+        elif function == "mime":
+            check = mime_prefixes(argument) or re.compile(argument)
+        return negate, function, argument, check
+
+    def _match(self, condition, facts):
+        # Compiled _eval_condition, with label=None as in list_commands.
+        negate, function, argument, check = condition
+        if facts.fname is None:
+            return negate
+        return bool(self._match2(function, argument, check, facts)) != negate
+
+    def _match2(  # pylint: disable=too-many-return-statements,too-many-branches
+        self, function, argument, check, facts
+    ):
+        if function == "ext":
+            return facts.ext is not None and check.search(facts.ext)
+        elif function == "name":
+            return check.search(facts.basename)
+        elif function == "match":
+            return check.search(facts.fname)
+        elif function == "file":
+            return facts.isfile
+        elif function == "directory":
+            return facts.isdir
+        elif function == "path":
+            return check.search(facts.abspath)
+        elif function == "mime":
+            if isinstance(check, tuple):
+                return facts.mime.startswith(check)
+            return check.search(facts.mime)
+        elif function == "has":
+            if argument.startswith("$"):
+                if argument[1:] in os.environ:
+                    return os.environ[argument[1:]] in facts.executables
+                return False
+            return argument in facts.executables
+        elif function == "terminal":
+            return facts.terminal
+        elif function == "number":
+            if argument.isdigit():
+                self._skip = int(argument)
+            return True
+        elif function == "label":
+            self._app_label = argument
+            return True
+        elif function == "flag":
+            self._app_flags = argument
+            return True
+        elif function == "X":
+            return (
+                "WAYLAND_DISPLAY" in os.environ
+                or sys.platform == "darwin"
+                or "DISPLAY" in os.environ
+            )
+        elif function == "env":
+            return os.environ.get(argument)
+        elif function == "else":
+            return True
+        return None
+
+    def reload_if_changed(self):
+        """Reload the configuration if the config file changed since the last load"""
+        if os.stat(self.config_file).st_mtime_ns == self._config_mtime:
+            return False
+        self.reload_config()
+        return True
 
     def _eval_condition(self, condition, files, label):
         # Handle the negation of conditions starting with an exclamation mark,
@@ -218,7 +449,9 @@ class Rifle(object):  # pylint: disable=too-many-instance-attributes
         elif function == "path":
             return bool(re.search(argument, os.path.abspath(files[0])))
         elif function == "mime":
-            return bool(re.search(argument, self.get_mimetype(files[0])))
+            if not self._mimetype:  # detected once per list_commands
+                self._mimetype = self.get_mimetype(files[0])
+            return bool(re.search(argument, self._mimetype))
         elif function == "has":
             if argument.startswith("$"):
                 if argument[1:] in os.environ:
@@ -253,34 +486,53 @@ class Rifle(object):  # pylint: disable=too-many-instance-attributes
         return None
 
     def get_mimetype(self, fname):
-        # Spawn "file" to determine the mime-type of the given file.
-        if self._mimetype:
-            return self._mimetype
-
+        """Mimetype of fname, cached until the file is modified"""
+        try:
+            stat = os.stat(fname)
+        except OSError:  # no file to key the cache on
+            return self._detect_mimetype(fname)
+        key = (os.path.abspath(fname), stat.st_mtime_ns, stat.st_size)
+        with self._mimetypes_lock:
+            if key in self._mimetypes:
+                self._mimetypes.move_to_end(key)
+                return self._mimetypes[key]
+
+        mimetype = self._detect_mimetype(fname)
+        with self._mimetypes_lock:
+            self._mimetypes[key] = mimetype
+            if len(self._mimetypes) > MIMETYPE_CACHE_SIZE:
+                self._mimetypes.popitem(last=False)
+        return mimetype
+
+    def _detect_mimetype(self, fname):
+        # By name, then by content, spawn "file" only as last resort.
         import mimetypes
 
         if not mimetypes.inited:
             mimetypes.init(mimetypes.knownfiles + self._mimetype_known_files)
-        self._mimetype, _ = mimetypes.guess_type(fname)
+        mimetype, _ = mimetypes.guess_type(fname)
+
+        if not mimetype:
+            mimetype = sniff_mimetype(fname)
 
-        if not self._mimetype:
+        if not mimetype:
             with Popen(
                 ["file", "--mime-type", "-Lb", fname], stdout=PIPE, stderr=PIPE
             ) as process:
-                mimetype, _ = process.communicate()
-            self._mimetype = mimetype.decode(ENCODING).strip()
-            if self._mimetype == "application/octet-stream":
+                output, _ = process.communicate()
+            mimetype = output.decode(ENCODING).strip()
+            if mimetype == "application/octet-stream":
                 try:
                     with Popen(
                         ["mimetype", "--output-format", "%m", fname],
                         stdout=PIPE,
                         stderr=PIPE,
                     ) as process:
-                        mimetype, _ = process.communicate()
-                    self._mimetype = mimetype.decode(ENCODING).strip()
+                        output, _ = process.communicate()
+                    mimetype = output.decode(ENCODING).strip()
                 except OSError:
                     pass
-        return self._mimetype
+        return mimetype
 
     def _build_command(self, files, action, flags):
         # Get the flags
@@ -302,8 +554,11 @@ class Rifle(object):  # pylint: disable=too-many-instance-attributes
         label and flags are the label and flags specified in the rule.
         """
         self._mimetype = mimetype
+        facts = _Facts(self, files)
+        # only rules which can match the extension, in config order
+        rules = self._by_ext.get(facts.ext, self._generic)
         count = -1
-        for cmd, tests in self.rules:
+        for _, cmd, conditions in rules:
             self._skip = None
             self._app_flags = ""
             self._app_label = None
@@ -312,8 +567,8 @@ class Rifle(object):  # pylint: disable=too-many-instance-attributes
                 # https://github.com/ranger/ranger/pull/1341#issuecomment-537264495
                 count += 1
                 continue
-            for test in tests:
-                if not self._eval_condition(test, files, None):
+            for condition in conditions:
+                if not self._match(condition, facts):
                     break
             else:
                 if self._skip is None:
@@ -1,5 +1,5 @@
 import logging
-from typing import Sequence
+from typing import Optional, Sequence
 
 from vimania.db.dal import Todo, DAL
 from vimania.environment import config
@@ -10,74 +10,44 @@ _log = logging.getLogger(__name__)
 class Todos:
     todos: Sequence[Todo]
 
-    def __init__(self, fts_query: str):
+    def __init__(self, fts_query: str, todos: Sequence[Todo] = None):
+        """todos: result of the query if already loaded"""
         self.fts_query = fts_query
 
-        with DAL(env_config=config) as dal:
-            self.todos = dal.get_todos(fts_query=fts_query)
-
-    @staticmethod
-    def match_all(
-        tags: Sequence[str], bms: Sequence[Todo], not_: bool = False
-    ) -> Sequence[Todo]:
-        if not_:
-            filtered = [bm for bm in bms if not match_all_tags(tags, bm.split_tags)]
-        else:
-            filtered = [bm for bm in bms if match_all_tags(tags, bm.split_tags)]
-        return filtered
-
-    @staticmethod
-    def match_any(
-        tags: Sequence[str], bms: Sequence[Todo], not_: bool = False
-    ) -> Sequence[Todo]:
-        if not_:
-            filtered = [bm for bm in bms if not match_any_tag(tags, bm.split_tags)]
-        else:
-            filtered = [bm for bm in bms if match_any_tag(tags, bm.split_tags)]
-        return filtered
-
-    @staticmethod
-    def match_exact(
-        tags: Sequence[str], bms: Sequence[Todo], not_: bool = False
-    ) -> Sequence[Todo]:
-        if not_:
-            filtered = [bm for bm in bms if not match_exact_tags(tags, bm.split_tags)]
-        else:
-            filtered = [bm for bm in bms if match_exact_tags(tags, bm.split_tags)]
-        return filtered
-
-    def filter(
-        self,
+        if todos is None:
+            with DAL(env_config=config) as dal:
+                todos = dal.get_todos(fts_query=fts_query)
+        self.todos = todos
+
+    @classmethod
+    def search(
+        cls,
+        fts_query: str,
         tags_all: str = None,
         tags_all_not: str = None,
         tags_any: str = None,
         tags_any_not: str = None,
         tags_exact: str = None,
-    ):
-        tags_all_ = normalize_tag_string(tags_all)
-        tags_any_ = normalize_tag_string(tags_any)
-        tags_all_not_ = normalize_tag_string(tags_all_not)
-        tags_any_not_ = normalize_tag_string(tags_any_not)
-        tags_exact_ = normalize_tag_string(tags_exact)
-
-        # 0. over-rule
-        if tags_exact is not None:
-            self.todos = Todos.match_exact(tags_exact_, self.todos)
-        else:
-            # 1. select viable
-            if tags_all is not None:
-                self.todos = Todos.match_all(tags_all_, self.todos)
-
-            if tags_any is not None:
-                self.todos = Todos.match_any(tags_any_, self.todos)
-
-            # 2. narrow down
-            if tags_any_not is not None:
-                self.todos = Todos.match_any(tags_any_not_, self.todos, not_=True)
-
-            if tags_all_not is not None:
-                self.todos = Todos.match_all(tags_all_not_, self.todos, not_=True)
-        return self.todos
+    ) -> "Todos":
+        """todos matching fts_query and the tag filters, one query in the DB
+
+        tag filters: comma separated tags, None means no filter, tags_exact overrules
+        the other filters.
+        """
+
+        def normalize(tag_string: str = None) -> Optional[Sequence[str]]:
+            return None if tag_string is None else normalize_tag_string(tag_string)
+
+        with DAL(env_config=config) as dal:
+            todos = dal.search_todos(
+                fts_query,
+                tags_all=normalize(tags_all),
+                tags_all_not=normalize(tags_all_not),
+                tags_any=normalize(tags_any),
+                tags_any_not=normalize(tags_any_not),
+                tags_exact=normalize(tags_exact),
+            )
+        return cls(fts_query, todos=todos)
 
 
 def clean_tags(raw_tags: Sequence[str]) -> Sequence[str]:
@@ -1,5 +1,7 @@
 import logging
 import tempfile
+import threading
+import time
 import traceback
 from functools import wraps
 from pathlib import Path
@@ -7,12 +9,14 @@ from pprint import pprint
 from typing import Dict, Tuple
 
 from vimania import vim_helper
-from vimania.core import do_vimania, create_todo_, load_todos_, delete_twbm
 from vimania.exception import VimaniaException
-from vimania.handle_buffer import handle_it, delete_todo_
 from vimania.vim_helper import feedkeys
 
-""" Python VIM Interface Wrapper """
+""" Python VIM Interface Wrapper
+
+Loaded at vim startup: the subsystems (core, DB, buku, rifle, settings) are imported
+by the methods on first use, so sessions without markdown do not pay for them.
+"""
 
 _log = logging.getLogger("vimania-plugin.vimania_manager")
 ROOT_DIR = Path(__file__).parent.absolute()
@@ -107,6 +111,8 @@ class VimaniaManager:
     @err_to_scratch_buffer
     @warn_to_scratch_buffer
     def call_vimania(args: str, save_twbm: str):
+        from vimania.core import do_vimania
+
         _log.debug(f"{args=}, {save_twbm=}")
         assert isinstance(args, str), f"Error: input must be string, got {type(args)}."
 
@@ -115,6 +121,16 @@ class VimaniaManager:
         if return_message != "":
             vim.command(f"echom '{return_message}'")
 
+    @staticmethod
+    @err_to_scratch_buffer
+    def open_urls(first: str, last: str):
+        """opens all URLs in the lines first..last (1-based, inclusive) in parallel"""
+        from vimania.core import open_urls
+
+        lines = vim.current.buffer[int(first) - 1 : int(last)]
+        return_message = open_urls("\n".join(lines))
+        vim.command(f"echom '{return_message}'")
+
     @staticmethod
     @err_to_scratch_buffer
     def edit_vimania(args: str):
@@ -132,6 +148,8 @@ class VimaniaManager:
     @staticmethod
     @err_to_scratch_buffer
     def create_todo(args: str, path: str):
+        from vimania.core import create_todo_
+
         _log.debug(f"{args=}, {path=}")
         locals = VimaniaManager._get_locals()
         assert isinstance(args, str), f"Error: input must be string, got {type(args)}."
@@ -142,6 +160,8 @@ class VimaniaManager:
     @staticmethod
     @err_to_scratch_buffer
     def load_todos():
+        from vimania.core import load_todos_
+
         lineno = 10
         # vim_helper.buf[lineno] = vim_helper.buf[lineno].rstrip()
         current = vim.current
@@ -174,24 +194,145 @@ class VimaniaManager:
     @staticmethod
     @err_to_scratch_buffer
     def handle_todos(args: str):
+        from vimania.environment import config
+        from vimania.handle_buffer import BufferSync
+        from vimania.writer import get_writer
+
+        VimaniaManager._arm_maintenance(config.tw_vimania_maintain_interval)
         # path = vim.eval("@%")  # relative path
         path = vim.eval("expand('%:p')")
         _log.debug(f"{args=}, {path=}")
-        if args == "read":  # autocmd bufread
-            new_text = handle_it(vim.current.buffer[:], path, read=True)
-        else:  # autocmd bufwrite
-            new_text = handle_it(vim.current.buffer[:], path, read=False)
+        # autocmd bufread: args == "read", autocmd bufwrite: diff against the file's todos in DB
+        if config.tw_vimania_sync_async and args != "read":
+            edits = get_writer().save(vim.current.buffer[:], path)
+            VimaniaManager._start_sync_poll()
+        else:
+            if config.tw_vimania_sync_async:
+                get_writer().flush(path)  # read the DB state of the last save
+            sync = BufferSync(
+                path, read=(args == "read"), incremental=True, scoped=True
+            )
+            sync.run(vim.current.buffer[:])
+            edits = sync.edits
 
         # Bug: Vista buffer is not modifiable
         is_modifiable = vim.current.buffer.options["modifiable"]
         if is_modifiable:
-            vim.current.buffer[:] = new_text
+            # only touch modified lines, bottom up to keep the indices valid
+            for i, new_line in reversed(edits):
+                if new_line is None:
+                    del vim.current.buffer[i]
+                else:
+                    vim.current.buffer[i] = new_line
         else:
             _log.warning(f"Current buffer {vim.current.buffer.name}:{vim.current.buffer.number} = {is_modifiable=}")
 
+    _sync_poll_timer = None  # vim timer id while background syncs are pending
+
+    @staticmethod
+    def _start_sync_poll():
+        if VimaniaManager._sync_poll_timer is None:
+            VimaniaManager._sync_poll_timer = vim.eval(
+                "timer_start(200, 'VimaniaSyncPoll', {'repeat': -1})"
+            )
+
+    @staticmethod
+    def _report_sync_results():
+        from vimania.writer import get_writer
+
+        for result in get_writer().poll():
+            if result.error is not None:
+                vim_helper.new_scratch_buffer(
+                    f"Background sync of {result.path} failed:\n\n{result.error}"
+                )
+            else:
+                _log.debug(f"Synchronized: {result.stats}, merged: {result.merged}")
+
+    @staticmethod
+    @err_to_scratch_buffer
+    def sync_poll(timer: str):
+        """called by a vim timer: reports finished background syncs, stops when idle"""
+        from vimania.writer import get_writer
+
+        is_idle = get_writer().is_idle()
+        VimaniaManager._report_sync_results()
+        if is_idle:
+            vim.command(f"call timer_stop({timer})")
+            VimaniaManager._sync_poll_timer = None
+
+    @staticmethod
+    @err_to_scratch_buffer
+    def sync_flush():
+        """waits for pending background syncs, e.g. before vim exits"""
+        from vimania.environment import config
+        from vimania.writer import get_writer
+
+        if not config.tw_vimania_sync_async:
+            return
+        if not get_writer().flush(timeout=10):
+            _log.error("Background sync did not finish in time.")
+        VimaniaManager._report_sync_results()
+
+    _last_maintenance = None  # time.monotonic() of the last idle maintenance
+    _maintain_interval = 0  # s, 0: not armed
+
+    @staticmethod
+    def _arm_maintenance(interval: int):
+        """the first todo sync arms the idle maintenance, due one interval later"""
+        if VimaniaManager._last_maintenance is None and interval > 0:
+            VimaniaManager._maintain_interval = interval
+            VimaniaManager._last_maintenance = time.monotonic()
+
+    @staticmethod
+    @err_to_scratch_buffer
+    def maintain_idle():
+        """called when vim is idle: merges FTS segments in the background
+
+        At most once per interval and only while no buffer is being synchronized.
+        Sessions without a todo sync never touch the DB, see _arm_maintenance.
+        The work is bounded, the full maintenance is `twtodo db maintain`.
+        """
+        interval = VimaniaManager._maintain_interval
+        last = VimaniaManager._last_maintenance
+        if last is None or time.monotonic() - last < interval:
+            return  # before any import: runs on every CursorHold
+
+        from vimania.db.dal import DAL
+        from vimania.environment import config
+        from vimania.writer import get_writer
+
+        if config.tw_vimania_sync_async and not get_writer().is_idle():
+            return
+        VimaniaManager._last_maintenance = time.monotonic()
+
+        def maintain():
+            try:
+                with DAL(env_config=config) as dal:
+                    report = dal.maintain(check=False, analyze=False, max_merges=16)
+                _log.debug(f"Idle maintenance: {report}")
+            except Exception:
+                _log.exception("Idle maintenance failed.")
+
+        threading.Thread(
+            target=maintain, name="vimania-maintenance", daemon=True
+        ).start()
+
+    @staticmethod
+    @err_to_scratch_buffer
+    def sync_stats():
+        """shows timings of the most recent buffer synchronizations"""
+        from vimania.handle_buffer import sync_history
+
+        if len(sync_history) == 0:
+            vim.command("echom 'No buffer synchronized yet.'")
+            return
+        vim_helper.new_scratch_buffer("\n".join(str(stats) for stats in sync_history))
+
     @staticmethod
     @err_to_scratch_buffer
     def delete_todo(args: str, path: str):
+        from vimania.handle_buffer import delete_todo_
+
         _log.debug(f"{args=}, {path=}")
         locals = VimaniaManager._get_locals()
         assert isinstance(args, str), f"Error: input must be string, got {type(args)}."
@@ -204,6 +345,8 @@ class VimaniaManager:
     # @err_to_scratch_buffer
     # @warn_to_scratch_buffer
     def delete_twbm(args: str):
+        from vimania.core import delete_twbm
+
         _log.debug(f"{args=}")
         assert isinstance(args, str), f"Error: input must be string, got {type(args)}."
         try:
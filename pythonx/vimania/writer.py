@@ -0,0 +1,199 @@
+"""Background DB writer for buffer synchronization
+
+On save the buffer is only parsed and rewritten in the vim thread: new todos get ids
+from a block reserved in advance (see DAL.reserve_ids) and [d] lines are removed.
+The DB work runs in a writer thread, results are collected by `poll`, which vim calls
+from a timer.
+
+Saves of a buffer which is still waiting for the writer are merged: only the latest
+content is synchronized. The number of waiting buffers is bounded, a save blocks
+while the queue is full (back-pressure).
+"""
+import logging
+import threading
+import traceback
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from functools import partial
+from typing import Deque, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from vimania.background import Worker
+from vimania.db.dal import DAL, TodoStatus
+from vimania.environment import config
+from vimania.handle_buffer import BufferSync, Line, SyncStats, tokenize
+
+_log = logging.getLogger("vimania-plugin.writer")
+
+
+class IdPool:
+    """Todo ids reserved in the DB, handed out without DB round trip"""
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self._ids: Deque[int] = deque()
+        self._lock = threading.Lock()
+        self.pending: Set[int] = set()  # handed out, not inserted yet
+
+    def take(self) -> int:
+        with self._lock:
+            if len(self._ids) == 0:  # only blocks if the writer could not refill
+                self._reserve()
+            id_ = self._ids.popleft()
+            self.pending.add(id_)
+            return id_
+
+    def refill(self):
+        """reserves the next block when running low, called by the writer thread"""
+        with self._lock:
+            if len(self._ids) < self.block_size // 2:
+                self._reserve()
+
+    def reserved(self) -> FrozenSet[int]:
+        with self._lock:
+            return frozenset(self.pending)
+
+    def release(self, ids: List[int]):
+        with self._lock:
+            self.pending.difference_update(ids)
+
+    def _reserve(self):
+        with DAL(env_config=config) as dal:
+            self._ids.extend(dal.reserve_ids(self.block_size))
+        _log.debug(f"Reserved ids: {self._ids[0]}..{self._ids[-1]}")
+
+
+@dataclass(slots=True)
+class SyncResult:
+    path: str
+    merged: int = 0  # saves merged into this synchronization
+    stats: Optional[SyncStats] = None
+    error: Optional[str] = None  # traceback
+
+
+def prepare_lines(
+    lines: List[str], path: str, ids: IdPool
+) -> List[Tuple[int, Optional[str]]]:
+    """assigns reserved ids to new todos, returns the buffer edits
+
+    Lines marked for deletion ([d]) are removed from the buffer, the writer still gets
+    them to delete the todos in the DB.
+    """
+    edits = list()
+    for token in tokenize(lines):
+        line = Line(token.line, path=path, match=token.match)
+        if line.todo.status is TodoStatus.TODELETE:
+            edits.append((token.index, None))
+        elif line.todo.code == "":
+            line.todo.add_code(str(ids.take()))
+            lines[token.index] = line.line
+            edits.append((token.index, lines[token.index]))
+    return edits
+
+
+def _deletions(lines: List[str]) -> List[str]:
+    """todo lines marked for deletion ([d])"""
+    return [
+        token.line
+        for token in tokenize(lines)
+        if Line(token.line, path="", match=token.match).todo.status
+        is TodoStatus.TODELETE
+    ]
+
+
+class BufferWriter:
+    """Synchronizes buffers in a background thread, one buffer at a time"""
+
+    def __init__(self, max_pending: int = 8, id_block_size: int = 32):
+        self.max_pending = max_pending
+        self.ids = IdPool(id_block_size)
+        # path -> (lines, number of merged saves)
+        self._pending: Dict[str, Tuple[List[str], int]] = OrderedDict()
+        self._running: Optional[str] = None
+        self._results: Deque[SyncResult] = deque()
+        self._cond = threading.Condition()
+        self._worker = Worker("vimania-writer", self._next_sync, self._cond)
+
+    def save(self, lines: List[str], path: str) -> List[Tuple[int, Optional[str]]]:
+        """prepares the buffer and queues its synchronization, returns the buffer edits"""
+        lines = list(lines)
+        edits = prepare_lines(lines, path, self.ids)
+        self.submit(lines, path)
+        return edits
+
+    def submit(self, lines: List[str], path: str):
+        with self._cond:
+            if path in self._pending:
+                previous, merged = self._pending[path]
+                # deletions of the replaced save are already gone from the buffer
+                lines = lines + [""] + _deletions(previous)
+                self._pending[path] = (lines, merged + 1)
+            else:
+                while len(self._pending) >= self.max_pending:
+                    _log.warning(f"Writer queue full, waiting: {path}")
+                    self._cond.wait()
+                self._pending[path] = (lines, 0)
+            self._worker.start()
+            self._cond.notify_all()
+
+    def is_idle(self) -> bool:
+        with self._cond:
+            return len(self._pending) == 0 and self._running is None
+
+    def flush(self, path: str = None, timeout: float = None) -> bool:
+        """waits until path (or all buffers) is synchronized, False on timeout"""
+
+        def done():
+            if path is None:
+                return len(self._pending) == 0 and self._running is None
+            return path not in self._pending and self._running != path
+
+        with self._cond:
+            return self._cond.wait_for(done, timeout)
+
+    def poll(self) -> List[SyncResult]:
+        """results of all finished synchronizations since the last poll"""
+        results = list()
+        while len(self._results) > 0:
+            results.append(self._results.popleft())
+        return results
+
+    def _next_sync(self):  # with _cond held
+        if not self._cond.wait_for(lambda: len(self._pending) > 0, timeout=60):
+            return None
+        path, (lines, merged) = self._pending.popitem(last=False)
+        self._running = path
+        self._cond.notify_all()  # back-pressure: room for another buffer
+        return partial(self._run_sync, path, lines, merged)
+
+    def _run_sync(self, path: str, lines: List[str], merged: int):
+        self._results.append(self._sync(path, lines, merged))
+        with self._cond:
+            self._running = None
+            self._cond.notify_all()
+
+    def _sync(self, path: str, lines: List[str], merged: int) -> SyncResult:
+        try:
+            sync = BufferSync(
+                path, incremental=True, scoped=True, reserved=self.ids.reserved()
+            )
+            sync.run(lines)
+            self.ids.release(sync.created_ids)
+            self.ids.refill()
+            return SyncResult(path=path, merged=merged, stats=sync.stats)
+        except Exception:
+            _log.exception(f"Background sync failed: {path}")
+            return SyncResult(path=path, merged=merged, error=traceback.format_exc())
+
+
+_writer: Optional[BufferWriter] = None
+
+
+def get_writer() -> BufferWriter:
+    """the writer of the vim process"""
+    global _writer
+    if _writer is None:
+        _writer = BufferWriter(
+            max_pending=config.tw_vimania_sync_queue_size,
+            id_block_size=config.tw_vimania_id_block_size,
+        )
+    return _writer
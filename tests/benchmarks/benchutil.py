@@ -0,0 +1,13 @@
+import timeit
+from typing import Callable
+
+
+def best_of(func: Callable, number: int = 100, repeat: int = 5) -> float:
+    """best time per call in microseconds"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def report(title: str, **timings: float):
+    print(f"\n{title}")
+    for name, value in timings.items():
+        print(f"    {name:<30} {value:>12.1f}")
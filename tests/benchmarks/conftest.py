@@ -0,0 +1,16 @@
+"""Benchmarks, skipped unless VIMANIA_BENCHMARK is set
+
+    make bench
+"""
+import os
+
+import pytest
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get("VIMANIA_BENCHMARK"):
+        return
+    skip = pytest.mark.skip(reason="benchmark: set VIMANIA_BENCHMARK=1 to run")
+    for item in items:
+        if "benchmarks" in item.nodeid:
+            item.add_marker(skip)
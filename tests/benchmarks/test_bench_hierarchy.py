@@ -0,0 +1,118 @@
+import random
+
+from vimania.db.dal import QUERIES
+from benchutil import best_of, report
+
+N_TODOS = 50_000
+LEVELS = 8
+
+# recursive CTEs before the hierarchy was materialized (revision 21e327b49d4a)
+CTE_GET_DEPTH = """
+with recursive tds_parents as (
+    select id, parent_id, 0 as depth
+    from vimania_todos
+    where id == :id_ and flags <= 4
+    union all
+    select vimania_todos.id, vimania_todos.parent_id, tds_parents.depth - 1
+    from vimania_todos join tds_parents
+    where vimania_todos.id == tds_parents.parent_id and vimania_todos.flags < 4
+)
+select depth from tds_parents order by depth limit 1
+"""
+
+CTE_GET_TODO_PARENT = """
+with recursive tds_parents as (
+    select id, parent_id, 0 as depth
+    from vimania_todos
+    where id = :id_ and flags <= 4
+    union all
+    select vimania_todos.id, vimania_todos.parent_id, tds_parents.depth - 1
+    from vimania_todos join tds_parents
+    where vimania_todos.id == tds_parents.parent_id and vimania_todos.flags <= 4
+)
+select * from tds_parents where depth = :depth
+"""
+
+CTE_GET_OVERALL_STATUS = """
+with recursive tds_children as (
+    select id, parent_id, flags
+    from vimania_todos
+    where id == :id_ and flags <= 4
+    union all
+    select vimania_todos.id, vimania_todos.parent_id, vimania_todos.flags
+    from vimania_todos join tds_children
+    where vimania_todos.parent_id == tds_children.id and vimania_todos.flags <= 4
+)
+select min(flags) from tds_children where id != :id_
+"""
+
+
+def populate(conn) -> list:
+    """N_TODOS todos in LEVELS levels, returns the ids per level"""
+    random.seed(42)
+    per_level = N_TODOS // LEVELS
+    levels = [[]]
+    next_id = 1
+    for level in range(LEVELS):
+        rows = []
+        for _ in range(per_level):
+            parent = random.choice(levels[-1]) if level else None
+            rows.append(
+                (next_id, parent, f"bench todo {next_id}", "", ",,", "", "bench", 1)
+            )
+            next_id += 1
+        conn.executemany(
+            "insert into vimania_todos (id, parent_id, todo, metadata, tags, desc, path, flags)"
+            " values (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        levels.append([row[0] for row in rows])
+    conn.commit()
+    return levels[1:]
+
+
+def test_bench_hierarchy(dal):
+    conn = dal.conn.connection
+    conn.execute("delete from vimania_todos")
+    levels = populate(conn)
+    leaves, roots = levels[-1], levels[0]
+    random.seed(7)
+
+    def cte_depth():
+        return conn.execute(CTE_GET_DEPTH, dict(id_=random.choice(leaves))).fetchall()
+
+    def depth():
+        return QUERIES.get_depth(conn, id_=random.choice(leaves))
+
+    def cte_parent():
+        args = dict(id_=random.choice(leaves), depth=-(LEVELS - 1))
+        return conn.execute(CTE_GET_TODO_PARENT, args).fetchall()
+
+    def parent():
+        # raw rows like the CTE variant: no Todo record construction
+        args = dict(id_=random.choice(leaves), depth=-(LEVELS - 1))
+        return conn.execute(QUERIES.get_todo_parent.sql, args).fetchall()
+
+    def cte_status():
+        args = dict(id_=random.choice(roots))
+        return conn.execute(CTE_GET_OVERALL_STATUS, args).fetchall()
+
+    def status():
+        return QUERIES.get_overall_status(conn, id_=random.choice(roots))
+
+    leaf = leaves[0]
+    assert conn.execute(CTE_GET_DEPTH, dict(id_=leaf)).fetchall() == QUERIES.get_depth(
+        conn, id_=leaf
+    )
+
+    timings = dict(
+        cte_get_depth=best_of(cte_depth),
+        get_depth=best_of(depth),
+        cte_get_todo_parent=best_of(cte_parent),
+        get_todo_parent=best_of(parent),
+        cte_get_overall_status=best_of(cte_status),
+        get_overall_status=best_of(status),
+    )
+    report(f"hierarchy, {N_TODOS} todos, {LEVELS} levels [us/call]", **timings)
+    assert timings["get_depth"] < timings["cte_get_depth"]
+    assert timings["get_overall_status"] < timings["cte_get_overall_status"]
@@ -0,0 +1,70 @@
+import io
+import zipfile
+from subprocess import PIPE, Popen
+
+import pytest
+
+from vimania.rifle import magic
+from vimania.rifle.magic import sniff_mimetype
+from benchutil import best_of, report
+
+
+def docx() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as f:
+        for name in ("[Content_Types].xml", "_rels/.rels", "word/document.xml"):
+            f.writestr(name, "<xml/>")
+    return buffer.getvalue()
+
+
+# extension-less files: mimetypes.guess_type cannot help
+CONTENTS = dict(
+    pdf=b"%PDF-1.4\n" + b"x" * 1000,
+    png=b"\x89PNG\r\n\x1a\n" + b"\x00" * 1000,
+    jpeg=b"\xff\xd8\xff\xe0\x00\x10JFIF" + b"\x00" * 1000,
+    gzip=b"\x1f\x8b\x08\x00" + b"\x00" * 1000,
+    docx=docx(),
+    text=b"# notes\n" + b"- [ ] todo\n" * 100,
+    html=b"<!DOCTYPE html><html><body></body></html>",
+)
+
+
+@pytest.fixture()
+def files(tmp_path):
+    paths = list()
+    for name, content in CONTENTS.items():
+        path = tmp_path / name
+        path.write_bytes(content)
+        paths.append(str(path))
+    return paths
+
+
+def test_bench_mimetype_resolution(files):
+    def spawn_file():  # before: one subprocess per path
+        for path in files:
+            with Popen(
+                ["file", "--mime-type", "-Lb", path], stdout=PIPE, stderr=PIPE
+            ) as process:
+                process.communicate()
+
+    def sniff_uncached():
+        magic._cache.clear()
+        for path in files:
+            sniff_mimetype(path)
+
+    def sniff_cached():
+        for path in files:
+            sniff_mimetype(path)
+
+    n = len(files)
+    before = best_of(spawn_file, number=3) / n
+    uncached = best_of(sniff_uncached) / n
+    cached = best_of(sniff_cached) / n
+    report(
+        f"mimetype per file, {n} mixed files (µs)",
+        file_subprocess=before,
+        sniff=uncached,
+        sniff_cached=cached,
+    )
+    assert uncached < before
+    assert cached < uncached
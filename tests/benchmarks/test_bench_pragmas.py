@@ -0,0 +1,46 @@
+import itertools
+
+import pytest
+
+from vimania.db.dal import metadata
+from vimania.db.engine import dispose_engines, get_engine
+from vimania.environment import config
+from benchutil import best_of, report
+
+PROFILES = dict(
+    sqlite_default=dict(),
+    wal_full=dict(journal_mode="wal", synchronous="full"),
+    environment=config.db_pragmas,
+)
+
+
+@pytest.fixture()
+def commit_latency(tmp_path):
+    def measure(name: str, pragmas: dict) -> float:
+        engine = get_engine(f"sqlite:///{tmp_path}/{name}.db", pragmas=pragmas)
+        metadata.create_all(engine)
+        conn = engine.raw_connection()
+        ids = itertools.count()
+
+        def insert_commit():
+            conn.execute(
+                "insert into vimania_todos (todo, path, flags) values (?, 'bench', 1)",
+                (f"bench todo {next(ids)}",),
+            )
+            conn.commit()
+
+        try:
+            return best_of(insert_commit, number=100, repeat=3)
+        finally:
+            conn.close()
+
+    yield measure
+    dispose_engines()
+
+
+def test_bench_commit_latency(commit_latency):
+    timings = {
+        name: commit_latency(name, pragmas) for name, pragmas in PROFILES.items()
+    }
+    report("insert + commit per PRAGMA profile [us/call]", **timings)
+    assert timings["environment"] < timings["sqlite_default"]
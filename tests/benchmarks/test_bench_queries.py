@@ -0,0 +1,30 @@
+import aiosql
+
+from vimania.db.dal import QUERIES, Todo
+from benchutil import best_of, report
+
+GET_TODO_BY_ID = """
+    -- name: get_todo_by_id^
+    -- record_class: Todo
+    select *
+    from vimania_todos
+    where id = :id;
+"""
+
+
+def test_bench_query_registry(dal):
+    conn = dal.conn.connection
+
+    def parse_per_call():
+        queries = aiosql.from_str(
+            GET_TODO_BY_ID, "sqlite3", record_classes={"Todo": Todo}
+        )
+        return queries.get_todo_by_id(conn, id=1)
+
+    def precompiled():
+        return QUERIES.get_todo_by_id(conn, id=1)
+
+    before = best_of(parse_per_call, number=1000)
+    after = best_of(precompiled, number=1000)
+    report("get_todo_by_id [us/call]", from_str=before, registry=after)
+    assert after < before
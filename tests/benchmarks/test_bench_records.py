@@ -0,0 +1,114 @@
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Tuple
+
+from pydantic import BaseModel
+
+from vimania import handle_buffer
+from vimania.db.dal import Todo
+from vimania.handle_buffer import Line
+from benchutil import report
+
+N_TODOS = 100_000
+N_LINES = 10_000
+
+COLUMNS = [field for field in Todo.__dataclass_fields__]
+
+
+# pydantic models before the switch to slotted records
+class PydanticTodo(BaseModel):
+    id: int = None
+    parent_id: int = None
+    todo: str = ""
+    metadata: str = ""
+    tags: str = ",,"
+    desc: str = ""
+    path: str = ""
+    flags: int = 0
+    last_update_ts: datetime = datetime.utcnow()
+    created_at: datetime = None
+    depth: int = 0
+    root_id: int = None
+    tree_path: str = None
+    todo_hash: str = None
+
+
+class PydanticVimTodo(BaseModel):
+    raw_code: str = ""
+    todo: str = ""
+    raw_status: str = " "
+    raw_tags: str = ""
+    match_: str = ""
+
+
+def measure(func: Callable) -> Tuple[float, float]:
+    """(ms, MiB allocated) of one call"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    del result
+
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed * 1000, size / 2**20
+
+
+def rows():
+    now = "2022-01-01 12:00:00"
+    return [
+        (i, i - 1 or None, f"todo {i}", "", ",aaa,bbb,", "", "path.md", 1, now, now)
+        + (1, 1, f"{1:010d}/{i:010d}/", f"{i:016x}")
+        for i in range(1, N_TODOS + 1)
+    ]
+
+
+def test_bench_load_todos():
+    data = rows()
+
+    def load(record_class):
+        # as aiosql builds record classes
+        return lambda: [record_class(**dict(zip(COLUMNS, row))) for row in data]
+
+    (pydantic_s, pydantic_mb), (slots_s, slots_mb) = (
+        measure(load(PydanticTodo)),
+        measure(load(Todo)),
+    )
+    report(
+        f"load {N_TODOS} todos",
+        pydantic_ms=pydantic_s,
+        slots_ms=slots_s,
+        pydantic_mib=pydantic_mb,
+        slots_mib=slots_mb,
+    )
+    assert slots_s < pydantic_s
+    assert slots_mb < pydantic_mb
+
+
+def test_bench_parse_buffer(monkeypatch):
+    tab = "\t"
+    lines = [
+        f"{tab * (i % 4)}-%{i}% [ ] todo number {i} {{t:aaa,bbb}}"
+        if i % 3
+        else f"some text {i}"
+        for i in range(N_LINES)
+    ]
+
+    def parse():
+        return [Line(l, path="bench.md") for l in lines]
+
+    slots = measure(parse)
+    monkeypatch.setattr(handle_buffer, "VimTodo", PydanticVimTodo)
+    pydantic = measure(parse)
+
+    report(
+        f"parse {N_LINES} lines",
+        pydantic_ms=pydantic[0],
+        slots_ms=slots[0],
+        pydantic_mib=pydantic[1],
+        slots_mib=slots[1],
+    )
+    assert slots[0] < pydantic[0]
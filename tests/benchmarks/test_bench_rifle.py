@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from vimania.rifle import executables
+from vimania.rifle.rifle import Rifle
+from benchutil import best_of, report
+
+CONFIG = Path(__file__).parent.parent.parent / "pythonx/vimania/rifle/rifle.conf"
+NAMES = ("paper.pdf", "notes.md", "index.html", "photo.jpg", "backup.tar", "noext")
+
+
+def rule_scan(rifle, files):
+    """before: every rule in order, patterns built per condition"""
+    rifle._mimetype = None
+    count = -1
+    for cmd, tests in rifle.rules:
+        rifle._skip, rifle._app_flags, rifle._app_label = None, "", None
+        if all(rifle._eval_condition(test, files, None) for test in tests):
+            count = count + 1 if rifle._skip is None else rifle._skip
+            yield count, cmd, rifle._app_label, rifle._app_flags
+
+
+def test_bench_list_commands(tmp_path, monkeypatch):
+    index = executables.ExecutableIndex(str(tmp_path / "executables.json"))
+    monkeypatch.setattr(executables, "_index", index)
+    rifle = Rifle(str(CONFIG))
+    rifle.reload_config()
+    paths = list()
+    for name in NAMES:
+        (tmp_path / name).write_text("content")
+        paths.append(str(tmp_path / name))
+
+    timings = dict(parse_and_compile=best_of(rifle.reload_config, number=20))
+    for path in paths:
+        assert list(rifle.list_commands([path])) == list(rule_scan(rifle, [path]))
+        before = best_of(lambda: list(rule_scan(rifle, [path])), number=20)
+        after = best_of(lambda: list(rifle.list_commands([path])), number=20)
+        timings[f"{Path(path).name} before"] = before
+        timings[f"{Path(path).name} after"] = after
+        assert after < before
+    report(f"rifle list_commands, {len(rifle.rules)} rules (µs)", **timings)
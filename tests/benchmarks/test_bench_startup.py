@@ -0,0 +1,92 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from benchutil import report
+
+ROOT = Path(__file__).parent.parent.parent
+PYTHONX = ROOT / "pythonx"
+
+# cumulative import time of what vim loads at startup, in ms
+IMPORT_BUDGET_MS = 60.0
+SOURCING_BUDGET_MS = 100.0
+
+
+def import_times(statement: str) -> dict:
+    """cumulative import time per module in ms, see python -X importtime"""
+    env = dict(os.environ, PYTHONPATH=str(PYTHONX))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = dict()
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)", line)
+        if match is not None:
+            times[match.group(2)] = int(match.group(1)) / 1000
+    return times
+
+
+def test_bench_import_time():
+    startup = import_times("import vimania; vimania.VimaniaManager()")["vimania"]
+    first_use = import_times("import vimania.core; import vimania.cli")
+    report(
+        "import time (ms)",
+        startup=startup,
+        core=first_use["vimania.core"],
+        cli=first_use["vimania.cli"],
+    )
+    assert startup < IMPORT_BUDGET_MS
+
+
+def has_vim_python3() -> bool:
+    if shutil.which("vim") is None:
+        return False
+    version = subprocess.run(["vim", "--version"], capture_output=True, text=True)
+    return "+python3" in version.stdout
+
+
+@pytest.mark.skipif(not has_vim_python3(), reason="vim with +python3 required")
+def test_bench_vim_startuptime(tmp_path):
+    log = tmp_path / "startuptime.log"
+    subprocess.run(
+        [
+            "vim",
+            "-N",
+            "-u",
+            "NONE",
+            "-i",
+            "NONE",
+            "-es",
+            "--cmd",
+            f"set rtp^={ROOT}",
+            "--cmd",
+            "let g:twvim_debug = 0",
+            "--startuptime",
+            str(log),
+            "-c",
+            "runtime! plugin/*.vim",
+            "-c",
+            "qa!",
+        ],
+        env=dict(os.environ, PYTHONPATH=str(PYTHONX)),
+        check=True,
+        timeout=60,
+    )
+    # clock, self+sourced, self: sourcing <file>
+    sourcing = {
+        Path(match.group(2)).name: float(match.group(1))
+        for match in re.finditer(
+            r"^\S+\s+(\S+)\s+\S+: sourcing (\S+)$", log.read_text(), re.MULTILINE
+        )
+    }
+    report("vim --startuptime (ms)", **sourcing)
+    assert sourcing["python_wrapper.vim"] < SOURCING_BUDGET_MS
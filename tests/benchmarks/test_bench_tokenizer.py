@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+
+from vimania.handle_buffer import Line, _fence, tokenize
+from benchutil import best_of, report
+
+CORPUS = Path(__file__).parent.parent / "data" / "bench_notes.md"
+N_LINES = 100_000
+
+
+def iter_outside_code_fences(lines: Iterable[str]) -> Iterator[Tuple[str, bool]]:
+    """line scan before tokenize: each line with a flag whether it is in a code fence"""
+    fence = None  # character of the open fence
+    for l in lines:
+        marker = _fence(l) if "`" in l or "~" in l else None
+        if marker is not None and fence is None:
+            fence = marker
+        elif marker is not None and marker == fence:
+            fence = None
+            yield l, False
+            continue
+        yield l, fence is not None
+
+
+def corpus():
+    lines = CORPUS.read_text().split("\n")
+    return (lines * (N_LINES // len(lines) + 1))[:N_LINES]
+
+
+def test_bench_tokenize():
+    lines = corpus()
+
+    # before: every line outside of code fences was parsed by Line
+    def per_line():
+        return [
+            (i, line)
+            for i, (l, is_in_code_fence) in enumerate(iter_outside_code_fences(lines))
+            if not is_in_code_fence
+            for line in (Line(l, path="bench.md"),)
+            if line.is_todo
+        ]
+
+    def regex_only():
+        return [
+            (i, l)
+            for i, (l, is_in_code_fence) in enumerate(iter_outside_code_fences(lines))
+            if not is_in_code_fence and Line.pattern.match(l) is not None
+        ]
+
+    def tokens():
+        return list(tokenize(lines))
+
+    assert [t.index for t in tokens()] == [i for i, _ in regex_only()]
+    before = best_of(per_line, number=1, repeat=3) / 1000
+    regex = best_of(regex_only, number=1, repeat=3) / 1000
+    after = best_of(tokens, number=1, repeat=3) / 1000
+    report(
+        f"find todos in {N_LINES} lines [ms]",
+        per_line=before,
+        regex_per_line=regex,
+        tokenize=after,
+    )
+    assert after < before
@@ -8,7 +8,9 @@ from alembic import command
 from alembic.config import Config
 
 from vimania.db.dal import DAL
+from vimania.db.engine import dispose_engines
 from vimania.environment import config
+from vimania.handle_buffer import snapshots
 
 _log = logging.getLogger(__name__)
 log_fmt = r"%(asctime)-15s %(levelname)s %(name)s %(funcName)s:%(lineno)d %(message)s"
@@ -22,7 +24,12 @@ def init_db():
     dsn = os.environ.get(
         "TW_VIMANIA_DB_URL", "sqlite:///tests/data/vimania_todos_test.db"
     )
-    (Path(__file__).parent / "data/vimania_todos_test.db").unlink(missing_ok=True)
+    dispose_engines()  # pooled connections must not outlive the DB file
+    snapshots.clear()
+    for suffix in ("", "-wal", "-shm"):  # WAL files must not outlive the DB file
+        (Path(__file__).parent / f"data/vimania_todos_test.db{suffix}").unlink(
+            missing_ok=True
+        )
     alembic_root = Path(__file__).parent.parent / "pythonx/vimania/db"
 
     alembic_cfg = Config(str(alembic_root / "alembic.ini"))
@@ -0,0 +1,44 @@
+import threading
+
+from vimania.background import Worker
+
+
+def test_worker_runs_tasks_and_stops_when_idle():
+    done = list()
+    tasks = [lambda: done.append(1), lambda: done.append(2)]
+    worker = Worker("test", lambda: tasks.pop(0) if len(tasks) > 0 else None)
+
+    with worker.lock:
+        worker.start()
+    thread = worker.thread
+    thread.join(timeout=5)
+
+    assert done == [1, 2]
+    assert not thread.is_alive()
+    assert worker.thread is None  # idle
+
+
+def test_worker_is_restarted_by_new_work():
+    done = list()
+    queued = list()
+    worker = Worker("test", lambda: queued.pop(0) if len(queued) > 0 else None)
+
+    for i in range(3):
+        with worker.lock:
+            queued.append(lambda i=i: done.append(i))
+            worker.start()
+        worker.join(timeout=5)
+
+    assert done == [0, 1, 2]
+
+
+def test_worker_with_condition_as_lock():
+    cond = threading.Condition()
+    started = threading.Event()
+    worker = Worker("test", lambda: None if started.is_set() else started.set, cond)
+
+    with cond:
+        worker.start()
+    worker.join(timeout=5)
+
+    assert started.is_set()
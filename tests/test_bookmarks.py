@@ -0,0 +1,174 @@
+import sqlite3
+
+import pytest
+
+from vimania import bookmarks
+from vimania.bookmarks import (
+    MAX_ATTEMPTS,
+    FetchStats,
+    FetchWorker,
+    Page,
+    count_queued,
+    drain,
+)
+from vimania.buku import BukuDb
+from vimania.core import add_twbm
+
+URL = "https://www.example.com/page"
+
+
+@pytest.fixture()
+def dbfile(tmp_path, mocker):
+    dbfile = str(tmp_path / "bm.db")
+    BukuDb(dbfile=dbfile).close()  # creates the bookmarks table
+    mocker.patch("vimania.environment.config.twbm_db_url", new=f"sqlite:///{dbfile}")
+    return dbfile
+
+
+@pytest.fixture()
+def worker(mocker):
+    return mocker.patch("vimania.bookmarks.get_fetch_worker")
+
+
+def get_record(dbfile, url=URL):
+    with sqlite3.connect(dbfile) as conn:
+        return conn.execute(
+            "select metadata, desc, tags from bookmarks where URL = ?", (url,)
+        ).fetchone()
+
+
+def fetched(url):
+    return Page("Example", "an example page", "example,web", 0, 0)
+
+
+def failed(url):
+    return Page(None, None, None, 0, 0)
+
+
+def test_add_twbm_does_not_fetch(dbfile, worker, mocker):
+    network = mocker.patch("vimania.buku.network_handler")
+
+    id_ = add_twbm(URL)
+
+    assert id_ > 0
+    network.assert_not_called()
+    assert get_record(dbfile) == ("", "", ",vimania,")
+    assert count_queued(dbfile) == 1
+    worker.return_value.notify.assert_called_once()
+
+
+def test_drain_completes_bookmark(dbfile, worker):
+    add_twbm(URL)
+
+    stats = drain(dbfile, fetch=fetched)
+
+    assert stats == FetchStats(fetched=1)
+    assert get_record(dbfile) == ("Example", "an example page", ",example,vimania,web,")
+    assert count_queued(dbfile) == 0
+
+
+def test_drain_keeps_immutable_title(dbfile, worker):
+    add_twbm(URL)
+    with sqlite3.connect(dbfile) as conn:
+        conn.execute("update bookmarks set metadata = 'mine', flags = 1")
+
+    drain(dbfile, fetch=fetched)
+
+    assert get_record(dbfile)[0] == "mine"
+
+
+def test_failed_fetch_is_retried_later(dbfile, worker):
+    add_twbm(URL)
+
+    stats = drain(dbfile, fetch=failed)
+    assert stats.retried == 1
+    assert count_queued(dbfile) == 1
+
+    stats = drain(dbfile, fetch=fetched)  # backoff: not due yet
+    assert stats.fetched == 0
+    assert get_record(dbfile)[0] == ""
+
+
+def test_failed_fetch_is_dropped_after_max_attempts(dbfile, worker):
+    add_twbm(URL)
+    for i in range(MAX_ATTEMPTS):
+        with sqlite3.connect(dbfile) as conn:
+            conn.execute("update vimania_fetch_queue set next_attempt_ts = 0")
+        stats = drain(dbfile, fetch=failed)
+
+    assert stats.dropped == 1
+    assert count_queued(dbfile) == 0
+
+
+def test_fetch_exception_is_retried(dbfile, worker):
+    add_twbm(URL)
+
+    def broken(url):
+        raise ConnectionError("no network")
+
+    stats = drain(dbfile, fetch=broken)
+
+    assert stats.retried == 1
+    with sqlite3.connect(dbfile) as conn:
+        assert conn.execute(
+            "select attempts, last_error from vimania_fetch_queue"
+        ).fetchone() == (1, "no network")
+
+
+def test_http_error_is_retried(dbfile, worker):
+    add_twbm(URL)
+
+    stats = drain(dbfile, fetch=lambda url: Page("", "", "", 0, 0))
+
+    assert stats.retried == 1
+    assert get_record(dbfile)[0] == ""
+    with sqlite3.connect(dbfile) as conn:
+        assert conn.execute(
+            "select attempts, last_error from vimania_fetch_queue"
+        ).fetchone() == (1, "no title")
+
+
+def test_head_request_without_title_is_fetched(dbfile, worker):
+    add_twbm(URL)
+
+    stats = drain(dbfile, fetch=lambda url: Page("", "", "", 1, 0))
+
+    assert stats == FetchStats(fetched=1)
+    assert count_queued(dbfile) == 0
+
+
+def test_bad_url_is_dropped(dbfile, worker):
+    add_twbm(URL)
+
+    stats = drain(dbfile, fetch=lambda url: Page(None, None, None, 0, 1))
+
+    assert stats.dropped == 1
+    assert count_queued(dbfile) == 0
+
+
+def test_deleted_bookmark_is_dropped(dbfile):
+    bookmarks.enqueue(dbfile, URL)
+
+    stats = drain(dbfile, fetch=fetched)
+
+    assert stats.dropped == 1
+    assert count_queued(dbfile) == 0
+
+
+def test_url_is_queued_once(dbfile):
+    bookmarks.enqueue(dbfile, URL)
+    bookmarks.enqueue(dbfile, URL)
+
+    assert count_queued(dbfile) == 1
+
+
+def test_worker_drains_in_background(dbfile, worker):
+    add_twbm(URL)
+
+    fetch_worker = FetchWorker(dbfile, fetch=fetched)
+    fetch_worker.notify()
+    fetch_worker.join(timeout=5)
+
+    assert fetch_worker._worker.thread is None  # idle
+    assert fetch_worker.history[-1].fetched == 1
+    assert get_record(dbfile)[0] == "Example"
@@ -110,3 +110,24 @@ class TestTags:
         result = runner.invoke(app, ["tags", "-v", "vimania"])
         print(result.stdout)
         assert result.exit_code == 0
+
+
+def test_db_maintain(dal):
+    result = runner.invoke(app, ["db", "maintain", "-v", "--optimize"])
+    print(result.stdout)
+    assert result.exit_code == 0
+    assert "FTS segments: 1 -> 1" in result.stdout
+    assert "optimize" in result.stdout
+
+
+def test_bm_fetch(tmp_path, mocker):
+    from vimania.buku import BukuDb
+
+    dbfile = str(tmp_path / "bm.db")
+    BukuDb(dbfile=dbfile).close()
+    mocker.patch("vimania.environment.config.twbm_db_url", new=f"sqlite:///{dbfile}")
+    result = runner.invoke(app, ["bm", "fetch", "-v"])
+    print(result.stdout)
+    assert result.exit_code == 0
+    assert "fetched: 0, retried: 0, dropped: 0" in result.stdout
+    assert "queued: 0" in result.stdout
@@ -8,6 +8,8 @@ from vimania.core import (
     create_todo_,
     parse_todo_str,
     get_fqp,
+    find_urls,
+    open_urls,
 )
 
 
@@ -115,11 +117,15 @@ def test_parse_todo_str(uri, todo_status, todo):
 
 @pytest.mark.parametrize(
     ("uri", "path", "result"),
-    (("- [ ] todo 5", "testpath", "two active todos already exist, DB inconsistenty"),),
+    (
+        ("- [ ] todo 1", "testpath", 1),
+        ("- [ ]   TODO   1 ", "testpath", 1),  # normalized text matches
+        ("- [ ] todo 5", "testpath", 13),  # no fuzzy match on 'todo 5 inconsistency'
+        ('- [ ] "todo" AND NOT 1*', "testpath", 13),  # no FTS syntax
+    ),
 )
-def test_create_invalid_todo_db_inconsistency(uri, path, result):
-    with pytest.raises(ValueError):
-        create_todo_(uri, path)
+def test_create_todo_updates_active_duplicate(dal, uri, path, result):
+    assert create_todo_(uri, path) == result
 
 
 @pytest.mark.parametrize(
@@ -166,3 +172,20 @@ def test_delete_twbm_regexp(mocker, line, result):
         .group(1)
         == result
     )
+
+
+def test_find_urls():
+    text = (
+        "see https://www.google.com and\n"
+        "- [x](http://example.com/a?b=1) https://www.google.com"
+    )
+    assert find_urls(text) == ["https://www.google.com", "http://example.com/a?b=1"]
+
+
+def test_open_urls(mocker):
+    opener = mocker.patch("vimania.core.get_opener").return_value
+    assert open_urls("https://www.google.com http://example.com") == "Opening 2 URLs"
+    opener.open_all.assert_called_once_with(
+        ["https://www.google.com", "http://example.com"]
+    )
+    assert open_urls("no links") == "No URL found"
@@ -1,6 +1,6 @@
 import pytest
 
-from vimania.db.dal import Todo, DAL, metadata
+from vimania.db.dal import Todo, DAL, TodoStatus, metadata
 from vimania.environment import config
 
 
@@ -64,6 +64,25 @@ def test_update_bm(dal):
     assert result == 1
 
 
+def test_update_todo_skips_unchanged_row(dal):
+    conn = dal.conn.connection
+    conn.execute("update vimania_todos set last_update_ts = '2000-01-01' where id = 1")
+    conn.commit()
+    segments = dal.fts_segments()
+    changes = conn.total_changes
+
+    dal.update_todo(dal.get_todo_by_id(1))
+    assert conn.total_changes == changes
+    assert dal.fts_segments() == segments
+    assert dal.get_todo_by_id(1).last_update_ts.year == 2000
+
+    todo = dal.get_todo_by_id(1)
+    todo.flags = 2
+    dal.update_todo(todo)
+    assert conn.total_changes - changes == 1  # no second UPDATE by the ts trigger
+    assert dal.get_todo_by_id(1).last_update_ts.year > 2000
+
+
 def test_insert_bm(dal):
     bm = Todo(
         todo="- [ ] xxxxx",
@@ -116,6 +135,88 @@ def test_get_all_tags(dal):
     assert len(tags) >= len(result)
 
 
+def test_tags_are_normalized_by_triggers(dal):
+    todo = dal.get_todo_by_id(1)
+    todo.tags = ",ccc,new,"
+    dal.update_todo(todo)
+    assert dal.get_all_tags() == ["aaa", "bbb", "ccc", "new"]  # yyy, vimania unused
+    assert dal.get_related_tags(tag="new") == ["ccc", "new"]
+
+    dal.delete_todo(id=1)
+    assert dal.get_all_tags() == ["aaa", "bbb", "ccc"]
+    assert dal.get_related_tags(tag="new") == []
+
+
+@pytest.mark.parametrize("tag", ("x\ty", "x\x01y", 'x"y', "x\\y"))
+def test_tags_with_json_special_characters(dal, tag):
+    id_ = dal.insert_todo(Todo(todo="special", tags=f",{tag},new,", flags=1))
+    assert dal.get_related_tags(tag=tag) == ["new", tag]
+
+    todo = dal.get_todo_by_id(id_)
+    todo.tags = f",{tag},"
+    dal.update_todo(todo)
+    assert dal.get_related_tags(tag=tag) == [tag]
+
+    dal.delete_todo(id=id_)
+    assert tag not in dal.get_all_tags()
+
+
+@pytest.mark.parametrize(
+    ("fts_query", "result"),
+    (
+        ("tags:vimania", [1]),
+        ("vim*", [1]),
+        ("descr*", [1, 2, 3, 4, 5]),
+        ("todo AND tags:ccc", [1, 4, 5, 6]),
+    ),
+)
+def test_search_todos_fts(dal, fts_query, result):
+    todos = dal.search_todos(fts_query)
+    assert sorted(todo.id for todo in todos) == result
+
+
+def test_search_todos_ranks_todo_above_path(dal):
+    dal.insert_todo(Todo(todo="zzzz in path", path="bla", flags=1))
+    dal.insert_todo(Todo(todo="in todo zzzz", path="zzzz", flags=1))
+    dal.insert_todo(Todo(todo="other", path="zzzz", flags=1))
+    todos = dal.search_todos("zzzz")
+    assert [todo.todo for todo in todos] == ["in todo zzzz", "zzzz in path", "other"]
+
+
+def test_search_todos_with_tags(dal):
+    todos = dal.search_todos("todo", tags_all=["aaa", "ccc"], tags_any_not=["bbb"])
+    assert todos == []
+    todos = dal.search_todos("todo", tags_exact=["aaa", "bbb"], tags_all=["xxx"])
+    assert sorted(todo.id for todo in todos) == [2, 3]
+    todos = dal.search_todos("", tags_exact=[])
+    assert {todo.tags for todo in todos} == {",,"}
+
+
+@pytest.mark.parametrize(
+    ("filters", "result"),
+    (
+        (dict(tags_any=["ccc"]), [1, 4, 5, 6]),
+        (dict(tags_all=["aaa", "ccc"]), [4, 5, 6]),
+        (dict(tags_all=["aaa"], tags_any=["ccc"], tags_any_not=["xxx"]), [4, 5, 6]),
+        (dict(tags_exact=["aaa", "bbb"], tags_any=["ccc"]), [2, 3]),
+        (dict(tags_any=[]), []),
+        (dict(tags_all=[], tags_any_not=["aaa"]), [1, 7, 8, 9, 10, 11, 12]),
+        (dict(tags_all_not=["aaa", "ccc"]), [1, 2, 3, 7, 8, 9, 10, 11, 12]),
+    ),
+)
+def test_search_todos_by_tags_only(dal, filters, result):
+    todos = dal.search_todos("", **filters)
+    assert sorted(todo.id for todo in todos) == result
+
+
+def test_get_highlights(dal):
+    highlights = dal.get_highlights("todo OR nice", (1, 9), start="[", end="]")
+    assert highlights == {
+        1: ("[todo] 1", "[nice] description b"),
+        9: ("[todo] 7", ""),
+    }
+
+
 @pytest.mark.parametrize(
     ("todo_id", "depth", "result_id"),
     (
@@ -155,3 +256,155 @@ def test_get_depth(dal, todo_id, overall_status):
     result = dal.get_overall_status(todo_id)
     _ = None
     assert result == overall_status
+
+
+@pytest.mark.parametrize(
+    ("ids", "depths"),
+    (
+        ((9, 8, 3, 1), {9: -3, 8: -2, 3: 0, 1: 0}),
+        ((9, 999999), {9: -3}),
+        ((), {}),
+    ),
+)
+def test_get_depths_matches_get_depth(dal, ids, depths):
+    assert dal.get_depths(ids) == depths
+    for id_, depth in depths.items():
+        assert dal.get_depth(id_) == depth
+
+
+def test_get_todos_by_ids(dal):
+    todos = dal.get_todos_by_ids((1, 9, 999999))
+    assert sorted(todos.keys()) == [1, 9]
+    assert todos[9].todo == "todo 7"
+
+
+def test_insert_todo_materializes_hierarchy(dal):
+    id_ = dal.insert_todo(Todo(parent_id=9, todo="todo 11"))
+    todo = dal.get_todo_by_id(id_)
+    assert todo.depth == 4
+    assert todo.root_id == 3
+    assert todo.tree_path == "".join(f"{i:010d}/" for i in (3, 6, 8, 9, id_))
+
+
+def test_reparent_moves_subtree(dal):
+    todo = dal.get_todo_by_id(6)
+    todo.parent_id = 1
+    dal.update_todo(todo)
+
+    assert dal.get_depths((6, 8, 9)) == {6: -1, 8: -2, 9: -3}
+    assert {t.root_id for t in dal.get_todos_by_ids((6, 8, 9)).values()} == {1}
+    assert dal.get_todo_parent(9, -3).id == 1
+    assert dal.get_overall_status(3) == 1  # todo 4 is still a child
+
+
+def test_delete_todo_reroots_children(dal):
+    dal.delete_todo(6)
+    todos = dal.get_todos_by_ids((7, 8, 9))
+    assert {t.root_id for t in todos.values()} == {7, 8}
+    assert dal.get_depths((8, 9)) == {8: 0, 9: -1}
+
+
+@pytest.mark.parametrize(
+    ("text", "result_id"),
+    (
+        ("todo 1", 1),
+        (" Todo\t 1 ", 1),
+        ("todo 10", None),  # done
+        ("todo 5 inconsistency", 5),  # first of the existing duplicates
+        ('todo" OR "1', None),
+    ),
+)
+def test_get_active_todo(dal, text, result_id):
+    todo = dal.get_active_todo(text)
+    assert (todo.id if todo is not None else None) == result_id
+
+
+def test_insert_active_duplicate_fails(dal):
+    with pytest.raises(ValueError):
+        dal.insert_todo(Todo(todo="TODO 1", flags=1))
+    assert dal.insert_todo(Todo(todo="TODO 10", flags=1)) == 13
+
+
+def test_get_active_todo_sees_todos_without_hash(dal):
+    # test data is inserted without the DAL: no hashes
+    assert dal.get_active_todo("todo 1").id == 1
+
+    # update colliding with the active "todo 1": keeps no hash
+    todo = dal.get_todo_by_id(3)
+    todo.todo = "Todo 1"
+    dal.update_todo(todo)
+    assert dal.get_todo_by_id(3).todo_hash is None
+
+    done = dal.get_todo_by_id(1)
+    done.flags = TodoStatus.DONE
+    dal.update_todo(done)
+
+    assert dal.get_active_todo("todo 1").id == 3
+    with pytest.raises(ValueError):
+        dal.insert_todo(Todo(todo="todo 1", flags=1))
+
+
+def test_todos_are_hashed_once(dal, mocker):
+    hash_todos = mocker.spy(DAL, "hash_todos")
+    with dal.transaction():
+        for i in range(3):
+            assert dal.get_active_todo(f"new {i}") is None
+            dal.insert_todo(Todo(todo=f"new {i}", flags=1))
+
+    assert hash_todos.call_count == 1
+
+
+def test_maintain_merges_fts_segments(dal):
+    dal.queries.fts_set_automerge(dal.conn.connection, segments=0)
+    for i in range(10):  # every commit adds a segment
+        todo = dal.get_todo_by_id(1)
+        todo.desc = f"description {i}"
+        dal.update_todo(todo)
+    assert dal.fts_segments() > 1
+
+    report = dal.maintain(optimize=True)
+    assert report.segments_before > 1
+    assert report.segments_after == dal.fts_segments() == 1
+    assert report.is_consistent
+    assert {"integrity_check", "optimize", "analyze"} <= report.timings.keys()
+    assert [todo.id for todo in dal.search_todos("description 9")] == [1]
+
+
+def test_maintain_rebuilds_inconsistent_fts_index(dal):
+    dal.conn.connection.execute("delete from vimania_todos_fts_data where id > 10")
+    dal.conn.connection.commit()
+
+    report = dal.maintain()
+    assert not report.is_consistent
+    assert report.rebuilt
+    assert [todo.id for todo in dal.search_todos("xxxxx")] == [1]
+
+
+def test_maintain_releases_free_pages(dal):
+    dal.vacuum()  # applies auto_vacuum = incremental of the connection profile
+    assert dal.queries.get_auto_vacuum(dal.conn.connection) == 2
+    for i in range(200):
+        dal.insert_todo(Todo(todo=f"todo {i} " + "x" * 500, flags=1))
+    dal.conn.connection.execute("delete from vimania_todos where id > 12")
+    dal.conn.connection.commit()
+
+    report = dal.maintain(check=False, analyze=False)
+    assert report.freed_pages > 0
+    assert dal.queries.get_freelist_count(dal.conn.connection) == 0
+
+
+def test_orphans_are_hidden_and_purged(dal):
+    dal.orphan_todos([1, 2], "filepath")
+    conn = dal.conn.connection
+    conn.execute(
+        "update vimania_todos set last_update_ts = datetime('now', '-40 days') where id = 1"
+    )
+    conn.commit()
+
+    assert {1, 2}.isdisjoint(todo.id for todo in dal.get_todos(""))
+    assert dal.search_todos("xxxxx") == []
+
+    report = dal.maintain(check=False, analyze=False, orphan_days=30)
+    assert report.purged == 1
+    assert dal.get_todo_by_id(1).id is None
+    assert dal.get_todo_by_id(2).flags == TodoStatus.TODELETE
@@ -0,0 +1,90 @@
+from vimania.db import engine
+from vimania.db.dal import DAL, QUERIES
+from vimania.db.engine import get_engine, evict_idle, dispose_engines
+from vimania.environment import config
+
+
+def urls():
+    return {key[0] for key in engine._engines}
+
+
+def test_dal_shares_engine_and_queries(dal):
+    with DAL(env_config=config) as dal1, DAL(env_config=config) as dal2:
+        assert dal1._sql_alchemy_db_engine is dal2._sql_alchemy_db_engine
+        assert dal1.queries is dal2.queries is QUERIES
+        assert dal1._sql_alchemy_db_engine.pool.size() == config.tw_vimania_db_pool_size
+
+
+def test_connections_are_reused(dal):
+    with DAL(env_config=config) as dal1:
+        raw = dal1.conn.connection.dbapi_connection
+    with DAL(env_config=config) as dal2:
+        assert dal2.conn.connection.dbapi_connection is raw
+
+
+def test_get_engine_per_url(tmp_path):
+    url1 = f"sqlite:///{tmp_path}/1.db"
+    url2 = f"sqlite:///{tmp_path}/2.db"
+    assert get_engine(url1) is get_engine(url1)
+    assert get_engine(url1) is not get_engine(url2)
+    dispose_engines()
+
+
+def test_get_engine_per_configuration(tmp_path):
+    url = f"sqlite:///{tmp_path}/1.db"
+    assert get_engine(url, pool_size=2) is not get_engine(url, pool_size=3)
+    assert get_engine(url, pool_size=2).pool.size() == 2
+    wal = get_engine(url, pragmas={"journal_mode": "wal"})
+    assert wal is not get_engine(url, pragmas={"journal_mode": "delete"})
+    assert wal is get_engine(url, pragmas={"journal_mode": "wal"})
+    dispose_engines()
+
+
+def test_get_engine_does_not_evict(tmp_path):
+    url = f"sqlite:///{tmp_path}/1.db"
+    eng = get_engine(url, idle_timeout=0)
+    assert get_engine(url, idle_timeout=0) is eng  # in use: not disposed and rebuilt
+    dispose_engines()
+
+
+def test_idle_engines_are_evicted_in_background(tmp_path, mocker):
+    mocker.patch.object(engine, "REAP_INTERVAL", 0.01)
+    mocker.patch.object(engine._reaper, "thread", None)
+    dispose_engines()
+    url = f"sqlite:///{tmp_path}/1.db"
+    get_engine(url, idle_timeout=0)
+
+    thread = engine._reaper.thread
+    thread.join(timeout=5)
+    assert not thread.is_alive()  # stopped: no engine left
+    assert engine._engines == {}
+
+
+def test_evict_idle(tmp_path, mocker):
+    url = f"sqlite:///{tmp_path}/1.db"
+    eng = get_engine(url)
+    dispose = mocker.spy(eng, "dispose")
+
+    evict_idle(idle_timeout=60)
+    assert url in urls()
+
+    evict_idle(idle_timeout=0)
+    assert url not in urls()
+    dispose.assert_called_once()
+    assert get_engine(url) is not eng
+    dispose_engines()
+
+
+def test_pragmas_applied_to_pooled_connections(dal):
+    with DAL(env_config=config) as dal1:
+        cursor = dal1.conn.connection.cursor()
+
+        def pragma(name):
+            return cursor.execute(f"PRAGMA {name}").fetchone()[0]
+
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("busy_timeout") == config.tw_vimania_db_busy_timeout
+        assert pragma("cache_size") == config.tw_vimania_db_cache_size
+        assert pragma("mmap_size") == config.tw_vimania_db_mmap_size
+        assert pragma("temp_store") == 2  # MEMORY
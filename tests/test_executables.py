@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from vimania.rifle import executables
+from vimania.rifle.executables import ExecutableIndex
+
+
+def add_executable(directory, name: str):
+    path = directory / name
+    path.write_text("#!/bin/sh\n")
+    path.chmod(0o755)
+    stat = os.stat(directory)  # mtime resolution of the filesystem
+    os.utime(directory, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+@pytest.fixture()
+def path_dirs(tmp_path, monkeypatch):
+    bin1, bin2 = tmp_path / "bin1", tmp_path / "bin2"
+    bin1.mkdir()
+    bin2.mkdir()
+    add_executable(bin1, "vim")
+    add_executable(bin2, "zathura")
+    monkeypatch.setenv("PATH", f"{bin1}:{bin2}:{tmp_path / 'missing'}")
+    return bin1, bin2
+
+
+@pytest.fixture()
+def cache_file(tmp_path):
+    return str(tmp_path / "cache" / "executables.json")
+
+
+def test_index(path_dirs, cache_file):
+    index = ExecutableIndex(cache_file)
+    assert "vim" in index
+    assert "zathura" in index
+    assert "mpv" not in index
+    assert os.path.isfile(cache_file)
+
+
+def test_index_is_loaded_from_cache(path_dirs, cache_file, mocker):
+    ExecutableIndex(cache_file).refresh()
+    scan = mocker.spy(executables, "scan")
+
+    index = ExecutableIndex(cache_file)
+    assert index.refresh() == 0
+    assert index.executables() == {"vim", "zathura"}
+    assert scan.call_count == 0
+
+
+def test_changed_directory_is_scanned_again(path_dirs, cache_file, mocker):
+    bin1, bin2 = path_dirs
+    index = ExecutableIndex(cache_file)
+    index.refresh()
+    scan = mocker.spy(executables, "scan")
+
+    add_executable(bin2, "mpv")
+    assert index.refresh() == 1
+    scan.assert_called_once_with(str(bin2))
+    assert "mpv" in index
+    assert "mpv" in ExecutableIndex(cache_file)
+
+
+def test_path_change(path_dirs, cache_file, monkeypatch):
+    bin1, bin2 = path_dirs
+    index = ExecutableIndex(cache_file)
+    assert "zathura" in index
+
+    monkeypatch.setenv("PATH", str(bin1))
+    index.refresh()
+    assert index.executables() == {"vim"}
+
+
+def test_corrupt_cache_is_rebuilt(path_dirs, cache_file):
+    os.makedirs(os.path.dirname(cache_file))
+    with open(cache_file, "w") as f:
+        f.write("{not json")
+    assert "vim" in ExecutableIndex(cache_file)
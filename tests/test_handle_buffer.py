@@ -4,7 +4,15 @@ import pytest
 
 from vimania.db.dal import TodoStatus, DAL
 from vimania.environment import config
-from vimania.handle_buffer import VimTodo, Line, handle_it, delete_todo_
+from vimania.handle_buffer import (
+    VimTodo,
+    Line,
+    handle_it,
+    delete_todo_,
+    BufferSync,
+    sync_history,
+    tokenize,
+)
 
 
 # full integration test
@@ -13,7 +21,10 @@ from vimania.handle_buffer import VimTodo, Line, handle_it, delete_todo_
     (
         ("- [ ] bla bub ()", "-%13% [ ] bla bub ()"),
         ("- [ ] bla bub '()'", "-%13% [ ] bla bub '()'"),  # Bug: trailing single quote
-        ("'- [ ] invalid single quote'", "'- [ ] invalid single quote'"),  # Bug: trailing single quote
+        (
+            "'- [ ] invalid single quote'",
+            "'- [ ] invalid single quote'",
+        ),  # Bug: trailing single quote
         ("- [b] xxxx: invalid", "- [b] xxxx: invalid"),
         ("[ ] xxxx: invalid", "[ ] xxxx: invalid"),
         ("- [ ] todoa ends () hiere.", "-%13% [ ] todoa ends () hiere."),
@@ -128,6 +139,291 @@ def test_handle_it_code_fence(dal):
     assert new_text == result
 
 
+def test_handle_it_tilde_code_fence(dal):
+    text = textwrap.dedent(
+        """
+    ~~~
+    ```
+    - [ ] with a todo
+    ~~~
+    - [ ] bla bub ()
+    """
+    )
+    new_lines = handle_it(text.split("\n"), path="testpath")
+    assert new_lines[3] == "- [ ] with a todo"
+    assert new_lines[5] == "-%13% [ ] bla bub ()"
+
+
+@pytest.mark.parametrize(
+    ("line", "is_todo"),
+    (
+        ("- [ ] todo", True),
+        ("* [x] todo", True),
+        ("\t\t-%123% [-] todo {t:tag}", True),
+        ("   - [ ] todo", True),
+        ("- list item with a [link](https://example.com)", False),
+        ("- [b] invalid status", False),
+        ("[ ] no dash", False),
+        ("text - [ ] in between", False),
+        ("", False),
+    ),
+)
+def test_tokenize_prefilter(line, is_todo):
+    tokens = list(tokenize([line]))
+    assert (len(tokens) == 1) is is_todo
+    if is_todo:
+        assert tokens[0].match.groups() == Line.pattern.match(line).groups()
+
+
+def test_tokenize_line_numbers():
+    text = textwrap.dedent(
+        """\
+    # heading
+    - [ ] first
+    ```python
+    - [ ] in code
+    ```
+    ~~~
+    - [ ] in code
+    ```
+    ~~~
+    \t- [x] second
+    """
+    )
+    tokens = list(tokenize(text.split("\n")))
+    assert [(t.index, t.line) for t in tokens] == [
+        (1, "- [ ] first"),
+        (9, "\t- [x] second"),
+    ]
+
+
+def test_buffer_sync_stats(dal):
+    text = textwrap.dedent(
+        """
+    - [ ] new 1
+    - [ ] new 2
+    -%2% [x] todo 2
+    -%11% [d] todo 9
+    some prose
+    """
+    )
+    sync = BufferSync(path="testpath")
+    new_lines = sync.run(text.split("\n"))
+
+    assert "-%13% [ ] new 1" in new_lines
+    assert sync.stats.todos == 4
+    assert (sync.stats.created, sync.stats.updated, sync.stats.deleted) == (2, 1, 1)
+    assert sync.stats.elapsed_ms > 0
+    assert sync_history[-1] is sync.stats
+
+
+def test_buffer_sync_is_atomic(dal):
+    text = textwrap.dedent(
+        """
+    - [ ] new 1
+    - [ ] todo 1
+    """
+    )
+    with pytest.raises(ValueError):  # 'todo 1' is already active
+        handle_it(text.split("\n"), path="testpath")
+
+    with DAL(env_config=config) as dal:
+        assert dal.get_todo_by_id(13).id is None  # 'new 1' rolled back
+
+
+def test_handle_it_read_prefetches(dal, mocker):
+    tab = "\t"
+    text = textwrap.dedent(
+        f"""
+    -%3% [x] changed in buffer
+    {tab}-%6% [ ] todo 5 inconsistency
+    -%8% [ ] todo 6
+    -%9% [ ] todo 7
+    -%99% [ ] not in DB
+    ```
+    -%1% [ ] within code fence
+    ```
+    """
+    )
+    result = textwrap.dedent(
+        f"""
+    -%3% [ ] todo 3
+    {tab}-%6% [ ] todo 5 inconsistency
+    {tab}{tab}-%8% [ ] todo 6
+    {tab}{tab}{tab}-%9% [ ] todo 7
+    ```
+    -%1% [ ] within code fence
+    ```
+    """
+    )
+    get_todo_by_id = mocker.spy(DAL, "get_todo_by_id")
+    get_depth = mocker.spy(DAL, "get_depth")
+
+    new_lines = handle_it(text.split("\n"), path="testpath", read=True)
+
+    assert "\n".join(new_lines) == result
+    assert get_todo_by_id.call_count == 0
+    assert get_depth.call_count == 0
+
+
+class TestIncrementalSync:
+    tab = "\t"
+    text = textwrap.dedent(
+        f"""
+    - [ ] parent
+    {tab}- [ ] child
+    {tab}- [ ] sibling
+    - [ ] other
+    """
+    )
+    synced = textwrap.dedent(
+        f"""
+    -%13% [ ] parent
+    {tab}-%14% [ ] child
+    {tab}-%15% [ ] sibling
+    -%16% [ ] other
+    """
+    )
+
+    def sync(self) -> BufferSync:
+        return BufferSync("testpath", incremental=True, scoped=True)
+
+    def test_unchanged_lines_skip_db(self, dal, mocker):
+        self.sync().run(self.text.split("\n"))
+        update_todos = mocker.spy(DAL, "update_todos")
+
+        lines = self.synced.replace("[ ] other", "[x] other").split("\n")
+        sync = self.sync()
+        new_lines = sync.run(lines)
+
+        assert new_lines == lines
+        assert [todo.id for todo in update_todos.call_args.args[1]] == [16]
+        assert (sync.stats.updated, sync.stats.unchanged) == (1, 3)
+        assert sync.edits == []
+        assert dal.get_todo_by_id(16).flags == TodoStatus.DONE
+
+    def test_changed_parent_resyncs_children(self, dal, mocker):
+        self.sync().run(self.text.split("\n"))
+        update_todos = mocker.spy(DAL, "update_todos")
+
+        # parent removed: children move to top level
+        lines = self.synced.replace("-%13% [ ] parent\n", "").replace(self.tab, "")
+        sync = self.sync()
+        sync.run(lines.split("\n"))
+
+        assert [todo.id for todo in update_todos.call_args.args[1]] == [14, 15]
+        assert sync.stats.orphaned == 1
+        assert dal.get_todo_by_id(14).parent_id is None
+        assert dal.get_todo_by_id(15).parent_id is None
+
+    def test_edits_cover_modified_lines_only(self, dal):
+        lines = self.text.replace("- [ ] other", "- [d] other").split("\n")
+        sync = self.sync()
+        sync.run(lines)
+
+        assert sync.edits == [
+            (1, "-%13% [ ] parent"),
+            (2, f"{self.tab}-%14% [ ] child"),
+            (3, f"{self.tab}-%15% [ ] sibling"),
+            (4, None),
+        ]
+
+    def test_without_snapshot_syncs_all(self, dal, mocker):
+        get_todos_by_path = mocker.spy(DAL, "get_todos_by_path")
+        lines = ["-%1% [ ] todo 1", "-%2% [ ] todo 2"]
+        sync = self.sync()
+        sync.run(lines)
+        assert get_todos_by_path.call_count == 1
+        assert sync.stats.todos == 2
+
+
+class TestScopedSync:
+    tab = "\t"
+    text = textwrap.dedent(
+        f"""
+    - [ ] parent
+    {tab}- [ ] child
+    {tab}- [ ] sibling
+    - [ ] other
+    """
+    )
+
+    def run(self, text: str, path: str = "testpath") -> BufferSync:
+        sync = BufferSync(path, scoped=True)
+        sync.run(text.split("\n"))
+        return sync
+
+    def test_create(self, dal):
+        sync = self.run(self.text)
+        assert sync.stats.created == 4
+        assert dal.get_todo_by_id(14).parent_id == 13
+        assert dal.get_todo_by_id(15).parent_id == 13
+        assert dal.get_todo_by_id(16).parent_id is None
+
+    def test_unchanged_and_updated_in_bulk(self, dal, mocker):
+        synced = BufferSync("testpath", scoped=True).run(self.text.split("\n"))
+        update_todo = mocker.spy(DAL, "update_todo")
+        update_todos = mocker.spy(DAL, "update_todos")
+
+        sync = self.run("\n".join(synced).replace("[ ] other", "[x] other"))
+
+        assert (sync.stats.updated, sync.stats.unchanged) == (1, 3)
+        assert update_todo.call_count == 0
+        assert update_todos.call_count == 1
+        assert dal.get_todo_by_id(16).flags == TodoStatus.DONE
+
+    def test_reparent(self, dal):
+        synced = BufferSync("testpath", scoped=True).run(self.text.split("\n"))
+        sync = self.run("\n".join(synced).replace(f"{self.tab}-%15%", "-%15%"))
+        assert sync.stats.updated == 1
+        assert dal.get_todo_by_id(15).parent_id is None
+        assert dal.get_todo_by_id(14).parent_id == 13
+
+    def test_orphaned_and_moved(self, dal):
+        self.run(self.text)
+
+        sync = self.run("-%13% [ ] parent\n-%16% [ ] other")
+        assert sync.stats.orphaned == 2
+        assert dal.get_todo_by_id(14).flags == TodoStatus.TODELETE
+
+        sync = self.run("- [ ] new\n\t-%14% [ ] child", path="otherpath")
+        assert (sync.stats.created, sync.stats.moved) == (1, 1)
+        todo = dal.get_todo_by_id(14)
+        assert (todo.path, todo.flags, todo.parent_id) == ("otherpath", 1, 17)
+
+    def test_delete_and_unknown_todo(self, dal):
+        self.run(self.text)
+        sync = self.run("-%13% [d] parent\n-%999% [ ] unknown\n-%16% [ ] other")
+        assert sync.edits == [(0, None), (1, None)]
+        assert sync.stats.deleted == 1
+        assert dal.get_todo_by_id(13).id is None
+
+    def test_read_keeps_orphaned_line(self, dal):
+        synced = BufferSync("testpath", scoped=True).run(self.text.split("\n"))
+        self.run("-%13% [ ] parent\n-%16% [ ] other")  # 14 and 15 orphaned
+
+        lines = BufferSync("testpath", read=True).run(synced)
+
+        assert lines == synced  # status and indentation of 14, 15 kept
+
+    def test_incremental_fetches_changed_lines_only(self, dal, mocker):
+        synced = BufferSync("testpath", scoped=True).run(self.text.split("\n"))
+        get_todos_by_path = mocker.spy(DAL, "get_todos_by_path")
+        get_todos_by_ids = mocker.spy(DAL, "get_todos_by_ids")
+
+        text = "\n".join(synced).replace("[ ] other", "[x] other")
+        text = text.replace(f"{self.tab}-%15% [ ] sibling\n", "")
+        sync = BufferSync("testpath", incremental=True, scoped=True)
+        sync.run(text.split("\n"))
+
+        assert get_todos_by_path.call_count == 0
+        assert set(get_todos_by_ids.call_args.args[1]) == {16}
+        assert (sync.stats.updated, sync.stats.unchanged) == (1, 2)
+        assert sync.stats.orphaned == 1  # from the snapshot
+        assert dal.get_todo_by_id(15).flags == TodoStatus.TODELETE
+        assert dal.get_todo_by_id(16).flags == TodoStatus.DONE
+
+
 def test_delete_todo_(dal):
     text = "- %1% [ ] todo 1"
     id_ = delete_todo_(text, "testpath")
@@ -174,6 +470,15 @@ class TestLine:
         new_line = l.handle()
         assert new_line == "-%13% [x] xxxxxxxxxx"
 
+    def test_handle_unchanged_skips_update(self, dal, mocker):
+        Line("- [ ] unchanged todo", path="testpath").handle()  # add to db
+        update_todo = mocker.spy(DAL, "update_todo")
+
+        l = Line("-%13% [ ] unchanged todo", path="testpath")
+        assert l.handle() == "-%13% [ ] unchanged todo"
+        assert l.is_unchanged
+        assert update_todo.call_count == 0
+
     def test_handle_read_update_buffer(self, dal):
         todo_text = "-%1% [x] this is a text describing a task"
         l = Line(todo_text, path="testpath")
@@ -0,0 +1,94 @@
+import io
+import os
+import subprocess
+import zipfile
+
+import pytest
+
+from vimania.rifle import magic, rifle as rifle_module
+from vimania.rifle.magic import sniff, sniff_mimetype
+from vimania.rifle.rifle import Rifle
+
+
+def zip_bytes(*names: str, first: bytes = None) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as f:
+        if first is not None:  # OpenDocument: stored, uncompressed
+            f.writestr("mimetype", first, compress_type=zipfile.ZIP_STORED)
+        for name in names:
+            f.writestr(name, "<xml/>")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    ("sample", "mimetype"),
+    (
+        (b"%PDF-1.4\n%\xe2\xe3", "application/pdf"),
+        (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR", "image/png"),
+        (b"\xff\xd8\xff\xe0\x00\x10JFIF", "image/jpeg"),
+        (b"GIF89a\x01\x00", "image/gif"),
+        (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+        (b"\x00\x00\x00\x18ftypmp42", "video/mp4"),
+        (b"\x1f\x8b\x08\x00", "application/gzip"),
+        (b"\x00" * 257 + b"ustar\x0000", "application/x-tar"),
+        (zip_bytes("a.txt"), "application/zip"),
+        (
+            zip_bytes("[Content_Types].xml", "_rels/.rels", "word/document.xml"),
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        ),
+        (
+            zip_bytes("content.xml", first=b"application/vnd.oasis.opendocument.text"),
+            "application/vnd.oasis.opendocument.text",
+        ),
+        (b"# notes\n- [ ] todo", "text/plain"),
+        ("ümlauts\n".encode() * 1000, "text/plain"),
+        ("cut ü".encode()[:-1], "text/plain"),
+        (b"  <!DOCTYPE html><html>", "text/html"),
+        (b"<?xml version='1.0'?>", "text/xml"),
+        (b"", "inode/x-empty"),
+        (b"\x7fELF\x02\x01\x01\x00\x00", None),
+        (b"\xde\xad\xbe\xef\xff\xfe", None),
+    ),
+)
+def test_sniff(sample, mimetype):
+    assert sniff(sample) == mimetype
+
+
+def test_sniff_mimetype_is_cached_per_inode(tmp_path, mocker):
+    path = tmp_path / "document"
+    path.write_bytes(b"%PDF-1.4")
+    spy = mocker.spy(magic, "sniff")
+
+    assert sniff_mimetype(str(path)) == "application/pdf"
+    (tmp_path / "link").symlink_to(path)
+    assert sniff_mimetype(str(tmp_path / "link")) == "application/pdf"
+    assert spy.call_count == 1
+
+    path.write_bytes(b"plain text")
+    assert sniff_mimetype(str(path)) == "text/plain"
+    assert spy.call_count == 2
+
+
+def test_sniff_mimetype_of_directory_and_missing_file(tmp_path):
+    assert sniff_mimetype(str(tmp_path)) == "inode/directory"
+    assert sniff_mimetype(str(tmp_path / "missing")) is None
+
+
+def test_sniff_mimetype_does_not_read_fifo(tmp_path, mocker):
+    fifo = tmp_path / "fifo"
+    os.mkfifo(fifo)
+    spy = mocker.spy(magic, "sniff")
+    assert sniff_mimetype(str(fifo)) is None  # would block without a writer
+    spy.assert_not_called()
+
+
+def test_rifle_spawns_file_only_for_unknown_content(tmp_path, mocker):
+    rifle = Rifle("rifle.conf")
+    popen = mocker.patch.object(rifle_module, "Popen", wraps=subprocess.Popen)
+    (tmp_path / "document").write_bytes(b"%PDF-1.4")
+    (tmp_path / "binary").write_bytes(b"\x7fELF\x02\x01\x01\x00\x00")
+
+    assert rifle.get_mimetype(str(tmp_path / "document")) == "application/pdf"
+    assert popen.call_count == 0
+    rifle.get_mimetype(str(tmp_path / "binary"))
+    assert popen.called  # file, for octet-stream also mimetype
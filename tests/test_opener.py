@@ -0,0 +1,35 @@
+import os
+import time
+
+from vimania.opener import Opener
+
+
+def test_open_returns_immediately():
+    opener = Opener(command="sleep", reap_interval=0.05)
+    started = time.monotonic()
+    pid = opener.open("0.5")
+
+    assert time.monotonic() - started < 0.4
+    assert pid in opener.running
+    assert os.getsid(pid) == pid  # detached: own session
+    assert opener.wait(timeout=5)
+    assert opener.running == {}
+
+
+def test_open_all_in_parallel():
+    opener = Opener(command="sleep", reap_interval=0.05)
+    started = time.monotonic()
+    pids = opener.open_all(["0.5"] * 4)
+
+    assert len(set(pids)) == 4
+    assert opener.wait(timeout=5)
+    assert time.monotonic() - started < 1.5  # not 4 x 0.5s one after the other
+
+
+def test_failed_handler_is_reaped(mocker):
+    log = mocker.patch("vimania.opener._log")
+    opener = Opener(command="false", reap_interval=0.05)
+    opener.open("uri")
+
+    assert opener.wait(timeout=5)
+    log.warning.assert_called_once_with("false uri failed: 1")
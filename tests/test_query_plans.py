@@ -0,0 +1,112 @@
+"""EXPLAIN QUERY PLAN regression test over all queries of the DAL
+
+Fails when a query falls back to a full table scan.
+"""
+import random
+import re
+
+import pytest
+
+from vimania.db.dal import QUERIES
+
+N_TODOS = 5000
+N_FILES = 50
+
+# queries which return every todo (or every tag) by definition, backfills
+FULL_SCAN_QUERIES = {
+    "get_all_todos",
+    "get_all_tags",
+    "get_todos_without_hash",  # partial index of the rows without hash
+    "get_active_todos_without_hash",
+    "get_todos_by_excluded_tags",  # all todos but those with excluded tags
+}
+SINGLE_ROW_TABLES = {"vimania_id_seq"}
+
+PARAMS = dict(
+    id=7,
+    id_=7,
+    ids="[1, 7, 42]",
+    depth=-1,
+    parent_id=3,
+    flags=1,
+    path="/todos/file_7.md",
+    todo="bench todo 7",
+    todo_hash="0123456789abcdef",
+    metadata="",
+    tags=",aaa,",
+    desc="",
+    created_at="2022-01-01",
+    n=10,
+    fts_query="todo",
+    tag="aaa",
+    tag_list='["aaa"]',
+    tags_all='["aaa", "bbb"]',
+    tags_all_not='["ccc"]',
+    tags_any='["aaa"]',
+    tags_any_not='["ddd"]',
+    tags_exact='["aaa"]',
+    pages=64,
+    segments=4,
+    days=30,
+    start="[",
+    end="]",
+)
+
+
+def full_scans(plan):
+    """SCAN steps over tables, virtual tables and CTEs are fine"""
+    ctes = {
+        step.split()[1]
+        for step in plan
+        if step.startswith(("CO-ROUTINE", "MATERIALIZE"))
+    }
+    return [
+        step
+        for step in plan
+        if step.startswith("SCAN ")
+        and "VIRTUAL TABLE" not in step
+        and step.split()[1] not in ctes | SINGLE_ROW_TABLES | {"CONSTANT"}
+    ]
+
+
+@pytest.fixture()
+def realistic_dal(dal):
+    """a few thousand todos spread over files, nested up to 8 levels, analyzed"""
+    conn = dal.conn.connection
+    random.seed(42)
+    ids = [row[0] for row in conn.execute("select id from vimania_todos")]
+    for i in range(N_TODOS):
+        parent_id = random.choice(ids) if ids and i % 8 else None
+        cursor = conn.execute(
+            "insert into vimania_todos (parent_id, todo, metadata, tags, desc, path, flags)"
+            " values (?, ?, '', ',aaa,', '', ?, ?)",
+            (
+                parent_id,
+                f"bench todo {i}",
+                f"/todos/file_{i % N_FILES}.md",
+                random.choice((0, 1, 2, 4, 4, 4)),
+            ),
+        )
+        ids.append(cursor.lastrowid)
+    conn.execute("ANALYZE")
+    conn.commit()
+    yield dal
+
+
+def query_names():
+    return sorted(
+        name for name in QUERIES.available_queries if not name.endswith("_cursor")
+    )
+
+
+@pytest.mark.parametrize("name", query_names())
+def test_query_plan_uses_index(realistic_dal, name):
+    conn = realistic_dal.conn.connection
+    sql = getattr(QUERIES, name).sql
+    params = {key: PARAMS[key] for key in re.findall(r"(?<!:):(\w+)", sql)}
+
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+    if name in FULL_SCAN_QUERIES:
+        return
+    assert not full_scans(plan), f"{name}: {plan}"
@@ -0,0 +1,129 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from vimania.rifle import executables, rifle as rifle_module
+from vimania.rifle.rifle import Rifle
+
+CONFIG = Path(__file__).parent.parent / "pythonx/vimania/rifle/rifle.conf"
+
+
+@pytest.fixture(autouse=True)
+def executable_index(tmp_path, monkeypatch):
+    index = executables.ExecutableIndex(str(tmp_path / "executables.json"))
+    monkeypatch.setattr(executables, "_index", index)
+    return index
+
+
+@pytest.fixture()
+def rifle():
+    rifle = Rifle(str(CONFIG))
+    rifle.reload_config()
+    return rifle
+
+
+def test_get_mimetype_of_many_files(rifle, tmp_path):
+    (tmp_path / "a.md").write_text("# markdown")
+    (tmp_path / "b.pdf").write_bytes(b"%PDF-1.4")
+    (tmp_path / "c.html").write_text("<html></html>")
+
+    assert rifle.get_mimetype(str(tmp_path / "a.md")) == "text/markdown"
+    assert rifle.get_mimetype(str(tmp_path / "b.pdf")) == "application/pdf"
+    assert rifle.get_mimetype(str(tmp_path / "c.html")) == "text/html"
+
+
+def test_get_mimetype_is_cached_until_modified(rifle, tmp_path, mocker):
+    path = tmp_path / "a.md"
+    path.write_text("# markdown")
+    detect = mocker.spy(rifle, "_detect_mimetype")
+
+    rifle.get_mimetype(str(path))
+    rifle.get_mimetype(str(path))
+    assert detect.call_count == 1
+
+    path.write_text("# markdown, modified")
+    rifle.get_mimetype(str(path))
+    assert detect.call_count == 2
+
+
+def test_get_mimetype_cache_is_bounded(rifle, tmp_path, monkeypatch):
+    monkeypatch.setattr(rifle_module, "MIMETYPE_CACHE_SIZE", 2)
+    for name in ("a.md", "b.md", "c.md"):
+        (tmp_path / name).write_text(name)
+        rifle.get_mimetype(str(tmp_path / name))
+    assert [Path(key[0]).name for key in rifle._mimetypes] == ["b.md", "c.md"]
+
+
+def test_list_commands_ignores_previous_mimetype(rifle, tmp_path):
+    (tmp_path / "a.pdf").write_bytes(b"%PDF-1.4")
+    list(rifle.list_commands([str(tmp_path / "a.pdf")], mimetype="text/plain"))
+    assert rifle.get_mimetype(str(tmp_path / "a.pdf")) == "application/pdf"
+
+
+def test_reload_if_changed(tmp_path):
+    config = tmp_path / "rifle.conf"
+    config.write_text('ext md = vim -- "$@"\n')
+    rifle = Rifle(str(config))
+    assert rifle.reload_if_changed()
+    assert not rifle.reload_if_changed()
+
+    config.write_text('ext md = vim -- "$@"\next pdf = zathura -- "$@"\n')
+    os.utime(config, ns=(0, rifle._config_mtime + 1))
+    assert rifle.reload_if_changed()
+    assert len(rifle.rules) == 2
+
+
+def test_has_condition(rifle, tmp_path, monkeypatch):
+    (tmp_path / "a.pdf").write_bytes(b"%PDF-1.4")
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "bin" / "zathura").write_text("#!/bin/sh\n")
+    (tmp_path / "bin" / "zathura").chmod(0o755)
+    monkeypatch.setenv("PATH", str(tmp_path / "bin"))
+    monkeypatch.setenv("DISPLAY", ":0")
+
+    commands = [cmd for _, cmd, _, _ in rifle.list_commands([str(tmp_path / "a.pdf")])]
+    assert commands[0] == 'zathura -- "$@"'
+
+
+EXTS = (
+    "pdf html xhtml htm doc docx odt ods cbr cbz zip tar gz bz2 xz 7z rar epub djvu "
+    "mp3 mkv jpg png gif svg md txt py json sh exe iso unknown"
+).split()
+
+
+def legacy_list_commands(rifle, files):
+    """list_commands before the decision table: every rule in order"""
+    rifle._mimetype = None
+    count = -1
+    for cmd, tests in rifle.rules:
+        rifle._skip, rifle._app_flags, rifle._app_label = None, "", None
+        if all(rifle._eval_condition(test, files, None) for test in tests):
+            count = count + 1 if rifle._skip is None else rifle._skip
+            yield count, cmd, rifle._app_label, rifle._app_flags
+
+
+def test_decision_table_matches_rule_scan(rifle, tmp_path, monkeypatch):
+    (tmp_path / "bin").mkdir()
+    for program in ("vim", "less", "zathura", "mpv", "feh", "firefox", "atool"):
+        (tmp_path / "bin" / program).write_text("#!/bin/sh\n")
+        (tmp_path / "bin" / program).chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path / 'bin'}:{os.environ['PATH']}")
+    monkeypatch.setenv("DISPLAY", ":0")
+    files = [str(tmp_path / f"file.{ext}") for ext in EXTS]
+    for path in files:
+        open(path, "w").close()
+    files += [str(tmp_path), str(tmp_path / "missing.pdf"), str(tmp_path / "noext")]
+
+    for path in files:
+        expected = list(legacy_list_commands(rifle, [path]))
+        assert list(rifle.list_commands([path])) == expected, path
+    assert len(list(rifle.list_commands([files[0]]))) > 0
+    assert list(rifle.list_commands([])) == list(legacy_list_commands(rifle, []))
+
+
+def test_decision_table_buckets(rifle):
+    pdf_rules = rifle._by_ext["pdf"]
+    assert len(pdf_rules) < len(rifle.rules)
+    assert [rule[0] for rule in pdf_rules] == sorted(rule[0] for rule in pdf_rules)
+    assert set(rule[0] for rule in rifle._generic) < set(rule[0] for rule in pdf_rules)
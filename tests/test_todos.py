@@ -31,7 +31,7 @@ from vimania.todos import (
     ),
 )
 class TestBookmarks:
-    def test_search_tags_exact(
+    def test_search_pushes_filters_into_query(
         self,
         fts_query,
         tags_all,
@@ -41,13 +41,14 @@ class TestBookmarks:
         tags_exact,
         result,
     ):
-        todos = Todos(fts_query=fts_query).filter(
+        todos = Todos.search(
+            fts_query,
             tags_all=tags_all,
             tags_all_not=tags_all_not,
             tags_any=tags_any,
             tags_any_not=tags_any_not,
             tags_exact=tags_exact,
-        )
+        ).todos
         assert len(todos) == result
 
 
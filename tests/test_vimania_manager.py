@@ -1,3 +1,8 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
 import pytest
 
 from vimania.vimania_manager import split_path
@@ -15,3 +20,41 @@ from vimania.vimania_manager import split_path
 )
 def test_split_path(args, path, suffix):
     assert split_path(args) == (path, suffix)
+
+
+HEAVY = {
+    "vimania.buku",
+    "vimania.rifle.rifle",
+    "vimania.core",
+    "vimania.cli",
+    "sqlalchemy",
+    "aiosql",
+    "pydantic",
+    "typer",
+}
+
+
+def loaded_modules(statement: str) -> set:
+    """modules loaded by statement in a fresh interpreter"""
+    pythonx = Path(__file__).parent.parent / "pythonx"
+    result = subprocess.run(
+        [sys.executable, "-c", f"{statement}; print(' '.join(sorted(sys.modules)))"],
+        env=dict(os.environ, PYTHONPATH=str(pythonx)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.split())
+
+
+def test_startup_defers_heavy_imports():
+    # what the vim plugin loads at startup
+    modules = loaded_modules("import sys, vimania; vimania.VimaniaManager()")
+    assert modules & HEAVY == set()
+
+
+def test_idle_maintenance_without_todo_sync_is_a_noop():
+    modules = loaded_modules(
+        "import sys, vimania; vimania.VimaniaManager.maintain_idle()"
+    )
+    assert modules & HEAVY == set()
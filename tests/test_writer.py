@@ -0,0 +1,96 @@
+import textwrap
+import threading
+
+import pytest
+
+from vimania.db.dal import DAL, Todo
+from vimania.environment import config
+from vimania.writer import BufferWriter, IdPool, prepare_lines
+
+TAB = "\t"
+TEXT = textwrap.dedent(
+    f"""
+- [ ] parent
+{TAB}- [ ] child
+-%1% [d] todo 1
+"""
+).split("\n")
+
+
+@pytest.fixture()
+def writer(dal):
+    writer = BufferWriter(max_pending=2, id_block_size=4)
+    yield writer
+    assert writer.flush(timeout=5)
+
+
+def test_reserved_ids_are_not_reused(dal):
+    assert dal.reserve_ids(3) == range(13, 16)
+    assert dal.insert_todo(Todo(todo="new todo")) == 16
+    assert dal.reserve_ids(1) == range(17, 18)
+
+
+def test_prepare_lines(dal):
+    ids = IdPool(block_size=4)
+    lines = list(TEXT)
+    edits = prepare_lines(lines, "testpath", ids)
+
+    assert edits == [(1, "-%13% [ ] parent"), (2, f"{TAB}-%14% [ ] child"), (3, None)]
+    assert lines[3] == "-%1% [d] todo 1"  # deletion is left to the writer
+    assert ids.reserved() == {13, 14}
+
+
+def test_save_syncs_in_background(writer):
+    edits = writer.save(TEXT, "testpath")
+    assert len(edits) == 3
+    assert writer.flush(timeout=5)
+
+    (result,) = writer.poll()
+    assert result.error is None
+    assert (result.stats.created, result.stats.deleted) == (2, 1)
+    assert writer.ids.reserved() == set()
+    with DAL(env_config=config) as dal:
+        assert dal.get_todo_by_id(14).parent_id == 13
+        assert dal.get_todo_by_id(1).id is None
+
+
+def test_saves_of_a_buffer_are_merged(writer, mocker):
+    mocker.patch.object(writer._worker, "start")
+    writer.save(TEXT, "testpath")
+    writer.submit(["-%13% [ ] parent renamed", f"{TAB}-%14% [ ] child"], "testpath")
+    mocker.stopall()
+    writer._worker.start()
+    assert writer.flush(timeout=5)
+
+    (result,) = writer.poll()
+    assert result.merged == 1
+    with DAL(env_config=config) as dal:
+        assert dal.get_todo_by_id(13).todo == "parent renamed"
+        assert dal.get_todo_by_id(1).id is None  # deletion of the replaced save
+
+
+def test_full_queue_blocks(writer, mocker):
+    mocker.patch.object(writer._worker, "start")
+    writer.submit(["- [ ] a"], "path_a")
+    writer.submit(["- [ ] b"], "path_b")
+
+    blocked = threading.Thread(target=writer.submit, args=(["- [ ] c"], "path_c"))
+    blocked.start()
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive()
+
+    mocker.stopall()
+    writer._worker.start()
+    blocked.join(timeout=5)
+    assert not blocked.is_alive()
+    assert writer.flush(timeout=5)
+    assert len(writer.poll()) == 3
+
+
+def test_errors_are_reported(writer):
+    writer.save(["- [ ] todo 1"], "testpath")  # 'todo 1' is already active
+    assert writer.flush(timeout=5)
+
+    (result,) = writer.poll()
+    assert "ValueError" in result.error
+    assert writer.ids.reserved() == {13}  # retried with the next save